@@ -0,0 +1,38 @@
+"""Add partial indexes on non-zero user_session counters.
+
+Revision ID: 2f8a6c3e9d14
+Revises: 9b4e1d7a2c58
+Create Date: 2026-10-19 16:02:38.915472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f8a6c3e9d14'
+down_revision: Union[str, None] = '9b4e1d7a2c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_user_session_flood_ts",
+        "user_session",
+        ["flood_ts"],
+        postgresql_where=sa.text("flood_count > 0"),
+    )
+    op.create_index(
+        "ix_user_session_non_recogn_ts",
+        "user_session",
+        ["non_recogn_ts"],
+        postgresql_where=sa.text("non_recogn_count > 0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_session_non_recogn_ts", table_name="user_session")
+    op.drop_index("ix_user_session_flood_ts", table_name="user_session")
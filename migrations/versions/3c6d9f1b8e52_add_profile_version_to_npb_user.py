@@ -0,0 +1,36 @@
+"""Add profile_version to npb_user, so that rendered profile cards can be cached by version.
+
+Revision ID: 3c6d9f1b8e52
+Revises: f2b7c4e9a6d1
+Create Date: 2026-10-19 21:14:52.806143
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c6d9f1b8e52'
+down_revision: Union[str, None] = 'f2b7c4e9a6d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # a constant default does not rewrite the table
+    op.add_column(
+        "npb_user",
+        sa.Column(
+            "profile_version",
+            sa.Integer,
+            nullable=False,
+            server_default="0",
+            comment="Incremented on every update of fields shown in the profile card (see npb.tg.profile_cards).",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("npb_user", "profile_version")
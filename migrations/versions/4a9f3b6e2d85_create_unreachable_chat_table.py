@@ -0,0 +1,33 @@
+"""Create unreachable_chat table for chats that have blocked the bot.
+
+Revision ID: 4a9f3b6e2d85
+Revises: b7e2a5d91f36
+Create Date: 2026-10-19 18:10:26.674093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a9f3b6e2d85'
+down_revision: Union[str, None] = 'b7e2a5d91f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "unreachable_chat",
+        sa.Column("chat_id", sa.String(100), primary_key=True, comment="Telegram chat id."),
+        sa.Column("reason", sa.String(1000), comment="Why the chat is unreachable."),
+        sa.Column(
+            "created_ts", sa.DateTime(timezone=True), server_default=sa.text("now()"), comment="Detection timestamp."
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("unreachable_chat")
@@ -0,0 +1,127 @@
+"""Partition appointment table by month.
+
+Revision ID: 5d2b8e91c7f4
+Revises: a41e7c2d9b15
+Create Date: 2026-10-19 11:02:17.530846
+
+"""
+from datetime import datetime, timezone
+from typing import List, Sequence, Union
+from uuid import uuid4
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2b8e91c7f4'
+down_revision: Union[str, None] = 'a41e7c2d9b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+APPOINTMENT_COLUMNS = (
+    "auid, client_telegram_id, datetime, service, master_telegram_id, is_reserved, notifications, notification_ts"
+)
+# frozen copies of app settings and partition helpers (npb.db.partitions) as of this revision, so that the migration
+# does not change when the app code does
+APPOINTMENT_DEFAULT_PARTITION = "appointment_default"
+APPOINTMENT_PARTITIONS_AHEAD = 12
+PARTITION_TIMEZONE = timezone.utc  # Config.TZ_OFFSET = 0
+
+
+def _add_months(month_start: datetime, months: int) -> datetime:
+    month_index = month_start.year * 12 + month_start.month - 1 + months
+    return month_start.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def _month_start(moment: datetime) -> datetime:
+    moment = moment.astimezone(PARTITION_TIMEZONE)
+    return datetime(moment.year, moment.month, 1, tzinfo=PARTITION_TIMEZONE)
+
+
+def _create_partition_statements(month_start: datetime) -> List[str]:
+    name = f"appointment_y{month_start.year:04d}m{month_start.month:02d}"
+    lower = month_start.isoformat()
+    upper = _add_months(month_start, 1).isoformat()
+    return [
+        f"CREATE TABLE IF NOT EXISTS {name} (LIKE appointment INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+        f"ALTER TABLE appointment ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')",
+    ]
+
+
+def _appointment_table(name: str, **kwargs) -> None:
+    op.create_table(
+        name,
+        sa.Column("auid", sa.UUID, comment="Appointment unique id (as uuid).", default=uuid4),
+        sa.Column(
+            "client_telegram_id",
+            sa.String(100),
+            sa.ForeignKey("npb_user.telegram_id"),
+            comment="Client telegram id.",
+        ),
+        sa.Column(
+            "datetime",
+            sa.DateTime(timezone=True),
+            comment="Appointment date and time.",
+            nullable=False,
+            unique=True,
+        ),
+        sa.Column("service", sa.String(100), comment="Chosen service."),
+        sa.Column(
+            "master_telegram_id",
+            sa.String(100),
+            sa.ForeignKey("npb_user.telegram_id"),
+            comment="Master telegram id.",
+        ),
+        sa.Column("is_reserved", sa.Boolean, comment="Is slot reserved.", default=False),
+        sa.Column(
+            "notifications", sa.Integer, comment="How many notifications was sent for this appointment.",
+            server_default=sa.text("0")
+        ),
+        sa.Column(
+            "notification_ts", sa.DateTime(timezone=True), comment="Last notification ts"
+        ),
+        sa.UniqueConstraint("master_telegram_id", "datetime"),
+        **kwargs,
+    )
+
+
+def _rename_unique_constraints(table: str, old_prefix: str, new_prefix: str) -> None:
+    # unique constraints are backed by indexes, whose names must be unique within the schema
+    for suffix in ("datetime_key", "master_telegram_id_datetime_key"):
+        op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {old_prefix}_{suffix} TO {new_prefix}_{suffix}")
+
+
+def upgrade() -> None:
+    op.rename_table("appointment", "appointment_old")
+    _rename_unique_constraints(table="appointment_old", old_prefix="appointment", new_prefix="appointment_old")
+    _appointment_table("appointment", postgresql_partition_by="RANGE (datetime)")
+    op.execute(f"CREATE TABLE {APPOINTMENT_DEFAULT_PARTITION} PARTITION OF appointment DEFAULT")
+    oldest = op.get_bind().execute(sa.text("SELECT min(datetime) FROM appointment_old")).scalar()
+    current_month = _month_start(datetime.now(tz=timezone.utc))
+    month_start = min(_month_start(oldest), current_month) if oldest else current_month
+    last_month = _add_months(current_month, APPOINTMENT_PARTITIONS_AHEAD)
+    while month_start <= last_month:
+        for statement in _create_partition_statements(month_start):
+            op.execute(statement)
+        month_start = _add_months(month_start, 1)
+    op.execute(
+        f"INSERT INTO appointment ({APPOINTMENT_COLUMNS}) SELECT {APPOINTMENT_COLUMNS} FROM appointment_old"
+    )
+    op.drop_table("appointment_old")
+    op.create_index("ix_appointment_client_telegram_id_datetime", "appointment", ["client_telegram_id", "datetime"])
+    op.create_index(
+        "ix_appointment_reserved_datetime",
+        "appointment",
+        ["datetime"],
+        postgresql_where=sa.text("is_reserved IS true"),
+    )
+
+
+def downgrade() -> None:
+    _appointment_table("appointment_plain")
+    op.execute(
+        f"INSERT INTO appointment_plain ({APPOINTMENT_COLUMNS}) SELECT {APPOINTMENT_COLUMNS} FROM appointment"
+    )
+    op.drop_table("appointment")
+    op.rename_table("appointment_plain", "appointment")
+    _rename_unique_constraints(table="appointment", old_prefix="appointment_plain", new_prefix="appointment")
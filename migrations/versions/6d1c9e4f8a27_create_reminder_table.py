@@ -0,0 +1,63 @@
+"""Create reminder table with planned appointment reminders.
+
+Revision ID: 6d1c9e4f8a27
+Revises: 2f8a6c3e9d14
+Create Date: 2026-10-19 16:47:19.530846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '6d1c9e4f8a27'
+down_revision: Union[str, None] = '2f8a6c3e9d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# frozen copies of Config.APPOINTMENT_NOTIFICATION_* defaults as of this revision
+APPOINTMENT_NOTIFICATION_TIME = 60 * 60
+APPOINTMENT_NOTIFICATION_COOLDOWN = 20 * 60
+APPOINTMENT_NOTIFICATION_LIMIT = 2
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reminder",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True, comment="Reminder id."),
+        sa.Column("auid", sa.UUID, nullable=False, comment="Appointment unique id (as uuid)."),
+        sa.Column("telegram_id", sa.String(100), nullable=False, comment="Recipient telegram id."),
+        sa.Column("for_master", sa.Boolean, nullable=False, comment="Is recipient a master of the appointment."),
+        sa.Column(
+            "appointment_datetime",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            comment="Appointment date and time.",
+        ),
+        sa.Column("due_at", sa.DateTime(timezone=True), nullable=False, comment="When reminder has to be sent."),
+    )
+    op.create_index("ix_reminder_due_at", "reminder", ["due_at"])
+    op.create_index("ix_reminder_auid", "reminder", ["auid"])
+    # plan reminders of already booked appointments (the ones that were sent are skipped)
+    op.execute(
+        sa.text(
+            "INSERT INTO reminder (auid, telegram_id, for_master, appointment_datetime, due_at) "
+            "SELECT DISTINCT a.auid, r.telegram_id, r.for_master, a.datetime, "
+            "greatest(a.datetime - make_interval(secs => :lead_time) + make_interval(secs => n * :cooldown), now()) "
+            "FROM appointment a "
+            "CROSS JOIN LATERAL (VALUES (a.client_telegram_id, false), (a.master_telegram_id, true)) "
+            "AS r(telegram_id, for_master) "
+            "CROSS JOIN generate_series(0, :notification_limit - 1) AS n "
+            "WHERE a.is_reserved AND a.client_telegram_id IS NOT NULL AND a.datetime > now() "
+            "AND n * :cooldown < :lead_time AND n >= coalesce(a.notifications, 0)"
+        ).bindparams(
+            lead_time=APPOINTMENT_NOTIFICATION_TIME,
+            cooldown=APPOINTMENT_NOTIFICATION_COOLDOWN,
+            notification_limit=APPOINTMENT_NOTIFICATION_LIMIT,
+        )
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("reminder")
@@ -0,0 +1,38 @@
+"""Create dead_letter table for undelivered Telegram messages.
+
+Revision ID: 7c19f0e4a6d3
+Revises: e3f6a8d20b47
+Create Date: 2026-10-19 14:05:52.761204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c19f0e4a6d3'
+down_revision: Union[str, None] = 'e3f6a8d20b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "dead_letter",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True, comment="Dead letter id."),
+        sa.Column("chat_id", sa.String(100), nullable=False, comment="Telegram chat id."),
+        sa.Column("method", sa.String(100), nullable=False, comment="Bot API method."),
+        sa.Column("payload", JSONB, comment="Bot API method params."),
+        sa.Column("error", sa.String(1000), comment="Last delivery error."),
+        sa.Column("attempts", sa.Integer, comment="Number of delivery attempts."),
+        sa.Column(
+            "created_ts", sa.DateTime(timezone=True), server_default=sa.text("now()"), comment="Dead letter timestamp."
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("dead_letter")
@@ -0,0 +1,42 @@
+"""Create outbox table for notifications written together with appointment changes.
+
+Revision ID: 9b4e1d7a2c58
+Revises: 7c19f0e4a6d3
+Create Date: 2026-10-19 15:21:07.483920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e1d7a2c58'
+down_revision: Union[str, None] = '7c19f0e4a6d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True, comment="Outbox message id."),
+        sa.Column("chat_id", sa.String(100), nullable=False, comment="Telegram chat id."),
+        sa.Column("text", sa.String(4096), nullable=False, comment="Message text."),
+        sa.Column("parse_mode", sa.String(100), comment="Message parse mode."),
+        sa.Column("attempts", sa.Integer, server_default=sa.text("0"), comment="Number of dispatch attempts."),
+        sa.Column(
+            "locked_until",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            comment="Message is claimed by a dispatcher until this timestamp.",
+        ),
+        sa.Column(
+            "created_ts", sa.DateTime(timezone=True), server_default=sa.text("now()"), comment="Outbox message timestamp."
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("outbox")
@@ -0,0 +1,82 @@
+"""Move volatile navigation state and counters from npb_user to user_session table.
+
+Revision ID: a41e7c2d9b15
+Revises: 03cffb433f70
+Create Date: 2026-10-19 10:12:41.203311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41e7c2d9b15'
+down_revision: Union[str, None] = '03cffb433f70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# frozen copies of Config.USER_SESSION_* defaults as of this revision
+USER_SESSION_FILLFACTOR = 50
+USER_SESSION_UNLOGGED = False
+
+
+def _session_columns() -> list:
+    return [
+        sa.Column("state", sa.String(100), comment="FSM storage state."),
+        sa.Column("edit_mode", sa.String(100), comment="Edit mode."),
+        sa.Column("current_service", sa.String(100), comment="Current picked service."),
+        sa.Column("current_sub_service", sa.String(100), comment="Current picked sub service."),
+        sa.Column(
+            "current_calendar",
+            JSONB,
+            comment="Current calendar state.",
+            server_default=sa.text("'{}'::jsonb"),
+        ),
+        sa.Column("current_day", sa.Integer, comment="Current picked day."),
+        sa.Column("current_month", sa.Integer, comment="Current picked month."),
+        sa.Column("current_year", sa.Integer, comment="Current picked year."),
+        sa.Column("current_appointment", sa.UUID, comment="Current picked appointment."),
+        sa.Column("current_master", sa.String(100), comment="Current picked master"),
+        sa.Column("current_page", sa.Integer, comment="Current picked page"),
+        sa.Column("last_ts", sa.DateTime, comment="Last activity timestamp."),
+        sa.Column("flood_count", sa.Integer, comment="Number of user actions considered as flood."),
+        sa.Column("flood_ts", sa.DateTime, comment="Flood last timestamp."),
+        sa.Column("non_recogn_count", sa.Integer, comment="Number of non recognized phrases."),
+        sa.Column("non_recogn_ts", sa.DateTime, comment="Non recognized phrases last timestamp."),
+    ]
+
+
+def upgrade() -> None:
+    columns = _session_columns()
+    column_names = ", ".join(column.name for column in columns)
+    op.create_table(
+        "user_session",
+        sa.Column(
+            "telegram_id",
+            sa.String(100),
+            sa.ForeignKey("npb_user.telegram_id", ondelete="CASCADE"),
+            primary_key=True,
+            nullable=False,
+            comment="Telegram id.",
+        ),
+        *columns,
+        prefixes=["UNLOGGED"] if USER_SESSION_UNLOGGED else [],
+    )
+    # leave free space in every page, so that updates of a row stay on the same page (HOT updates)
+    op.execute(f"ALTER TABLE user_session SET (fillfactor = {USER_SESSION_FILLFACTOR})")
+    op.execute(
+        f"INSERT INTO user_session (telegram_id, {column_names}) SELECT telegram_id, {column_names} FROM npb_user"
+    )
+    for column in columns:
+        op.drop_column("npb_user", column.name)
+
+
+def downgrade() -> None:
+    columns = _session_columns()
+    for column in columns:
+        op.add_column("npb_user", column)
+    assignments = ", ".join(f"{column.name} = s.{column.name}" for column in columns)
+    op.execute(f"UPDATE npb_user u SET {assignments} FROM user_session s WHERE s.telegram_id = u.telegram_id")
+    op.drop_table("user_session")
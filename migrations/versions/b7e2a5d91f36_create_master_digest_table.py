@@ -0,0 +1,32 @@
+"""Create master_digest table marking days the masters digest was sent for.
+
+Revision ID: b7e2a5d91f36
+Revises: 6d1c9e4f8a27
+Create Date: 2026-10-19 17:34:52.118407
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2a5d91f36'
+down_revision: Union[str, None] = '6d1c9e4f8a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "master_digest",
+        sa.Column("day", sa.Date, primary_key=True, comment="Day the digest was sent for."),
+        sa.Column(
+            "created_ts", sa.DateTime(timezone=True), server_default=sa.text("now()"), comment="Digest timestamp."
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("master_digest")
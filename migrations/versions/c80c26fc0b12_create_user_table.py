@@ -66,7 +66,7 @@ def upgrade() -> None:
             "current_calendar",
             JSONB,
             comment="Current calendar state.",
-            server_default=CommonConstants.TEMPORARY_DATA["current_calendar"],
+            server_default=sa.text("'{}'::jsonb"),
         ),
         sa.Column(
             "current_day",
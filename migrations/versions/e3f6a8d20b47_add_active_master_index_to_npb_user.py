@@ -0,0 +1,31 @@
+"""Add partial index for active masters to npb_user table.
+
+Revision ID: e3f6a8d20b47
+Revises: 5d2b8e91c7f4
+Create Date: 2026-10-19 12:21:05.118904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3f6a8d20b47'
+down_revision: Union[str, None] = '5d2b8e91c7f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_npb_user_active_master_seq_id",
+        "npb_user",
+        ["seq_id"],
+        postgresql_where=sa.text("is_master IS true AND is_active IS true"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_npb_user_active_master_seq_id", table_name="npb_user")
@@ -0,0 +1,45 @@
+"""Create broadcast table for resumable admin broadcasts.
+
+Revision ID: e5c8d2a7b143
+Revises: 4a9f3b6e2d85
+Create Date: 2026-10-19 18:52:44.309187
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c8d2a7b143'
+down_revision: Union[str, None] = '4a9f3b6e2d85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "broadcast",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True, comment="Broadcast id."),
+        sa.Column(
+            "admin_telegram_id", sa.String(100), nullable=False, comment="Telegram id of admin who started it."
+        ),
+        sa.Column("audience", sa.String(20), nullable=False, comment="Recipients: 'masters', 'clients' or 'all'."),
+        sa.Column("text", sa.String(4096), comment="Message text."),
+        sa.Column(
+            "status", sa.String(20), nullable=False, server_default="draft", comment="'draft', 'running' or 'done'."
+        ),
+        sa.Column("last_seq_id", sa.Integer, server_default=sa.text("0"), comment="Last processed recipient seq_id."),
+        sa.Column("sent", sa.Integer, server_default=sa.text("0"), comment="Number of delivered messages."),
+        sa.Column("failed", sa.Integer, server_default=sa.text("0"), comment="Number of undelivered messages."),
+        sa.Column(
+            "created_ts", sa.DateTime(timezone=True), server_default=sa.text("now()"), comment="Broadcast timestamp."
+        ),
+        sa.Column("finished_ts", sa.DateTime(timezone=True), comment="Broadcast finish timestamp."),
+    )
+    op.create_index("ix_broadcast_status", "broadcast", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_table("broadcast")
@@ -0,0 +1,56 @@
+"""Store master's calendar selection as a days bitmask instead of nested JSONB.
+
+Revision ID: f2b7c4e9a6d1
+Revises: e5c8d2a7b143
+Create Date: 2026-10-19 20:31:07.518264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7c4e9a6d1'
+down_revision: Union[str, None] = 'e5c8d2a7b143'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user_session",
+        sa.Column(
+            "current_calendar_mask",
+            sa.Integer,
+            nullable=False,
+            server_default="0",
+            comment="Days picked in current month of master's calendar (bit day - 1 is set for a picked day).",
+        ),
+    )
+    # only the current month is ever selected, selections of other months are dropped
+    op.execute(
+        "UPDATE user_session SET current_calendar_mask = ("
+        "SELECT coalesce(bit_or(1 << (day::int - 1)), 0) "
+        "FROM jsonb_object_keys(current_calendar -> current_year::text -> current_month::text) AS day"
+        ") WHERE current_year IS NOT NULL AND current_month IS NOT NULL "
+        "AND jsonb_typeof(current_calendar -> current_year::text -> current_month::text) = 'object'"
+    )
+    op.drop_column("user_session", "current_calendar")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "user_session",
+        sa.Column("current_calendar", JSONB, comment="Current calendar state.", server_default=sa.text("'{}'::jsonb")),
+    )
+    op.execute(
+        "UPDATE user_session SET current_calendar = jsonb_build_object("
+        "current_year::text, jsonb_build_object(current_month::text, ("
+        "SELECT jsonb_object_agg(day::text, true) FROM generate_series(1, 31) AS day "
+        "WHERE current_calendar_mask & (1 << (day - 1)) <> 0"
+        "))) WHERE current_calendar_mask <> 0 AND current_year IS NOT NULL AND current_month IS NOT NULL"
+    )
+    op.drop_column("user_session", "current_calendar_mask")
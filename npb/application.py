@@ -10,24 +10,33 @@ from aiogram.types import ErrorEvent, BotCommand, Update, User as AiogramUser, I
 from alembic import command
 from fastapi import FastAPI
 
-from npb.background import periodic_task
+from npb.background import master_digest_task, partition_maintenance_task, periodic_task
 from npb.config import CommonConstants
 from npb.db.api import User
 from npb.db.core import engine
 from npb.db.sa_models import user_table
 from npb.db.utils import WhereClause
+from npb.leader import get_leader_elector
 from npb.logger import get_logger
+from npb.middlewares import HandlerInfoMiddleware, UpdateMetricsMiddleware
+from npb.scheduler import get_reminder_scheduler
 from npb.routes.tg.admin import admin_router
 from npb.routes.tg.entry_point import entry_point_router
 from npb.routes.tg.client import client_router
 from npb.routes.tg.master import master_router
 from npb.routes.tg.registration_form import registration_form_router
 from npb.routes.tg.unrecognized import unrecognized_router
+from npb.routes.web.metrics import router as metrics_router
 from npb.routes.web.webhook import router as webhook_router
 from npb.tg.black_list import get_black_list_manager
+from npb.tg.broadcast import get_broadcast_runner
 from npb.tg.bot import bot
 from npb.tg.bot import Config
 from npb.tg.dispatcher import dp
+from npb.tg.fast_routes import FastRouteMiddleware
+from npb.tg.idempotency import get_callback_deduplicator
+from npb.tg.outbox import get_outbox_dispatcher
+from npb.tg.view_cache import get_rendered_view_cache
 
 
 def create_app() -> FastAPI:
@@ -40,6 +49,7 @@ def create_app() -> FastAPI:
     """
     web_app = FastAPI()
     web_app.include_router(webhook_router)
+    web_app.include_router(metrics_router)
 
     dp.include_router(entry_point_router)
     dp.include_router(registration_form_router)
@@ -64,7 +74,18 @@ def create_app() -> FastAPI:
         if message := event.update.message:
             await message.answer(text=text)
         else:
-            await event.update.callback_query.message.answer(text=text)
+            callback_message = event.update.callback_query.message
+            # the failed edit might not have been shown, so it must not be skipped next time
+            get_rendered_view_cache().forget(chat_id=callback_message.chat.id, message_id=callback_message.message_id)
+            # and the user must be able to retry at once
+            get_callback_deduplicator().release(callback=event.update.callback_query)
+            await callback_message.answer(text=text)
+
+    # outermost: update latency includes authorization and routing
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    # inner middlewares of the dispatcher are applied to handlers of all routers
+    dp.message.middleware(HandlerInfoMiddleware())
+    dp.callback_query.middleware(HandlerInfoMiddleware())
 
     @dp.update.outer_middleware()
     async def authorization_and_flood_control(
@@ -112,6 +133,9 @@ def create_app() -> FastAPI:
                 return
         return await handler(event, data)
 
+    # registered after authorization: routed callbacks skip routers, but not the checks above
+    dp.update.outer_middleware(FastRouteMiddleware())
+
     @web_app.on_event("startup")
     async def web_app_startup():
         logger = get_logger()
@@ -138,7 +162,13 @@ def create_app() -> FastAPI:
             else:
                 await bot.set_webhook(Config.TELEGRAM_WEBHOOK_URL)
             logger.info(f"telegram webhook set to {Config.TELEGRAM_WEBHOOK_URL}")
+        asyncio.create_task(get_leader_elector().run())
         asyncio.create_task(periodic_task())
+        asyncio.create_task(partition_maintenance_task())
+        asyncio.create_task(master_digest_task())
+        asyncio.create_task(get_reminder_scheduler().run())
+        asyncio.create_task(get_outbox_dispatcher().run())
+        asyncio.create_task(get_broadcast_runner().run())
         # TODO: SetMyCommands and GetMyCommands triggers Telegram Flood Control
         my_commands = await bot.get_my_commands(language_code="ru")
         print("DEBUG my_commands: ", my_commands)
@@ -152,6 +182,7 @@ def create_app() -> FastAPI:
     @web_app.on_event("shutdown")
     async def web_app_shutdown():
         # shutdown logger and other stuf
+        await get_leader_elector().stop()
         print("web_app_shutdown")
         await bot.session.close()
 
@@ -1,37 +1,109 @@
 import asyncio
 import traceback
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 from logging import Logger
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, List, Sequence
 
-from sqlalchemy import update, func
+from sqlalchemy import Row, update, func, or_
 
 from npb.config import Config, CommonConstants
-from npb.db.api import User, Appointment
+from npb.db.api import User, Appointment, MasterDigest, Outbox, Reminder
 from npb.db.core import engine
-from npb.db.sa_models import user_table, appointment_table
+from npb.db.partitions import maintain_appointment_partitions
+from npb.db.sa_models import user_session_table, appointment_table
 from npb.db.utils import WhereClause, basic_update, Join
+from npb.leader import get_leader_elector
 from npb.logger import get_logger
-from npb.utils.common import appointment_info, _prepare_user_info, notify_user
+from npb.metrics import get_metrics_registry
+from npb.text.registration_form import bp
+from npb.tg.models import OutboxMessageModel
+from npb.utils.common import appointment_info, escape_markdown, _prepare_user_info
+
+
+job_runs_counter = get_metrics_registry().counter(
+    "npb_background_job_runs_total", "Number of background job runs.", ["job", "status"]
+)
+job_duration_histogram = get_metrics_registry().histogram(
+    "npb_background_job_duration_seconds", "Duration of background job runs.", ["job"]
+)
+
+
+async def run_job(name: str, job: Callable[[], Awaitable], logger: Logger) -> None:
+    """
+    Run a background job, log its errors and record its metrics.
+    :param name: Job name.
+    :param job: Job to run.
+    :param logger: Logger.
+    """
+    started = monotonic()
+    status = "success"
+    try:
+        await job()
+    except Exception as exc:
+        status = "error"
+        details = traceback.format_exception(exc)
+        logger.error(f"Unexpected error in background job {name}: {exc}. Details: {details}.")
+    finally:
+        job_runs_counter.inc(job=name, status=status)
+        job_duration_histogram.observe(monotonic() - started, job=name)
 
 
 async def periodic_task():
     logger = get_logger()
+    leader_elector = get_leader_elector()
+    while True:
+        await asyncio.sleep(Config.WATCHDOG_TIMEOUT)
+        if not leader_elector.is_leader:
+            continue
+        await run_job(name="drop_counters", job=lambda: drop_counters(logger=logger), logger=logger)
+        await run_job(name="drop_non_recogn", job=lambda: drop_non_recogn(logger=logger), logger=logger)
+
+
+async def partition_maintenance_task():
+    logger = get_logger()
+    leader_elector = get_leader_elector()
+    last_run = None
+    while True:
+        # checked as often as leadership, so that a new leader catches up without waiting for a whole period
+        if leader_elector.is_leader and (
+            last_run is None or monotonic() - last_run >= Config.APPOINTMENT_PARTITION_MAINTENANCE_TIMEOUT
+        ):
+            last_run = monotonic()
+            await run_job(
+                name="partition_maintenance",
+                job=lambda: maintain_appointment_partitions(engine=engine, logger=logger),
+                logger=logger,
+            )
+        await asyncio.sleep(Config.LEADER_CHECK_INTERVAL)
+
+
+async def master_digest_task():
+    logger = get_logger()
+    leader_elector = get_leader_elector()
+    tz = timezone(timedelta(hours=Config.TZ_OFFSET))
+    last_day = None
     while True:
-        try:
-            await asyncio.sleep(Config.WATCHDOG_TIMEOUT)
-            await drop_counters(logger=logger)
-            await drop_non_recogn(logger=logger)
-            await appointment_notification(logger=logger)
-        except Exception as exc:
-            details = traceback.format_exception(exc)
-            logger.error(f"Unexpected error in background task: {exc}. Details: {details}.")
+        now = datetime.now(tz=tz)
+        day = (now + timedelta(days=1)).date()
+        # 'master_digest' table guarantees a single digest per day, 'last_day' only saves DB round trips
+        if leader_elector.is_leader and now.hour >= Config.MASTER_DIGEST_HOUR and day != last_day:
+            last_day = day
+            await run_job(
+                name="master_digest",
+                job=lambda: master_digest(day=day, logger=logger),
+                logger=logger,
+            )
+        await asyncio.sleep(Config.LEADER_CHECK_INTERVAL)
 
 
 async def drop_counters(logger: Logger):
-    now = datetime.now()
+    border = datetime.now() - timedelta(seconds=Config.COUNTERS_THRESHOLD)
+    # only expired non-zero counters are touched (see partial index 'ix_user_session_flood_ts')
     where_clause = WhereClause(
         filter=[
-            now - user_table.c.flood_ts > timedelta(seconds=Config.COUNTERS_THRESHOLD)
+            user_session_table.c.flood_count > 0,
+            or_(user_session_table.c.flood_ts.is_(None), user_session_table.c.flood_ts < border),
         ]
     )
     data_to_set = {
@@ -40,19 +112,23 @@ async def drop_counters(logger: Logger):
     }
     result = await basic_update(
         engine=engine,
-        table=user_table,
+        table=user_session_table,
         data_to_set=data_to_set,
         where_clause=where_clause,
-        returning_values=[user_table.c.telegram_id]
+        returning_values=[user_session_table.c.telegram_id]
     )
     logger.info(f"Drop counters job: flood counters dropped - {result}")
 
 
 async def drop_non_recogn(logger: Logger):
+    # expired counters start over on the next phrase anyway (see UserSession.increase_non_recognized_count), the job
+    # keeps partial index 'ix_user_session_non_recogn_ts' small
+    border = datetime.now() - timedelta(seconds=Config.COUNTERS_THRESHOLD)
     where_clause = WhereClause(
-        params=[user_table.c.non_recogn_count],
-        values=[0],
-        comparison_operators=[">"],
+        filter=[
+            user_session_table.c.non_recogn_count > 0,
+            or_(user_session_table.c.non_recogn_ts.is_(None), user_session_table.c.non_recogn_ts < border),
+        ]
     )
     data_to_set = {
         "non_recogn_count": 0,
@@ -60,29 +136,104 @@ async def drop_non_recogn(logger: Logger):
     }
     result = await basic_update(
         engine=engine,
-        table=user_table,
+        table=user_session_table,
         data_to_set=data_to_set,
         where_clause=where_clause,
-        returning_values=[user_table.c.telegram_id]
+        returning_values=[user_session_table.c.telegram_id]
     )
     logger.info(f"Drop non_recogn job: non-recogn counters dropped - {result}")
 
 
+def reminder_notifications(reminders: Sequence[Row]) -> List[OutboxMessageModel]:
+    """
+    Build reminder messages: one message per recipient listing all of their claimed appointments.
+    :param reminders: Claimed reminders.
+    :return: Outbox messages.
+    """
+    now = datetime.now(tz=timezone.utc)
+    reminders_by_recipient: Dict[str, Dict[Any, Row]] = {}
+    for reminder in reminders:
+        if reminder.appointment_datetime <= now:
+            # scheduler was down for a while, there is nothing to remind about anymore
+            continue
+        # several reminders of one appointment may be claimed together, it is mentioned once
+        reminders_by_recipient.setdefault(reminder.telegram_id, {})[reminder.auid] = reminder
+    messages = []
+    for telegram_id, recipient_reminders in reminders_by_recipient.items():
+        recipient_reminders = sorted(recipient_reminders.values(), key=lambda reminder: reminder.appointment_datetime)
+        dates = [reminder.appointment_datetime.strftime("%d.%m.%Y %H:%M") for reminder in recipient_reminders]
+        if len(dates) == 1:
+            text = f"Напоминаем, что у Вас есть запись на {dates[0]}.\n"
+        else:
+            text = "Напоминаем, что у Вас есть записи на:\n" + "".join(f"- {date}\n" for date in dates)
+        sections = []
+        if any(reminder.for_master for reminder in recipient_reminders):
+            sections.append("'Мой график работы'")
+        if not all(reminder.for_master for reminder in recipient_reminders):
+            sections.append("'Мои записи'")
+        text += f"Более подробную информацию можно узнать в {'разделах' if len(sections) > 1 else 'разделе'} "
+        text += f"{' и '.join(sections)}."
+        messages.append(OutboxMessageModel(chat_id=telegram_id, text=text))
+    return messages
+
+
 async def appointment_notification(logger: Logger):
-    appointments = await Appointment(engine=engine, logger=logger).upcoming_appointments_notification()
-    logger.info(f"Appointment notification job: number of notifications to send {len(appointments)}")
-    tasks = []
-    for appointment in appointments:
-        text = f"Напоминаем, что у Вас есть запись на {appointment.datetime.strftime('%d.%m.%Y %H:%M')}.\n"
-        client_text = text + "Более подробную информацию можно узнать в разделе 'Мои записи'."
-        master_text = text + "Более подробную информацию можно узнать в разделе 'Мой график работы'."
-        tasks.extend(
-            [
-                notify_user(text=client_text, telegram_id=appointment.client_telegram_id, logger=logger),
-                notify_user(text=master_text, telegram_id=appointment.master_telegram_id, logger=logger),
+    while True:
+        # reminders are claimed and their messages are written to outbox in one transaction
+        reminders = await Reminder(engine=engine, logger=logger).claim_due_reminders(
+            limit=Config.REMINDER_BATCH_SIZE,
+            coalesce_window=Config.REMINDER_COALESCE_WINDOW,
+            transaction_hooks=[Outbox.enqueue_hook(reminder_notifications)],
+        )
+        logger.info(f"Appointment notification job: number of notifications to send {len(reminders)}")
+        if len(reminders) < Config.REMINDER_BATCH_SIZE:
+            break
+
+
+def master_digest_notifications(agenda: Sequence[Row]) -> List[OutboxMessageModel]:
+    """
+    Build masters agenda messages.
+    :param agenda: Agenda rows (master_telegram_id, appointments as json list).
+    :return: Outbox messages.
+    """
+    tz = timezone(timedelta(hours=Config.TZ_OFFSET))
+    messages = []
+    for master_agenda in agenda:
+        lines = []
+        for appointment in master_agenda.appointments:
+            appointment_datetime = datetime.fromisoformat(appointment["datetime"]).astimezone(tz)
+            contacts = [
+                escape_markdown(value)
+                for value in (
+                    appointment["name"],
+                    appointment["phone_number"],
+                    f"@{appointment['telegram_profile']}" if appointment["telegram_profile"] else None,
+                )
+                if value
             ]
+            line = f"{bp} *{appointment_datetime.strftime('%H:%M')}*"
+            if appointment["service"]:
+                line += f" {escape_markdown(appointment['service'])}"
+            if contacts:
+                line += f" ({', '.join(contacts)})"
+            lines.append(line)
+        day = datetime.fromisoformat(master_agenda.appointments[0]["datetime"]).astimezone(tz)
+        text = (
+            f"Ваши записи на завтра, {day.day} {Config.MONTHS_MAP[day.month][1]}:\n" + "\n".join(lines) +
+            "\n\nБолее подробную информацию можно узнать в разделе 'Мой график работы'."
         )
-    results = await asyncio.gather(*tasks, return_exceptions=False)
-    for result in results:
-        if isinstance(result, Exception):
-            logger.error(f"Unexpected error in appointment_notification: {result}.")
+        messages.append(OutboxMessageModel(chat_id=master_agenda.master_telegram_id, text=text))
+    return messages
+
+
+async def master_digest(day: date, logger: Logger):
+    tz = timezone(timedelta(hours=Config.TZ_OFFSET))
+    day_start = datetime(year=day.year, month=day.month, day=day.day, tzinfo=tz)
+    # agenda of every master is read with one grouped query and written to outbox in the same transaction
+    agenda = await MasterDigest(engine=engine, logger=logger).create_digest(
+        day=day,
+        day_start=day_start,
+        day_end=day_start + timedelta(days=1),
+        transaction_hooks=[Outbox.enqueue_hook(master_digest_notifications)],
+    )
+    logger.info(f"Master digest job: digests for {day} - {len(agenda)}")
@@ -0,0 +1,172 @@
+"""
+Microbenchmark of calendar keyboard rendering: builders that create the whole month grid on every click (as they
+were before npb.utils.tg.calendar_keyboard) against the cached month layout with patched availability markers.
+
+Both variants must render the same keyboards (client day picker buttons carry booking context since
+npb.tg.callbacks, so only its layout is compared), it is checked before measuring:
+
+    python -m npb.bench.calendar_render --renders 20000
+"""
+import argparse
+import asyncio
+import calendar
+import io
+import random
+from contextlib import redirect_stdout
+from copy import copy
+from datetime import datetime
+from time import perf_counter
+from typing import Callable, Dict, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from npb.config import CommonConstants, MasterConstants
+from npb.utils.tg.client import pick_day_keyboard
+from npb.utils.tg.master import edit_month_calendar
+
+MASTER_TELEGRAM_ID = "123456789"
+
+
+def legacy_pick_day_keyboard(
+    picked_month: int,
+    picked_year: int,
+    master_time_slots: Dict[int, bool],
+) -> InlineKeyboardMarkup:
+    buttons = copy(CommonConstants.WEEK_DAYS_AS_BUTTONS)
+    now = datetime.now()
+    month = calendar.monthcalendar(year=picked_year, month=picked_month)
+    for week in month:
+        days = []
+        for day in week:
+            text = f"{day}"
+            callback_data = f"{text}"
+            if day == 0 or (day < now.day and picked_month == now.month):
+                text = " "
+                callback_data = MasterConstants.CALENDAR_IGNORE
+            elif master_time_slots.get(day):
+                text = f"🟢{day}"
+            elif not master_time_slots.get(day):
+                callback_data = MasterConstants.CALENDAR_IGNORE
+            days.append(InlineKeyboardButton(text=text, callback_data=callback_data))
+        buttons.append(days)
+    if picked_month == now.month and picked_year == now.year:
+        buttons.append([InlineKeyboardButton(text="➡️", callback_data=MasterConstants.CALENDAR_FORWARD)])
+    else:
+        buttons.append(
+            [
+                InlineKeyboardButton(text="⬅️", callback_data=MasterConstants.CALENDAR_BACK),
+                InlineKeyboardButton(text="➡️", callback_data=MasterConstants.CALENDAR_FORWARD),
+            ]
+        )
+    return InlineKeyboardMarkup(inline_keyboard=buttons, row_width=1)
+
+
+def legacy_master_calendar(
+    picked_day: int, picked_month: int, picked_year: int, appointments: Dict[int, bool]
+) -> InlineKeyboardMarkup:
+    """
+    Master's timetable view (appointments markers) as built by edit_month_calendar before.
+    """
+    buttons = copy(CommonConstants.WEEK_DAYS_AS_BUTTONS)
+    now = datetime.now()
+    month = calendar.monthcalendar(year=picked_year, month=picked_month)
+    for week in month:
+        days = []
+        for day in week:
+            text = callback_data = str(day)
+            if day == 0 or (day < now.day and picked_month == now.month):
+                text = " "
+                callback_data = MasterConstants.CALENDAR_IGNORE
+            elif appointments.get(day):
+                text = f"🟢{day}" if day == picked_day else f"🟡{day}"
+            days.append(InlineKeyboardButton(text=text, callback_data=callback_data))
+        buttons.append(days)
+    if picked_month == now.month and picked_year == now.year:
+        buttons.append([InlineKeyboardButton(text="➡️", callback_data=MasterConstants.CALENDAR_FORWARD)])
+    elif picked_month >= now.month + 2:
+        buttons.append([InlineKeyboardButton(text="⬅️", callback_data=MasterConstants.CALENDAR_BACK)])
+    else:
+        buttons.append(
+            [
+                InlineKeyboardButton(text="⬅️", callback_data=MasterConstants.CALENDAR_BACK),
+                InlineKeyboardButton(text="➡️", callback_data=MasterConstants.CALENDAR_FORWARD),
+            ]
+        )
+    buttons.append([InlineKeyboardButton(text="Режим редактирования", callback_data=MasterConstants.EDIT_TIMETABLE)])
+    return InlineKeyboardMarkup(inline_keyboard=buttons, row_width=1)
+
+
+def master_calendar(picked_day: int, picked_month: int, picked_year: int, appointments: Dict[int, bool]):
+    with redirect_stdout(io.StringIO()):  # edit_month_calendar prints debug output
+        keyboard, _ = asyncio.run(
+            edit_month_calendar(
+                picked_day=str(picked_day),
+                picked_month=picked_month,
+                picked_year=picked_year,
+                appointments=appointments,
+            )
+        )
+    return keyboard
+
+
+def layout(keyboard: InlineKeyboardMarkup):
+    return [[button.text for button in row] for row in keyboard.inline_keyboard]
+
+
+def random_case(generator: random.Random, now: datetime) -> Tuple[int, int, Dict[int, bool]]:
+    month = (now.month + generator.randint(0, 2) - 1) % 12 + 1
+    year = now.year + (1 if month < now.month else 0)
+    slots = {day: True for day in range(1, 29) if generator.random() < 0.4}
+    return month, year, slots
+
+
+def measure(render: Callable[[], InlineKeyboardMarkup], renders: int) -> float:
+    start = perf_counter()
+    for _ in range(renders):
+        render()
+    return (perf_counter() - start) / renders * 10 ** 6
+
+
+def main(renders: int, seed: int) -> None:
+    generator = random.Random(seed)
+    now = datetime.now()
+    cases = [random_case(generator, now) for _ in range(100)]
+    for month, year, slots in cases:
+        picked_day = next(iter(slots), 1)
+        assert (
+            layout(pick_day_keyboard(month, year, slots, MASTER_TELEGRAM_ID)) ==
+            layout(legacy_pick_day_keyboard(month, year, slots))
+        )
+        assert (
+            master_calendar(picked_day, month, year, slots) == legacy_master_calendar(picked_day, month, year, slots)
+        )
+    month, year, slots = cases[0]
+    results = {
+        "client day picker, legacy": measure(lambda: legacy_pick_day_keyboard(month, year, slots), renders),
+        "client day picker, cached": measure(
+            lambda: pick_day_keyboard(month, year, slots, MASTER_TELEGRAM_ID), renders
+        ),
+        # edit_month_calendar is a coroutine, legacy builder is measured without event loop overhead
+        "master calendar, legacy": measure(lambda: legacy_master_calendar(1, month, year, slots), renders),
+    }
+    loop = asyncio.new_event_loop()
+    with redirect_stdout(io.StringIO()):
+        results["master calendar, cached"] = measure(
+            lambda: loop.run_until_complete(
+                edit_month_calendar(
+                    picked_day="1", picked_month=month, picked_year=year, appointments=slots
+                )
+            ),
+            renders,
+        )
+    loop.close()
+    for name, microseconds in results.items():
+        print(f"{name}: {microseconds:.1f} us per render")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calendar keyboard rendering microbenchmark.")
+    parser.add_argument("--renders", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(renders=args.renders, seed=args.seed)
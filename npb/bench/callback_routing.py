@@ -0,0 +1,90 @@
+"""
+Benchmark of callback routing cost per update as the number of handlers grows: aiogram routers checking filters of
+every handler in order against the route table (npb.tg.fast_routes) resolving handlers with dict lookups.
+
+Handlers are spread over several routers like the bot's ones: each has a state and a namespaced callback constant,
+every router ends with a catch-all state handler. The update is routed to the last handler (worst case for routers):
+
+    python -m npb.bench.callback_routing --handlers 10 50 200 1000 --updates 2000
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from time import perf_counter
+from typing import List, Tuple
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.filters import StateFilter
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from npb.tg.fast_routes import FastRouteMiddleware, FastRouteTable
+
+CHAT_ID = 1
+ROUTERS = 5
+HANDLED = "handled"
+
+
+async def handler(callback: CallbackQuery) -> str:
+    return HANDLED
+
+
+def build_dispatcher(handlers: int, with_table: bool) -> Tuple[Dispatcher, List[State]]:
+    dispatcher = Dispatcher()
+    table = FastRouteTable()
+    states = []
+    routers = [Router() for _ in range(ROUTERS)]
+    per_router = max(handlers // ROUTERS, 1)
+    for number in range(handlers):
+        router = routers[min(number // per_router, ROUTERS - 1)]
+        state = State(state=f"h{number}", group_name="Bench")
+        states.append(state)
+        data = f"bench.h{number}"
+        if with_table:
+            table.route(router, data, state=state)(handler)
+        else:
+            router.callback_query(StateFilter(state), F.data == data)(handler)
+    for number, router in enumerate(routers):
+        router.callback_query(StateFilter(f"Bench:catch_all{number}"))(handler)
+        dispatcher.include_router(router)
+    if with_table:
+        dispatcher.update.outer_middleware(FastRouteMiddleware(table=table))
+    return dispatcher, states
+
+
+def callback_update(data: str) -> Update:
+    user = User(id=CHAT_ID, is_bot=False, first_name="bench")
+    message = Message(message_id=1, date=datetime.now(), chat=Chat(id=CHAT_ID, type="private"), text="bench")
+    callback = CallbackQuery(id="1", from_user=user, chat_instance="1", data=data, message=message)
+    return Update(update_id=1, callback_query=callback)
+
+
+async def measure(bot: Bot, handlers: int, with_table: bool, updates: int) -> float:
+    dispatcher, states = build_dispatcher(handlers=handlers, with_table=with_table)
+    key = StorageKey(bot_id=bot.id, chat_id=CHAT_ID, user_id=CHAT_ID)
+    await dispatcher.storage.set_state(key=key, state=states[-1])
+    update = callback_update(data=f"bench.h{handlers - 1}")
+    assert await dispatcher.feed_update(bot, update) == HANDLED  # warm up
+    start = perf_counter()
+    for _ in range(updates):
+        await dispatcher.feed_update(bot, update)
+    return (perf_counter() - start) / updates * 10 ** 6
+
+
+async def main(handlers: List[int], updates: int) -> None:
+    bot = Bot(token="123456:bench")
+    print(f"{'handlers':>8} {'routers, us':>12} {'table, us':>10}")
+    for number in handlers:
+        routers_time = await measure(bot=bot, handlers=number, with_table=False, updates=updates)
+        table_time = await measure(bot=bot, handlers=number, with_table=True, updates=updates)
+        print(f"{number:>8} {routers_time:>12.1f} {table_time:>10.1f}")
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Callback routing benchmark.")
+    parser.add_argument("--handlers", type=int, nargs="+", default=[10, 50, 200, 1000])
+    parser.add_argument("--updates", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(handlers=args.handlers, updates=args.updates))
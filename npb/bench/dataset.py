@@ -0,0 +1,305 @@
+"""
+Synthetic production-shaped dataset: masters with realistic services, clients, months of slots and bookings.
+
+Data is bulk loaded with COPY, generation is reproducible for a given seed:
+
+    python -m npb.bench.dataset --preset 100k --seed 42
+    python -m npb.bench.dataset --drop
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from time import monotonic
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from npb.config import Config
+from npb.db.api import Reminder
+from npb.db.core import engine
+from npb.db.partitions import add_months, create_missing_partitions, partition_month_start
+from npb.logger import get_logger
+
+DATASET_USER_PREFIX = "gen_"
+COPY_CHUNK_SIZE = 50000
+# share of masters offering a service, and probability to offer each of its sub services
+SERVICE_WEIGHTS = {"Маникюр": 0.55, "Ресницы": 0.3, "Педикюр": 0.15}
+SUB_SERVICE_PROBABILITY = 0.45
+SECOND_SERVICE_PROBABILITY = 0.25
+WORKING_DAY_PROBABILITY = 0.6
+SLOTS_PER_DAY = (2, 8)
+FIRST_SLOT_HOUR = 9
+PAST_BOOKING_PROBABILITY = 0.65
+FUTURE_BOOKING_PROBABILITY = 0.35
+
+
+class Preset(NamedTuple):
+    users: int
+    master_ratio: float
+    months_back: int
+    months_ahead: int
+
+
+PRESETS = {
+    "1k": Preset(users=1000, master_ratio=0.1, months_back=3, months_ahead=3),
+    "100k": Preset(users=100000, master_ratio=0.05, months_back=3, months_ahead=3),
+    "1m": Preset(users=1000000, master_ratio=0.02, months_back=2, months_ahead=2),
+}
+
+
+class DatasetSummary(NamedTuple):
+    users: int
+    masters: int
+    appointments: int
+    sample_master_telegram_id: str
+    sample_client_telegram_id: str
+
+
+class UserPlan(NamedTuple):
+    seq_id: int
+    telegram_id: str
+    is_master: bool
+    services: Dict[str, Dict[str, bool]]
+
+
+def pick_services(generator: random.Random) -> Dict[str, Dict[str, bool]]:
+    """
+    Pick master services in the same shape registration form stores them: {service: {sub_service: True}}.
+    :param generator: Random generator.
+    :return: Services.
+    """
+    names = list(Config.MASTER_SERVICES)
+    weights = [SERVICE_WEIGHTS.get(name, 1 / len(names)) for name in names]
+    picked = {generator.choices(names, weights=weights)[0]}
+    if generator.random() < SECOND_SERVICE_PROBABILITY:
+        picked.add(generator.choices(names, weights=weights)[0])
+    services = {}
+    for name in picked:
+        sub_services = [sub for sub in Config.MASTER_SERVICES[name] if generator.random() < SUB_SERVICE_PROBABILITY]
+        services[name] = {sub: True for sub in sub_services or Config.MASTER_SERVICES[name][:1]}
+    return services
+
+
+def plan_users(generator: random.Random, preset: Preset, prefix: str, first_seq_id: int) -> List[UserPlan]:
+    """
+    Decide who is a master and what services masters provide.
+    :param generator: Random generator.
+    :param preset: Dataset preset.
+    :param prefix: Telegram id prefix.
+    :param first_seq_id: First sequence id to use.
+    :return: Users.
+    """
+    users = []
+    for number in range(1, preset.users + 1):
+        is_master = generator.random() < preset.master_ratio
+        users.append(
+            UserPlan(
+                seq_id=first_seq_id + number,
+                telegram_id=f"{prefix}{number}",
+                is_master=is_master,
+                services=pick_services(generator) if is_master else {},
+            )
+        )
+    return users
+
+
+def user_records(generator: random.Random, users: List[UserPlan]) -> Iterator[Tuple]:
+    """
+    Rows for 'npb_user' table.
+    :param generator: Random generator.
+    :param users: Users.
+    """
+    for user in users:
+        yield (
+            user.seq_id,
+            user.telegram_id,
+            f"@{user.telegram_id}",
+            f"Name {user.seq_id}",
+            json.dumps(user.services, ensure_ascii=False),
+            f"+7{generator.randrange(10 ** 9, 10 ** 10)}",
+            f"inst_{user.seq_id}" if user.is_master and generator.random() < 0.5 else None,
+            "Описание мастера. " * generator.randint(1, 10) if user.is_master else None,
+            user.is_master,
+            False,
+            not user.is_master or generator.random() < 0.9,
+            True,
+            0,
+        )
+
+
+USER_COLUMNS = [
+    "seq_id", "telegram_id", "telegram_profile", "name", "services", "phone_number", "instagram_link", "description",
+    "is_master", "is_admin", "is_active", "fill_reg_form", "ban_counter",
+]
+APPOINTMENT_COLUMNS = [
+    "auid", "client_telegram_id", "datetime", "service", "master_telegram_id", "is_reserved", "notifications",
+]
+
+
+def appointment_records(
+    generator: random.Random, users: List[UserPlan], first_day: datetime, last_day: datetime, now: datetime
+) -> Iterator[Tuple]:
+    """
+    Rows for 'appointment' table: slots of every master on working days, some of them booked by clients.
+    :param generator: Random generator.
+    :param users: Users.
+    :param first_day: First day with slots.
+    :param last_day: Day after the last day with slots.
+    :param now: Current moment (slots before it are past).
+    """
+    clients = [user.telegram_id for user in users if not user.is_master]
+    masters = [user for user in users if user.is_master]
+    days = (last_day - first_day).days
+    for master_number, master in enumerate(masters):
+        services = list(master.services)
+        for day_number in range(days):
+            if generator.random() >= WORKING_DAY_PROBABILITY:
+                continue
+            day = first_day + timedelta(days=day_number)
+            for slot in range(generator.randint(*SLOTS_PER_DAY)):
+                # 'datetime' is unique over the whole table, so slots of different masters differ in microseconds
+                slot_datetime = day + timedelta(hours=FIRST_SLOT_HOUR + slot, microseconds=master_number)
+                booking_probability = PAST_BOOKING_PROBABILITY if slot_datetime < now else FUTURE_BOOKING_PROBABILITY
+                is_reserved = bool(clients) and generator.random() < booking_probability
+                yield (
+                    UUID(int=generator.getrandbits(128), version=4),
+                    generator.choice(clients) if is_reserved else None,
+                    slot_datetime,
+                    generator.choice(services) if is_reserved else None,
+                    master.telegram_id,
+                    is_reserved,
+                    Config.APPOINTMENT_NOTIFICATION_LIMIT if is_reserved and slot_datetime < now else 0,
+                )
+
+
+async def copy_records(engine: AsyncEngine, table: str, columns: List[str], records: Iterable[Tuple]) -> int:
+    """
+    Bulk load records with COPY (in chunks, so that huge datasets are never fully materialized).
+    :param engine: DB engine.
+    :param table: Table name.
+    :param columns: Column names.
+    :param records: Records.
+    :return: Number of loaded records.
+    """
+    loaded = 0
+    iterator = iter(records)
+    async with engine.begin() as connection:
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        while chunk := list(islice(iterator, COPY_CHUNK_SIZE)):
+            await driver_connection.copy_records_to_table(table, records=chunk, columns=columns)
+            loaded += len(chunk)
+    return loaded
+
+
+async def drop_dataset(engine: AsyncEngine, prefix: str = DATASET_USER_PREFIX) -> None:
+    """
+    Delete generated data.
+    :param engine: DB engine.
+    :param prefix: Telegram id prefix.
+    """
+    async with engine.begin() as connection:
+        await connection.execute(
+            text("DELETE FROM reminder WHERE telegram_id LIKE :prefix || '%'"), {"prefix": prefix}
+        )
+        await connection.execute(
+            text(
+                "DELETE FROM appointment WHERE master_telegram_id LIKE :prefix || '%' "
+                "OR client_telegram_id LIKE :prefix || '%'"
+            ),
+            {"prefix": prefix},
+        )
+        await connection.execute(
+            text("DELETE FROM npb_user WHERE telegram_id LIKE :prefix || '%'"), {"prefix": prefix}
+        )
+
+
+async def load_dataset(
+    engine: AsyncEngine, preset: Preset, seed: int = 0, prefix: str = DATASET_USER_PREFIX, now: datetime = None
+) -> DatasetSummary:
+    """
+    Generate and bulk load a dataset.
+    :param engine: DB engine.
+    :param preset: Dataset preset.
+    :param seed: Random seed.
+    :param prefix: Telegram id prefix.
+    :param now: Current moment.
+    :return: Dataset summary.
+    """
+    logger = get_logger()
+    now = now or datetime.now(tz=timezone.utc)
+    generator = random.Random(seed)
+    async with engine.connect() as connection:
+        max_seq_id = (await connection.execute(text("SELECT coalesce(max(seq_id), 0) FROM npb_user"))).scalar_one()
+    users = plan_users(generator=generator, preset=preset, prefix=prefix, first_seq_id=max_seq_id)
+    loaded_users = await copy_records(
+        engine=engine, table="npb_user", columns=USER_COLUMNS, records=user_records(generator=generator, users=users)
+    )
+    await copy_records(
+        engine=engine,
+        table="user_session",
+        columns=["telegram_id"],
+        records=((user.telegram_id,) for user in users),
+    )
+    first_month = add_months(partition_month_start(now), -preset.months_back)
+    last_month = add_months(partition_month_start(now), preset.months_ahead)
+    await create_missing_partitions(engine=engine, first_month=first_month, last_month=last_month)
+    loaded_appointments = await copy_records(
+        engine=engine,
+        table="appointment",
+        columns=APPOINTMENT_COLUMNS,
+        records=appointment_records(
+            generator=generator,
+            users=users,
+            first_day=first_month,
+            last_day=add_months(last_month, 1),
+            now=now,
+        ),
+    )
+    async with engine.begin() as connection:
+        await connection.execute(Reminder.backfill_query(), {"now": now})
+    # statistics must be committed, otherwise plans are checked against a dataset the planner knows nothing about
+    async with engine.begin() as connection:
+        await connection.execute(text("ANALYZE npb_user, user_session, appointment, reminder"))
+    masters = [user.telegram_id for user in users if user.is_master]
+    clients = [user.telegram_id for user in users if not user.is_master]
+    summary = DatasetSummary(
+        users=loaded_users,
+        masters=len(masters),
+        appointments=loaded_appointments,
+        sample_master_telegram_id=masters[0] if masters else "",
+        sample_client_telegram_id=clients[0] if clients else "",
+    )
+    logger.info(f"Dataset loaded: {summary}")
+    return summary
+
+
+async def main(preset: Preset, seed: int, prefix: str, drop: bool) -> None:
+    started = monotonic()
+    await drop_dataset(engine=engine, prefix=prefix)
+    if not drop:
+        summary = await load_dataset(engine=engine, preset=preset, seed=seed, prefix=prefix)
+        print(
+            f"users: {summary.users} (masters: {summary.masters}), appointments: {summary.appointments}, "
+            f"elapsed: {monotonic() - started:.1f}s"
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic dataset generator.")
+    parser.add_argument("--preset", choices=list(PRESETS), default="1k")
+    parser.add_argument("--users", type=int, help="Override number of users of the preset.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefix", default=DATASET_USER_PREFIX, help="Telegram id prefix of generated users.")
+    parser.add_argument("--drop", action="store_true", help="Only delete previously generated data.")
+    args = parser.parse_args()
+    chosen_preset = PRESETS[args.preset]
+    if args.users:
+        chosen_preset = chosen_preset._replace(users=args.users)
+    asyncio.run(main(preset=chosen_preset, seed=args.seed, prefix=args.prefix, drop=args.drop))
@@ -0,0 +1,150 @@
+"""
+Local fake Bot API server for exercising the bot session (see npb.tg.session) without Telegram.
+
+The server answers every method with a plausible result, after a given latency and with a given share of 5xx
+errors. Run it together with a load of sendMessage requests and print outcome and latency per method:
+
+    python -m npb.bench.fake_bot_api --requests 2000 --failure-rate 0.3 --latency 0.05
+
+or run the server alone and point the bot to it with TG_API_BASE=http://localhost:8081:
+
+    python -m npb.bench.fake_bot_api --serve --port 8081
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Any, Dict
+
+from aiogram import Bot
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+from npb.metrics import get_metrics_registry
+from npb.tg.session import CircuitBreaker, NPBAiohttpSession
+
+FAKE_TOKEN = "42:fake"
+
+
+def fake_result(method: str, params: Dict[str, Any]) -> Any:
+    """
+    Build a plausible Bot API result.
+    :param method: Bot API method.
+    :param params: Request params.
+    :return: Result.
+    """
+    if method.lower() in ("sendmessage", "editmessagetext"):
+        return {
+            "message_id": int(params.get("message_id", random.randint(1, 10 ** 6))),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 1)), "type": "private"},
+            "text": params.get("text", ""),
+        }
+    return True
+
+
+def make_app(latency: float, failure_rate: float, seed: int) -> web.Application:
+    """
+    Create fake Bot API application.
+    :param latency: Response latency (in seconds).
+    :param failure_rate: Share of requests answered with 502.
+    :param seed: Random seed.
+    :return: Application.
+    """
+    generator = random.Random(seed)
+
+    async def handle(request: web.Request) -> web.Response:
+        params = dict(await request.post())
+        await asyncio.sleep(latency)
+        if generator.random() < failure_rate:
+            return web.json_response({"ok": False, "error_code": 502, "description": "Bad Gateway"}, status=502)
+        return web.json_response({"ok": True, "result": fake_result(request.match_info["method"], params)})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle)
+    return app
+
+
+async def run_load(base: str, requests: int, concurrency: int) -> Counter:
+    """
+    Send sendMessage requests through the bot session.
+    :param base: Fake Bot API base url.
+    :param requests: Number of requests.
+    :param concurrency: Number of concurrent requests.
+    :return: Number of requests by outcome.
+    """
+    session = NPBAiohttpSession(
+        api=TelegramAPIServer.from_base(base),
+        circuit_breaker=CircuitBreaker(failure_threshold=5, reset_timeout=0.5),
+    )
+    bot = Bot(token=FAKE_TOKEN, session=session)
+    outcomes = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(number: int) -> None:
+        async with semaphore:
+            try:
+                await bot.send_message(chat_id=number, text=f"message {number}")
+                outcomes["sent"] += 1
+            except Exception as exc:
+                outcomes["circuit_open" if "circuit breaker" in str(exc) else type(exc).__name__] += 1
+
+    try:
+        await asyncio.gather(*(send(number) for number in range(1, requests + 1)))
+    finally:
+        await session.close()
+    return outcomes
+
+
+async def main(requests: int, concurrency: int, latency: float, failure_rate: float, port: int, seed: int) -> None:
+    runner = web.AppRunner(make_app(latency=latency, failure_rate=failure_rate, seed=seed))
+    await runner.setup()
+    await web.TCPSite(runner, "localhost", port).start()
+    try:
+        start = time.monotonic()
+        outcomes = await run_load(base=f"http://localhost:{port}", requests=requests, concurrency=concurrency)
+        elapsed = time.monotonic() - start
+    finally:
+        await runner.cleanup()
+    print(f"requests: {requests}, elapsed: {elapsed:.2f}s ({requests / elapsed:.0f} requests/s)")
+    for outcome, count in sorted(outcomes.items()):
+        print(f"{outcome}: {count}")
+    for metric in get_metrics_registry().collect():
+        if metric.name.startswith("npb_tg_api_"):
+            for name, labels, value in metric.samples():
+                if not name.endswith("_bucket"):
+                    print(f"{name}{labels}: {value:.3f}")
+
+
+async def serve(latency: float, failure_rate: float, port: int, seed: int) -> None:
+    runner = web.AppRunner(make_app(latency=latency, failure_rate=failure_rate, seed=seed))
+    await runner.setup()
+    await web.TCPSite(runner, "localhost", port).start()
+    print(f"fake Bot API is listening on http://localhost:{port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Bot API server.")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02, help="Response latency in seconds.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with 502.")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--serve", action="store_true", help="Only run the server.")
+    args = parser.parse_args()
+    if args.serve:
+        asyncio.run(serve(latency=args.latency, failure_rate=args.failure_rate, port=args.port, seed=args.seed))
+    else:
+        asyncio.run(
+            main(
+                requests=args.requests,
+                concurrency=args.concurrency,
+                latency=args.latency,
+                failure_rate=args.failure_rate,
+                port=args.port,
+                seed=args.seed,
+            )
+        )
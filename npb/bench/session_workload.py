@@ -0,0 +1,223 @@
+"""
+Synthetic click workload for measuring write amplification and bloat of the volatile user data.
+
+Works with both schema layouts: navigation fields in 'npb_user' (revision 03cffb433f70) or in
+'user_session' (revision a41e7c2d9b15), so it can be run before and after the migration:
+
+    alembic downgrade 03cffb433f70 && python -m npb.bench.session_workload
+    alembic upgrade head && python -m npb.bench.session_workload
+
+Calendar selection is written as JSONB before revision f2b7c4e9a6d1 and as a days bitmask after it.
+"""
+import argparse
+import asyncio
+import json
+import random
+from time import monotonic
+from typing import Any, Dict
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from npb.db.core import engine
+from npb.logger import get_logger
+
+BENCH_USER_PREFIX = "bench_"
+
+
+async def get_session_table(connection: AsyncConnection) -> str:
+    """
+    Find out which table currently holds volatile navigation fields.
+    :param connection: DB connection.
+    :return: Table name.
+    """
+    query = text(
+        "SELECT table_name FROM information_schema.columns "
+        "WHERE column_name = 'state' AND table_name IN ('npb_user', 'user_session')"
+    )
+    return (await connection.execute(query)).scalar_one()
+
+
+async def get_calendar_column(connection: AsyncConnection) -> str:
+    """
+    Find out how calendar selection is stored.
+    :param connection: DB connection.
+    :return: Column name.
+    """
+    query = text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE column_name IN ('current_calendar', 'current_calendar_mask') "
+        "AND table_name IN ('npb_user', 'user_session')"
+    )
+    return (await connection.execute(query)).scalar_one()
+
+
+async def seed_users(engine: AsyncEngine, session_table: str, users: int) -> None:
+    """
+    Create bench users (and their sessions, if sessions live in a separate table).
+    :param engine: DB engine.
+    :param session_table: Table with volatile fields.
+    :param users: Number of users.
+    """
+    async with engine.begin() as connection:
+        await connection.execute(
+            text(
+                "INSERT INTO npb_user (seq_id, telegram_id, telegram_profile, name, is_master, is_admin, is_active, "
+                "fill_reg_form, ban_counter, services, description) "
+                "SELECT (SELECT coalesce(max(seq_id), 0) FROM npb_user) + n, :prefix || n, '@' || :prefix || n, :prefix || n, n % 5 = 0, false, true, false, 0, "
+                "'{\"Ресницы\": [\"Удлинение\"]}'::jsonb, repeat('description ', 40) "
+                "FROM generate_series(1, :users) AS n ON CONFLICT DO NOTHING"
+            ),
+            {"prefix": BENCH_USER_PREFIX, "users": users},
+        )
+        if session_table == "user_session":
+            await connection.execute(
+                text(
+                    "INSERT INTO user_session (telegram_id) SELECT telegram_id FROM npb_user "
+                    "WHERE telegram_id LIKE :prefix || '%' ON CONFLICT DO NOTHING"
+                ),
+                {"prefix": BENCH_USER_PREFIX},
+            )
+
+
+async def drop_users(engine: AsyncEngine) -> None:
+    """
+    Delete bench users.
+    :param engine: DB engine.
+    """
+    async with engine.begin() as connection:
+        await connection.execute(
+            text("DELETE FROM npb_user WHERE telegram_id LIKE :prefix || '%'"),
+            {"prefix": BENCH_USER_PREFIX},
+        )
+
+
+async def take_snapshot(engine: AsyncEngine, session_table: str) -> Dict[str, Any]:
+    """
+    Collect table statistics, relation sizes and current WAL position.
+    :param engine: DB engine.
+    :param session_table: Table with volatile fields.
+    :return: Snapshot.
+    """
+    snapshot = {}
+    async with engine.connect() as connection:
+        try:
+            # PG15+ flushes per backend stats lazily
+            await connection.execute(text("SELECT pg_stat_force_next_flush()"))
+        except Exception:
+            await connection.rollback()
+        snapshot["wal_lsn"] = (await connection.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar_one()
+        for table in {"npb_user", session_table}:
+            row = (await connection.execute(
+                text(
+                    "SELECT n_tup_upd, n_tup_hot_upd, n_dead_tup, pg_relation_size(relid), "
+                    "pg_total_relation_size(relid) FROM pg_stat_user_tables WHERE relname = :table"
+                ),
+                {"table": table},
+            )).one()
+            snapshot[table] = dict(zip(("upd", "hot_upd", "dead_tup", "heap_bytes", "total_bytes"), row))
+    return snapshot
+
+
+def random_click(session_table: str, calendar_column: str, telegram_id: str, generator: random.Random):
+    """
+    Build a query that imitates a single button press.
+    :param session_table: Table with volatile fields.
+    :param calendar_column: Column with calendar selection.
+    :param telegram_id: Telegram id.
+    :param generator: Random generator.
+    :return: Query and params.
+    """
+    assignments = ["last_ts = now()"]
+    params = {"telegram_id": telegram_id}
+    kind = generator.random()
+    if kind < 0.4:
+        assignments.append("state = :state")
+        params["state"] = generator.choice(("ClientStates:choose_service", "ClientStates:choose_master", "MasterStates:main"))
+    elif kind < 0.6:
+        assignments.extend(("current_month = :month", "current_year = :year"))
+        params.update(month=generator.randint(1, 12), year=generator.choice((2024, 2025)))
+    elif kind < 0.85 and calendar_column == "current_calendar_mask":
+        assignments.append("current_calendar_mask = :calendar")
+        params["calendar"] = generator.getrandbits(31)
+    elif kind < 0.85:
+        assignments.append("current_calendar = CAST(:calendar AS jsonb)")
+        params["calendar"] = json.dumps({str(day): generator.random() < 0.5 for day in range(1, 32)})
+    else:
+        assignments.append("current_page = :page")
+        params["page"] = generator.randint(0, 20)
+    query = text(f"UPDATE {session_table} SET {', '.join(assignments)} WHERE telegram_id = :telegram_id")
+    return query, params
+
+
+async def run_clicks(
+    engine: AsyncEngine, session_table: str, calendar_column: str, users: int, clicks: int, seed: int
+) -> float:
+    """
+    Run click workload.
+    :param engine: DB engine.
+    :param session_table: Table with volatile fields.
+    :param calendar_column: Column with calendar selection.
+    :param users: Number of users.
+    :param clicks: Number of clicks.
+    :param seed: Random seed.
+    :return: Elapsed time.
+    """
+    generator = random.Random(seed)
+    started = monotonic()
+    for _ in range(clicks):
+        telegram_id = f"{BENCH_USER_PREFIX}{generator.randint(1, users)}"
+        query, params = random_click(
+            session_table=session_table, calendar_column=calendar_column, telegram_id=telegram_id, generator=generator
+        )
+        async with engine.begin() as connection:
+            await connection.execute(query, params)
+    return monotonic() - started
+
+
+async def main(users: int, clicks: int, seed: int, keep: bool) -> None:
+    logger = get_logger()
+    async with engine.connect() as connection:
+        session_table = await get_session_table(connection)
+        calendar_column = await get_calendar_column(connection)
+    logger.info(f"Volatile fields live in '{session_table}', calendar selection in '{calendar_column}'.")
+    await seed_users(engine=engine, session_table=session_table, users=users)
+    before = await take_snapshot(engine=engine, session_table=session_table)
+    elapsed = await run_clicks(
+        engine=engine,
+        session_table=session_table,
+        calendar_column=calendar_column,
+        users=users,
+        clicks=clicks,
+        seed=seed,
+    )
+    after = await take_snapshot(engine=engine, session_table=session_table)
+    async with engine.connect() as connection:
+        wal_bytes = (await connection.execute(
+            # LSNs are passed as text: asyncpg has no codec for pg_lsn parameters
+            text("SELECT pg_wal_lsn_diff(CAST(CAST(:after AS text) AS pg_lsn), CAST(CAST(:before AS text) AS pg_lsn))"),
+            {"after": after["wal_lsn"], "before": before["wal_lsn"]},
+        )).scalar_one()
+    print(f"table: {session_table}, clicks: {clicks}, elapsed: {elapsed:.2f}s ({clicks / elapsed:.0f} clicks/s)")
+    print(f"WAL: {int(wal_bytes)} bytes total, {wal_bytes / clicks:.0f} bytes per click")
+    for table in sorted({"npb_user", session_table}):
+        delta = {key: after[table][key] - before[table][key] for key in after[table]}
+        hot_ratio = delta["hot_upd"] / delta["upd"] if delta["upd"] else 0
+        print(
+            f"{table}: updates {delta['upd']}, HOT {delta['hot_upd']} ({hot_ratio:.0%}), "
+            f"dead tuples +{delta['dead_tup']}, heap {after[table]['heap_bytes']} bytes "
+            f"(+{delta['heap_bytes']}), total {after[table]['total_bytes']} bytes (+{delta['total_bytes']})"
+        )
+    if not keep:
+        await drop_users(engine=engine)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic click workload for volatile user data.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--clicks", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep bench users after the run.")
+    args = parser.parse_args()
+    asyncio.run(main(users=args.users, clicks=args.clicks, seed=args.seed, keep=args.keep))
@@ -3,7 +3,6 @@ from os import environ
 
 from aiogram.types import InlineKeyboardButton
 from dotenv import load_dotenv
-from sqlalchemy import text
 
 
 load_dotenv()
@@ -17,7 +16,9 @@ class Config:
     TELEGRAM_WEBHOOK_HOST = environ.get("TELEGRAM_WEBHOOK_HOST")
     TELEGRAM_WEBHOOK_PORT = int(environ.get("TELEGRAM_WEBHOOK_PORT", "443"))
     TELEGRAM_WEBHOOK_PATH = "/webhook"
+    METRICS_PATH = "/metrics"
     TELEGRAM_WEBHOOK_URL = f"https://{TELEGRAM_WEBHOOK_HOST}:{TELEGRAM_WEBHOOK_PORT}{TELEGRAM_WEBHOOK_PATH}"
+    TELEGRAM_WEBHOOK_REPLY = bool(int(environ.get("TELEGRAM_WEBHOOK_REPLY", 0)))
     DB_DSN = environ.get("POSTGRES_DSN")
     MASTER_SERVICES = {
         "Ресницы": ["Удлинение", "Наращивание", "Ламинирование", "Биозавивка", "Коррекция", "Окрашивание"],
@@ -63,12 +64,58 @@ class Config:
     ENVIRONMENT = environ.get("ENVIRONMENT", "test")
     FORCE_SET_WEBHOOK = environ.get("FORCE_SET_WEBHOOK", False)
     MAX_PROCESSED_UNIQUE_UPDATES = 500
+    APPOINTMENT_PARTITIONS_AHEAD = int(environ.get("APPOINTMENT_PARTITIONS_AHEAD", 12))
+    APPOINTMENT_RETENTION_MONTHS = int(environ.get("APPOINTMENT_RETENTION_MONTHS", 12))
+    APPOINTMENT_PARTITION_MAINTENANCE_TIMEOUT = int(environ.get("APPOINTMENT_PARTITION_MAINTENANCE_TIMEOUT", 24)) * 60 * 60
+    LEADER_LOCK_KEY = int(environ.get("LEADER_LOCK_KEY", 7305001))
+    LEADER_CHECK_INTERVAL = int(environ.get("LEADER_CHECK_INTERVAL", 10))
+    REMINDER_SCHEDULER_WINDOW = int(environ.get("REMINDER_SCHEDULER_WINDOW", 60)) * 60
+    REMINDER_SCHEDULER_RETRY = int(environ.get("REMINDER_SCHEDULER_RETRY", 5))
+    REMINDER_BATCH_SIZE = int(environ.get("REMINDER_BATCH_SIZE", 500))
+    REMINDER_COALESCE_WINDOW = int(environ.get("REMINDER_COALESCE_WINDOW", 15)) * 60
+    MASTER_DIGEST_HOUR = int(environ.get("MASTER_DIGEST_HOUR", 20))
+    BROADCAST_RATE = float(environ.get("BROADCAST_RATE", 20))
+    BROADCAST_CONCURRENCY = int(environ.get("BROADCAST_CONCURRENCY", 10))
+    BROADCAST_PAGE_SIZE = int(environ.get("BROADCAST_PAGE_SIZE", 500))
+    BROADCAST_PROGRESS_EVERY = int(environ.get("BROADCAST_PROGRESS_EVERY", 1000))
+    TG_GLOBAL_RATE = float(environ.get("TG_GLOBAL_RATE", 30))
+    TG_PER_CHAT_INTERVAL = float(environ.get("TG_PER_CHAT_INTERVAL", 1))
+    TG_DELIVERY_MAX_ATTEMPTS = int(environ.get("TG_DELIVERY_MAX_ATTEMPTS", 5))
+    TG_DELIVERY_BACKOFF = float(environ.get("TG_DELIVERY_BACKOFF", 1))
+    TG_DELIVERY_MAX_TRACKED_CHATS = 10000
+    TG_UNREACHABLE_REFRESH_INTERVAL = int(environ.get("TG_UNREACHABLE_REFRESH_INTERVAL", 60))
+    TG_VIEW_CACHE_SIZE = 10000
+    TG_API_BASE = environ.get("TG_API_BASE")
+    TG_SESSION_TIMEOUT = float(environ.get("TG_SESSION_TIMEOUT", 30))
+    TG_SESSION_LIMIT = int(environ.get("TG_SESSION_LIMIT", 100))
+    TG_SESSION_KEEPALIVE = float(environ.get("TG_SESSION_KEEPALIVE", 60))
+    TG_METHOD_TIMEOUTS = {
+        "sendMessage": 10,
+        "editMessageText": 10,
+        "answerCallbackQuery": 5,
+        "deleteMessage": 5,
+    }
+    TG_CIRCUIT_FAILURE_THRESHOLD = int(environ.get("TG_CIRCUIT_FAILURE_THRESHOLD", 5))
+    TG_CIRCUIT_RESET_TIMEOUT = float(environ.get("TG_CIRCUIT_RESET_TIMEOUT", 30))
+    TG_CALLBACK_DEDUP_WINDOW = float(environ.get("TG_CALLBACK_DEDUP_WINDOW", 1))
+    TG_CALLBACK_DEDUP_SIZE = 10000
+    PROFILE_CARD_CACHE_SIZE = 10000
+    OUTBOX_BATCH_SIZE = int(environ.get("OUTBOX_BATCH_SIZE", 50))
+    OUTBOX_POLL_INTERVAL = float(environ.get("OUTBOX_POLL_INTERVAL", 1))
+    OUTBOX_LEASE = int(environ.get("OUTBOX_LEASE", 120))
+    # sending of a claimed batch (retries and flood control waits included) is cut off well before its lease expires
+    OUTBOX_DISPATCH_TIMEOUT = float(environ.get("OUTBOX_DISPATCH_TIMEOUT", OUTBOX_LEASE / 2))
+    OUTBOX_MAX_ATTEMPTS = int(environ.get("OUTBOX_MAX_ATTEMPTS", 3))
 
 
 class AdminConstants:
     ADD_MASTER = "admin.add_master"
     ACTIVATE_USER = "admin.activate_user"
     DEACTIVATE_USER = "admin.deactivate_user"
+    BROADCAST = "admin.broadcast"
+    BROADCAST_MASTERS = "admin.broadcast_masters"
+    BROADCAST_CLIENTS = "admin.broadcast_clients"
+    BROADCAST_ALL = "admin.broadcast_all"
 
 
 class ClientConstants:
@@ -130,7 +177,7 @@ class CommonConstants:
     TEMPORARY_DATA = {
         "current_service": None,
         "current_sub_service": None,
-        "current_calendar": text("'{}'::jsonb"),
+        "current_calendar_mask": 0,
         "current_day": None,
         "current_month": None,
         "current_year": None,
@@ -1,9 +1,10 @@
 from abc import ABC, abstractmethod
+from datetime import date, datetime
 from typing import Any, Dict, List
 
 from sqlalchemy import Column
 
-from npb.db.utils import WhereClause, Join
+from npb.db.utils import TransactionHook, WhereClause, Join
 from npb.tg.models import AppointmentModel, UserModel
 
 
@@ -24,6 +25,14 @@ class UserAbstractRepository(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    async def read_profile_version(self, tg_user_id: str):
+        """
+        Get profile version of a single user from DB.
+        :param tg_user_id: Telegram user id.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     async def read_user_info(self, where_clause: WhereClause):
         """
@@ -56,6 +65,189 @@ class UserAbstractRepository(ABC):
         raise NotImplementedError
 
 
+class UserSessionAbstractRepository(ABC):
+    @abstractmethod
+    async def read_single_session_info(self, tg_user_id: str):
+        """
+        Get single user session info from DB.
+        :param tg_user_id: Telegram user id.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def read_state(self, tg_user_id: str):
+        """
+        Get FSM state of a single user from DB.
+        :param tg_user_id: Telegram user id.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def increase_non_recognized_count(self, tg_user_id: str):
+        """
+        Count one more non recognized phrase of a user.
+        :param tg_user_id: Telegram user id.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_session_info(
+        self,
+        data_to_set: Dict[Column, Any],
+        where_clause: WhereClause,
+        returning_values: List[Column],
+    ):
+        """
+        Update user session info in DB.
+        :param data_to_set: Data to set.
+        :param where_clause: Where clause.
+        :param returning_values: Returning values params.
+        """
+        raise NotImplementedError
+
+
+class DeadLetterAbstractRepository(ABC):
+    @abstractmethod
+    async def create_dead_letter(self, chat_id: str, method: str, payload: Dict[str, Any], error: str, attempts: int):
+        """
+        Record a Bot API call that could not be delivered.
+        :param chat_id: Telegram chat id.
+        :param method: Bot API method.
+        :param payload: Bot API method params.
+        :param error: Last delivery error.
+        :param attempts: Number of delivery attempts.
+        """
+        raise NotImplementedError
+
+
+class OutboxAbstractRepository(ABC):
+    @abstractmethod
+    async def claim_messages(self, limit: int, lease: int):
+        """
+        Claim outbox messages for dispatching.
+        :param limit: Max number of messages.
+        :param lease: For how long (in seconds) messages are claimed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_messages(self, ids: List[int]):
+        """
+        Delete dispatched outbox messages.
+        :param ids: Outbox message ids.
+        """
+        raise NotImplementedError
+
+
+class ReminderAbstractRepository(ABC):
+    @abstractmethod
+    async def read_upcoming_reminders(self, window: int):
+        """
+        Get reminders that become due within a given window.
+        :param window: Window (in seconds).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def claim_due_reminders(
+        self, limit: int, coalesce_window: int = 0, transaction_hooks: List[TransactionHook] = None
+    ):
+        """
+        Claim (delete) due reminders.
+        :param limit: Max number of due reminders.
+        :param coalesce_window: Reminders of the same recipients due within this window (in seconds) are claimed too.
+        :param transaction_hooks: Hooks called within the claim transaction.
+        """
+        raise NotImplementedError
+
+
+class MasterDigestAbstractRepository(ABC):
+    @abstractmethod
+    async def create_digest(
+        self, day: date, day_start: datetime, day_end: datetime, transaction_hooks: List[TransactionHook] = None
+    ):
+        """
+        Build masters agenda for a day (once per day).
+        :param day: Digest day.
+        :param day_start: Day start.
+        :param day_end: Next day start.
+        :param transaction_hooks: Hooks called within the digest transaction.
+        """
+        raise NotImplementedError
+
+
+class UnreachableChatAbstractRepository(ABC):
+    @abstractmethod
+    async def mark_unreachable(self, chat_id: str, reason: str):
+        """
+        Record an unreachable chat.
+        :param chat_id: Telegram chat id.
+        :param reason: Why the chat is unreachable.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def mark_reachable(self, chat_id: str):
+        """
+        Forget an unreachable chat.
+        :param chat_id: Telegram chat id.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def read_unreachable_chats(self):
+        """
+        Get all unreachable chats.
+        """
+        raise NotImplementedError
+
+
+class BroadcastAbstractRepository(ABC):
+    @abstractmethod
+    async def create_broadcast(self, admin_telegram_id: str, audience: str):
+        """
+        Create broadcast draft.
+        :param admin_telegram_id: Admin telegram id.
+        :param audience: Recipients: 'masters', 'clients' or 'all'.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def start_broadcast(self, admin_telegram_id: str, text: str):
+        """
+        Set text of the latest admin's broadcast draft and start it.
+        :param admin_telegram_id: Admin telegram id.
+        :param text: Message text.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def read_running_broadcasts(self):
+        """
+        Get broadcasts that are not finished yet.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_progress(self, broadcast_id: int, last_seq_id: int, sent: int, failed: int):
+        """
+        Save broadcast progress.
+        :param broadcast_id: Broadcast id.
+        :param last_seq_id: Last processed recipient seq_id.
+        :param sent: Number of delivered messages.
+        :param failed: Number of undelivered messages.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def finish_broadcast(self, broadcast_id: int):
+        """
+        Mark broadcast as done.
+        :param broadcast_id: Broadcast id.
+        """
+        raise NotImplementedError
+
+
 class AppointmentAbstractRepository(ABC):
     @abstractmethod
     async def create_appointment(self, appointment: AppointmentModel):
@@ -98,19 +290,22 @@ class AppointmentAbstractRepository(ABC):
             data_to_set: Dict[Column, Any],
             where_clause: WhereClause,
             returning_values: List[Column],
+            transaction_hooks: List[TransactionHook] = None,
     ):
         """
         Update appointment info in DB.
         :param data_to_set: Data to set.
         :param where_clause: Where clause.
         :param returning_values: Returning values params.
+        :param transaction_hooks: Hooks called within the update transaction.
         """
         raise NotImplementedError
 
     @abstractmethod
-    async def delete_appointment(self, appointment_id: str):
+    async def delete_appointment(self, appointment_id: str, transaction_hooks: List[TransactionHook] = None):
         """
         Delete appointment from DB.
         :param appointment_id: Telegram appointment id.
+        :param transaction_hooks: Hooks called within the delete transaction.
         """
         raise NotImplementedError
@@ -1,23 +1,111 @@
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 from logging import Logger
 from operator import or_
-from typing import Any, Dict, List, Sequence, Union, Iterable
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union, Iterable
 
-from sqlalchemy import Column, delete, insert, Row, select, update, func, and_, text, extract
+from sqlalchemy import (
+    case, Column, Delete, delete, insert, JSON, literal_column, Row, Select, select, text, TextClause, union, Update,
+    update, func, and_,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
 from sqlalchemy.exc import MultipleResultsFound
-from sqlalchemy.sql.functions import coalesce
 
 from npb.config import CommonConstants, Config
-from npb.db.abstract_repository import AppointmentAbstractRepository, UserAbstractRepository
-from npb.db.exceptions import UpdateAppointmentInfoError, UpdateUserInfoError
-from npb.db.sa_models import appointment_table, user_table
-from npb.db.utils import basic_update, WhereClause, Join
+from npb.db.abstract_repository import (
+    AppointmentAbstractRepository,
+    BroadcastAbstractRepository,
+    DeadLetterAbstractRepository,
+    MasterDigestAbstractRepository,
+    OutboxAbstractRepository,
+    ReminderAbstractRepository,
+    UnreachableChatAbstractRepository,
+    UserAbstractRepository,
+    UserSessionAbstractRepository,
+)
+from npb.db.exceptions import UpdateAppointmentInfoError, UpdateUserInfoError, UpdateUserSessionInfoError
+from npb.db.sa_models import (
+    appointment_table,
+    broadcast_table,
+    dead_letter_table,
+    master_digest_table,
+    outbox_table,
+    reminder_table,
+    unreachable_chat_table,
+    user_session_table,
+    user_table,
+)
+from npb.db.utils import apply_where_clause, basic_update, build_update_query, TransactionHook, WhereClause, Join
 from npb.exceptions import MoreThanOneAppointment, MoreThanOneUserFound, DropIsProhibited
-from npb.tg.models import AppointmentList, AppointmentModel, UserModel
+from npb.tg.models import AppointmentList, AppointmentModel, OutboxMessageModel, UserModel
+from npb.tg.profile_cards import PROFILE_CARD_FIELDS, get_profile_card_cache
 from npb.db.utils import get_comparison_operator_by_symbol
 
 
+USER_SESSION_COLUMNS = [column for column in user_session_table.c if column.name != "telegram_id"]
+SESSION_COLUMNS = frozenset(column.name for column in USER_SESSION_COLUMNS)
+REMINDERS_CHANNEL = "npb_reminders"
+REMINDER_FIELDS = {"is_reserved", "datetime", "client_telegram_id"}
+REMINDER_APPOINTMENT_COLUMNS = [
+    appointment_table.c.auid,
+    appointment_table.c.datetime,
+    appointment_table.c.is_reserved,
+    appointment_table.c.client_telegram_id,
+    appointment_table.c.master_telegram_id,
+]
+
+
+def split_user_data(data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Split user data into profile data (npb_user) and session data (user_session).
+    :param data: User data.
+    :return: Profile data and session data.
+    """
+    profile_data, session_data = {}, {}
+    for key, value in data.items():
+        if key in SESSION_COLUMNS:
+            session_data[key] = value
+        else:
+            profile_data[key] = value
+    return profile_data, session_data
+
+
+def plan_reminders(
+    appointment: Row, now: datetime, lead_time: int = Config.APPOINTMENT_NOTIFICATION_TIME
+) -> List[Dict[str, Any]]:
+    """
+    Plan reminders of a booked appointment for both client and master: the first one 'lead_time' seconds before the
+    appointment, then every Config.APPOINTMENT_NOTIFICATION_COOLDOWN (Config.APPOINTMENT_NOTIFICATION_LIMIT at most).
+    Reminders that are already overdue (appointment is booked at the last moment) are merged into one due right now.
+    :param appointment: Appointment (auid, datetime, client_telegram_id, master_telegram_id).
+    :param now: Current moment (timezone aware).
+    :param lead_time: How long (in seconds) before the appointment the first reminder is sent.
+    :return: Rows for 'reminder' table.
+    """
+    if appointment.datetime <= now:
+        return []
+    due_dates = []
+    for number in range(Config.APPOINTMENT_NOTIFICATION_LIMIT):
+        offset = number * Config.APPOINTMENT_NOTIFICATION_COOLDOWN
+        if offset >= lead_time:
+            break
+        due_dates.append(appointment.datetime - timedelta(seconds=lead_time - offset))
+    upcoming_due_dates = [due_at for due_at in due_dates if due_at > now]
+    if len(upcoming_due_dates) < len(due_dates):
+        upcoming_due_dates.insert(0, now)
+    return [
+        {
+            "auid": appointment.auid,
+            "telegram_id": telegram_id,
+            "for_master": for_master,
+            "appointment_datetime": appointment.datetime,
+            "due_at": due_at,
+        }
+        for telegram_id, for_master in ((appointment.client_telegram_id, False), (appointment.master_telegram_id, True))
+        for due_at in upcoming_due_dates
+    ]
+
+
 class User(UserAbstractRepository):
 
     def __init__(self, engine: AsyncEngine, logger: Logger):
@@ -31,11 +119,15 @@ class User(UserAbstractRepository):
         """
         # TODO: обработка ошибок?
         # TODO: тайпхинты на выходные параметры?
-        query = insert(user_table).values(user.model_dump(exclude_none=True)).returning("*")
+        profile_data, session_data = split_user_data(user.model_dump(exclude_none=True))
+        session_data["telegram_id"] = user.telegram_id
+        query = insert(user_table).values(profile_data).returning("*")
+        session_query = insert(user_session_table).values(session_data)
         print(query)
         connection: AsyncConnection
         async with self._engine.begin() as connection:
             result = await connection.execute(query)
+            await connection.execute(session_query)
             return result.one_or_none()
 
     async def read_single_user_info(self, tg_user_id: str):
@@ -46,7 +138,7 @@ class User(UserAbstractRepository):
         # TODO: обработка ошибок?
         # TODO: тайпхинты на выходные параметры?
         connection: AsyncConnection
-        query = select(user_table).where(user_table.c.telegram_id == tg_user_id)
+        query = self.single_user_info_query(tg_user_id=tg_user_id)
         async with self._engine.begin() as connection:
             result = await connection.execute(query)
             try:
@@ -56,6 +148,31 @@ class User(UserAbstractRepository):
                 self.logger.error(error_message)
                 raise MoreThanOneUserFound(error_message)
 
+    async def read_profile_version(self, tg_user_id: str) -> Optional[Row]:
+        """
+        Get profile version of a single user (a narrow read by unique index, e.g. to look up a cached profile card).
+        :param tg_user_id: Telegram user id.
+        :return: Row with 'profile_version' and 'is_master' or None if user is not found.
+        """
+        connection: AsyncConnection
+        query = select(user_table.c.profile_version, user_table.c.is_master).where(
+            user_table.c.telegram_id == tg_user_id
+        )
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            return result.one_or_none()
+
+    @staticmethod
+    def single_user_info_query(tg_user_id: str) -> Select:
+        """
+        Build query for a single user (profile joined with session).
+        :param tg_user_id: Telegram user id.
+        :return: Select query.
+        """
+        return select(user_table, *USER_SESSION_COLUMNS).select_from(
+            user_table.outerjoin(user_session_table, user_session_table.c.telegram_id == user_table.c.telegram_id)
+        ).where(user_table.c.telegram_id == tg_user_id)
+
     async def read_user_info(self, where_clause: WhereClause, order_by: list = None, limit: int = None):
         """
         Get user info from DB.
@@ -67,24 +184,28 @@ class User(UserAbstractRepository):
         # TODO: обработка ошибок?
         # TODO: тайпхинты на выходные параметры?
         connection: AsyncConnection
-        if where_clause.filter:
-            query = select(user_table).filter(*where_clause.filter)
-        else:
-            query = select(user_table).filter()
-            for number, where_clause_param in enumerate(where_clause.params):
-                comparison_operator = get_comparison_operator_by_symbol(where_clause.comparison_operators[number])
-                query = query.where(
-                    comparison_operator(where_clause_param, where_clause.values[number])
-                )
+        query = self.read_user_query(where_clause=where_clause, order_by=order_by, limit=limit)
+        async with self._engine.begin() as connection:
+            print("DEBUG read_user_info query: ", str(query))
+            result = await connection.execute(query)
+            return result.all()
+
+    @staticmethod
+    def read_user_query(where_clause: WhereClause, order_by: list = None, limit: int = None) -> Select:
+        """
+        Build query for user info.
+        :param where_clause: Where clause.
+        :param order_by: Order by clauses.
+        :param limit: Limit search.
+        :return: Select query.
+        """
+        query = apply_where_clause(query=select(user_table), where_clause=where_clause)
         if order_by:
             for clause in order_by:
                 query = query.order_by(clause)
         if limit:
             query = query.limit(limit=limit)
-        async with self._engine.begin() as connection:
-            print("DEBUG read_user_info query: ", str(query))
-            result = await connection.execute(query)
-            return result.all()
+        return query
 
     async def update_user_info(
         self,
@@ -104,17 +225,64 @@ class User(UserAbstractRepository):
         if user_table.c.telegram_id in data_to_set:
             error_message = "Telegram ID is a protected parameter and can not be updated."
             raise UpdateUserInfoError(error_message)
+        profile_data, session_data = split_user_data(data_to_set)
+        if PROFILE_CARD_FIELDS.intersection(getattr(key, "name", key) for key in profile_data):
+            # cached profile cards of older versions are never served again
+            profile_data["profile_version"] = user_table.c.profile_version + 1
+        if returning_values and not return_all:
+            returning = list(returning_values)
+        else:
+            # the same columns as read_single_user_info returns
+            returning = [*user_table.c, *USER_SESSION_COLUMNS]
+        if not any(column.name == "telegram_id" for column in returning):
+            returning.append(user_table.c.telegram_id)
+        connection: AsyncConnection
         try:
-            return await basic_update(
-                engine=self._engine,
-                table=user_table,
-                data_to_set=data_to_set,
-                where_clause=where_clause,
-                returning_values=returning_values,
-                return_all=return_all,
-            )
+            # both parts of user data are updated in one transaction, so a row is never left half-updated
+            async with self._engine.begin() as connection:
+                if session_data:
+                    if profile_data:
+                        await connection.execute(
+                            build_update_query(table=user_table, data_to_set=profile_data, where_clause=where_clause)
+                        )
+                    # UPDATE ... FROM npb_user: where clause is applied to npb_user, its columns can be returned
+                    query = apply_where_clause(
+                        query=update(user_session_table)
+                        .values(session_data)
+                        .where(user_session_table.c.telegram_id == user_table.c.telegram_id),
+                        where_clause=where_clause,
+                    ).returning(*returning)
+                else:
+                    query = self.update_profile_query(
+                        data_to_set=profile_data, where_clause=where_clause, returning=returning
+                    )
+                result = await connection.execute(query)
+                rows = result.all()
         except Exception as error:
             raise UpdateUserInfoError(f"Unexpected error in 'update_user_info'. Details: {str(error)}")
+        for row in rows:
+            get_profile_card_cache().invalidate(telegram_id=row.telegram_id)
+        return rows
+
+    @staticmethod
+    def update_profile_query(
+        data_to_set: Dict[str, Any], where_clause: WhereClause, returning: List[Column]
+    ) -> Union[Update, Select]:
+        """
+        Build update query of profile data (npb_user) returning given columns of npb_user and user_session.
+        :param data_to_set: Profile data to set.
+        :param where_clause: Where clause.
+        :param returning: Returning columns.
+        :return: Update query or select from its CTE if session columns are returned.
+        """
+        query = build_update_query(table=user_table, data_to_set=data_to_set, where_clause=where_clause)
+        if all(column.table is user_table for column in returning):
+            return query.returning(*returning)
+        updated_user = query.returning(*user_table.c).cte("updated_user")
+        columns = [updated_user.c[column.name] if column.table is user_table else column for column in returning]
+        return select(*columns).select_from(
+            updated_user.outerjoin(user_session_table, user_session_table.c.telegram_id == updated_user.c.telegram_id)
+        )
 
     async def delete_user(self, tg_user_id: int):
         """
@@ -127,7 +295,9 @@ class User(UserAbstractRepository):
         query = delete(user_table).where(user_table.c.telegram_id == tg_user_id).returning("*")
         async with self._engine.begin() as connection:
             result = await connection.execute(query)
-            return result.all()
+            rows = result.all()
+        get_profile_card_cache().invalidate(telegram_id=str(tg_user_id))
+        return rows
 
     async def drop_temporary_data(self, telegram_id: str, data: Iterable[str] = None) -> None:
         """
@@ -146,16 +316,101 @@ class User(UserAbstractRepository):
         else:
             data_to_set = CommonConstants.TEMPORARY_DATA
         where_clause = WhereClause(
-            params=[user_table.c.telegram_id], values=[telegram_id], comparison_operators=["=="]
+            params=[user_session_table.c.telegram_id], values=[telegram_id], comparison_operators=["=="]
         )
-        await basic_update(
-            engine=self._engine,
-            table=user_table,
+        await UserSession(engine=self._engine, logger=self.logger).update_session_info(
             data_to_set=data_to_set,
             where_clause=where_clause,
         )
 
 
+class UserSession(UserSessionAbstractRepository):
+
+    def __init__(self, engine: AsyncEngine, logger: Logger):
+        self._engine = engine
+        self.logger = logger
+
+    async def read_single_session_info(self, tg_user_id: str):
+        """
+        Get single user session info from DB.
+        :param tg_user_id: Telegram user id.
+        """
+        connection: AsyncConnection
+        query = select(user_session_table).where(user_session_table.c.telegram_id == tg_user_id)
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            return result.one_or_none()
+
+    async def read_state(self, tg_user_id: str) -> Optional[str]:
+        """
+        Get FSM state of a single user from DB.
+        :param tg_user_id: Telegram user id.
+        """
+        connection: AsyncConnection
+        query = select(user_session_table.c.state).where(user_session_table.c.telegram_id == tg_user_id)
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            return result.scalar_one_or_none()
+
+    async def increase_non_recognized_count(self, tg_user_id: str) -> int:
+        """
+        Count one more non recognized phrase of a user in a single atomic update (so that the limit holds across
+        workers). A counter that was not increased for Config.COUNTERS_THRESHOLD seconds starts over.
+        :param tg_user_id: Telegram user id.
+        :return: Number of non recognized phrases including this one (0 if user has no session).
+        """
+        connection: AsyncConnection
+        now = datetime.now()
+        border = now - timedelta(seconds=Config.COUNTERS_THRESHOLD)
+        query = (
+            update(user_session_table)
+            .where(user_session_table.c.telegram_id == tg_user_id)
+            .values(
+                non_recogn_count=case(
+                    (
+                        user_session_table.c.non_recogn_ts >= border,
+                        func.coalesce(user_session_table.c.non_recogn_count, 0) + 1,
+                    ),
+                    else_=1,
+                ),
+                non_recogn_ts=now,
+            )
+            .returning(user_session_table.c.non_recogn_count)
+        )
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            return result.scalar_one_or_none() or 0
+
+    async def update_session_info(
+        self,
+        data_to_set: Dict[str, Any],
+        where_clause: WhereClause,
+        returning_values: List[Column] = None,
+        return_all: bool = False,
+    ) -> Sequence[Row]:
+        """
+        Update user session info in DB.
+        :param data_to_set: Data to set.
+        :param where_clause: Where clause (built for user_session table).
+        :param returning_values: Returning values params.
+        :param return_all: Returning all params.
+        """
+        if "telegram_id" in data_to_set:
+            error_message = "Telegram ID is a protected parameter and can not be updated."
+            raise UpdateUserSessionInfoError(error_message)
+        try:
+            return await basic_update(
+                engine=self._engine,
+                table=user_session_table,
+                data_to_set=data_to_set,
+                where_clause=where_clause,
+                returning_values=returning_values or [user_session_table.c.telegram_id],
+                return_all=return_all,
+            )
+        except Exception as error:
+            raise UpdateUserSessionInfoError(f"Unexpected error in 'update_session_info'. Details: {str(error)}")
+
+
 class Appointment(AppointmentAbstractRepository):
 
     def __init__(self, engine: AsyncEngine, logger: Logger):
@@ -216,19 +471,37 @@ class Appointment(AppointmentAbstractRepository):
         # TODO: обработка ошибок?
         # TODO: тайпхинты на выходные параметры?
         connection: AsyncConnection
+        query = self.read_appointment_query(
+            where_clause=where_clause, limit=limit, order_by=order_by, join_data=join_data, selectables=selectables
+        )
+        print("DEBUG read_appointment_info query: ", str(query))
+        print("DEBUG read_appointment_info where_clause: ", str(where_clause))
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            return result.all()
+
+    @staticmethod
+    def read_appointment_query(
+        where_clause: WhereClause,
+        limit: int = None,
+        order_by: list = None,
+        join_data: Join = None,
+        selectables: List[Column] = None,
+    ) -> Select:
+        """
+        Build query for appointment info.
+        :param where_clause: Where clause.
+        :param limit: Limit search.
+        :param order_by: Order by clauses.
+        :param join_data: Joins.
+        :param selectables: Returning values params.
+        :return: Select query.
+        """
         if selectables:
             query = select(*selectables)
         else:
             query = select(appointment_table)
-        if where_clause.filter:
-            query = query.filter(*where_clause.filter)
-        else:
-            query = query.filter()
-            for number, where_clause_param in enumerate(where_clause.params):
-                comparison_operator = get_comparison_operator_by_symbol(where_clause.comparison_operators[number])
-                query = query.where(
-                    comparison_operator(where_clause_param, where_clause.values[number])
-                )
+        query = apply_where_clause(query=query, where_clause=where_clause)
         if limit:
             query = query.limit(limit=limit)
         if join_data:
@@ -238,11 +511,7 @@ class Appointment(AppointmentAbstractRepository):
         if order_by:
             for clause in order_by:
                 query = query.order_by(clause)
-        print("DEBUG read_appointment_info query: ", str(query))
-        print("DEBUG read_appointment_info where_clause: ", str(where_clause))
-        async with self._engine.begin() as connection:
-            result = await connection.execute(query)
-            return result.all()
+        return query
 
     async def update_appointment_info(
         self,
@@ -250,6 +519,7 @@ class Appointment(AppointmentAbstractRepository):
         where_clause: WhereClause,
         returning_values: List[Column] = None,
         return_all: bool = False,
+        transaction_hooks: List[TransactionHook] = None,
     ) -> Sequence[Row]:
         """
         Update appointment info in DB.
@@ -257,32 +527,49 @@ class Appointment(AppointmentAbstractRepository):
         :param where_clause: Where clause.
         :param returning_values: Returning values params.
         :param return_all: Returning all params.
+        :param transaction_hooks: Hooks called within the update transaction (e.g. Outbox.enqueue_hook).
         """
         if appointment_table.c.master_telegram_id in data_to_set:
             error_message = "Telegram ID is a protected parameter and can not be updated."
             raise UpdateAppointmentInfoError(error_message)
+        reminders_changed = bool(REMINDER_FIELDS.intersection(getattr(key, "name", key) for key in data_to_set))
+        if reminders_changed:
+            # planned reminders are rewritten in the same transaction as the booking / rescheduling / cancellation
+            if returning_values and not return_all:
+                returning_values = returning_values + [
+                    column for column in REMINDER_APPOINTMENT_COLUMNS if column not in returning_values
+                ]
+            transaction_hooks = [Reminder.reschedule, *(transaction_hooks or [])]
         try:
-            return await basic_update(
+            result = await basic_update(
                 engine=self._engine,
                 table=appointment_table,
                 data_to_set=data_to_set,
                 where_clause=where_clause,
                 returning_values=returning_values,
                 return_all=return_all,
+                transaction_hooks=transaction_hooks,
             )
         except Exception as exc:
             raise UpdateAppointmentInfoError(f"Unexpected error in 'update_appointment_info'. Details: {str(exc)}")
+        if reminders_changed:
+            await self.notify_reminders_changed()
+        return result
 
-    async def delete_appointment(self, auid: str):
+    async def delete_appointment(self, auid: str, transaction_hooks: List[TransactionHook] = None):
         """
         Delete appointment from DB.
         :param auid: Appointment id.
+        :param transaction_hooks: Hooks called within the delete transaction (e.g. Outbox.enqueue_hook).
         """
         connection: AsyncConnection
         query = delete(appointment_table).where(appointment_table.c.auid == auid).returning("*")
         async with self._engine.begin() as connection:
             result = await connection.execute(query)
-            return result.all()
+            rows = result.all()
+            for transaction_hook in [Reminder.cancel, *(transaction_hooks or [])]:
+                await transaction_hook(connection, rows)
+            return rows
 
     @staticmethod
     def appointments_as_dict(appointments: Sequence[Row]) -> Dict[int, bool]:
@@ -292,36 +579,478 @@ class Appointment(AppointmentAbstractRepository):
             result[reserved_day] = True
         return result
 
-    async def upcoming_appointments_notification(self) -> Sequence[Row]:
+    async def notify_reminders_changed(self) -> None:
         """
-        Notify users about upcoming appointments.
+        Let reminder schedulers (in every process) know that upcoming reminders might have changed.
         """
-        tz = timezone(timedelta(hours=Config.TZ_OFFSET))
-        now = datetime.now(tz=tz)
-        query = update(appointment_table).where(
-            and_(
-                appointment_table.c.is_reserved.is_(True),
-                extract("epoch", appointment_table.c.datetime - now) >= 0,
-                extract("epoch", appointment_table.c.datetime - now) <= Config.APPOINTMENT_NOTIFICATION_TIME,
-                or_(
-                    appointment_table.c.notifications < Config.APPOINTMENT_NOTIFICATION_LIMIT,
-                    appointment_table.c.notifications.is_(None),
+        async with self._engine.begin() as connection:
+            await connection.execute(select(func.pg_notify(REMINDERS_CHANNEL, "")))
+
+
+class DeadLetter(DeadLetterAbstractRepository):
+
+    def __init__(self, engine: AsyncEngine, logger: Logger):
+        self._engine = engine
+        self.logger = logger
+
+    async def create_dead_letter(
+        self, chat_id: str, method: str, payload: Dict[str, Any], error: str, attempts: int
+    ) -> Sequence[Row]:
+        """
+        Record a Bot API call that could not be delivered.
+        :param chat_id: Telegram chat id.
+        :param method: Bot API method.
+        :param payload: Bot API method params.
+        :param error: Last delivery error.
+        :param attempts: Number of delivery attempts.
+        """
+        connection: AsyncConnection
+        query = insert(dead_letter_table).values(
+            chat_id=chat_id, method=method, payload=payload, error=error[:1000], attempts=attempts
+        ).returning(dead_letter_table.c.id)
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            return result.all()
+
+
+class Outbox(OutboxAbstractRepository):
+
+    def __init__(self, engine: AsyncEngine, logger: Logger):
+        self._engine = engine
+        self.logger = logger
+
+    @staticmethod
+    async def enqueue(connection: AsyncConnection, messages: Iterable[OutboxMessageModel]) -> None:
+        """
+        Write messages to outbox within an open transaction.
+        :param connection: Connection with an open transaction.
+        :param messages: Outbox messages.
+        """
+        values = [message.model_dump() for message in messages]
+        if values:
+            await connection.execute(insert(outbox_table), values)
+
+    @staticmethod
+    def enqueue_hook(make_messages: Callable[[Sequence[Row]], Iterable[OutboxMessageModel]]) -> TransactionHook:
+        """
+        Build a transaction hook that writes messages to outbox together with the data change.
+        :param make_messages: Builds messages from rows returned by the data change (nothing is sent if no rows).
+        :return: Transaction hook.
+        """
+        async def hook(connection: AsyncConnection, rows: Sequence[Row]) -> None:
+            if rows:
+                await Outbox.enqueue(connection=connection, messages=make_messages(rows))
+        return hook
+
+    @staticmethod
+    def claim_messages_query(limit: int, lease: int) -> Update:
+        claimable = (
+            select(outbox_table.c.id)
+            .where(outbox_table.c.locked_until <= func.now())
+            .order_by(outbox_table.c.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte("claimable")
+        )
+        return (
+            update(outbox_table)
+            .where(outbox_table.c.id == claimable.c.id)
+            .values(
+                locked_until=func.now() + timedelta(seconds=lease),
+                attempts=func.coalesce(outbox_table.c.attempts, 0) + 1,
+            )
+            .returning(
+                outbox_table.c.id,
+                outbox_table.c.chat_id,
+                outbox_table.c.text,
+                outbox_table.c.parse_mode,
+                outbox_table.c.attempts,
+            )
+        )
+
+    async def claim_messages(self, limit: int, lease: int) -> Sequence[Row]:
+        """
+        Claim outbox messages for dispatching. Claimed messages are skipped by other dispatchers until the lease
+        expires, so messages of a crashed dispatcher are picked up again.
+        :param limit: Max number of messages.
+        :param lease: For how long (in seconds) messages are claimed.
+        """
+        connection: AsyncConnection
+        async with self._engine.begin() as connection:
+            result = await connection.execute(self.claim_messages_query(limit=limit, lease=lease))
+            return sorted(result.all(), key=lambda message: message.id)
+
+    async def delete_messages(self, ids: List[int]) -> None:
+        """
+        Delete dispatched outbox messages.
+        :param ids: Outbox message ids.
+        """
+        if not ids:
+            return
+        connection: AsyncConnection
+        async with self._engine.begin() as connection:
+            await connection.execute(delete(outbox_table).where(outbox_table.c.id.in_(ids)))
+
+
+class Reminder(ReminderAbstractRepository):
+
+    def __init__(self, engine: AsyncEngine, logger: Logger):
+        self._engine = engine
+        self.logger = logger
+
+    @staticmethod
+    async def reschedule(connection: AsyncConnection, appointments: Sequence[Row]) -> None:
+        """
+        Replace planned reminders of given appointments (within an open transaction), reminders are planned for
+        booked appointments only.
+        :param connection: Connection with an open transaction.
+        :param appointments: Appointments (see REMINDER_APPOINTMENT_COLUMNS).
+        """
+        await Reminder.cancel(connection=connection, appointments=appointments)
+        now = datetime.now(tz=timezone.utc)
+        values = [
+            reminder
+            for appointment in appointments
+            if appointment.is_reserved and appointment.client_telegram_id
+            for reminder in plan_reminders(appointment=appointment, now=now)
+        ]
+        if values:
+            await connection.execute(insert(reminder_table), values)
+
+    @staticmethod
+    async def cancel(connection: AsyncConnection, appointments: Sequence[Row]) -> None:
+        """
+        Delete planned reminders of given appointments (within an open transaction).
+        :param connection: Connection with an open transaction.
+        :param appointments: Appointments (must contain 'auid').
+        """
+        auids = [appointment.auid for appointment in appointments]
+        if auids:
+            await connection.execute(delete(reminder_table).where(reminder_table.c.auid.in_(auids)))
+
+    async def read_upcoming_reminders(self, window: int) -> Sequence[Row]:
+        """
+        Get reminders that become due within a given window.
+        :param window: Window (in seconds).
+        """
+        now = datetime.now(tz=timezone.utc)
+        query = select(reminder_table.c.id, reminder_table.c.due_at).where(
+            reminder_table.c.due_at <= now + timedelta(seconds=window)
+        )
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            return result.all()
+
+    @staticmethod
+    def claim_due_reminders_query(now: datetime, limit: int, coalesce_window: int = 0) -> Delete:
+        """
+        Build query that deletes due reminders and returns them (rows locked by another scheduler are skipped).
+        Reminders of the same recipients that become due within 'coalesce_window' are claimed too, so that they are
+        sent in one message.
+        :param now: Current moment (timezone aware).
+        :param limit: Max number of due reminders.
+        :param coalesce_window: Window (in seconds).
+        :return: Delete query.
+        """
+        due = (
+            select(reminder_table.c.id, reminder_table.c.telegram_id)
+            .where(reminder_table.c.due_at <= now)
+            .order_by(reminder_table.c.due_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte("due")
+        )
+        query = delete(reminder_table)
+        if coalesce_window:
+            # a union of ids (not an OR of both conditions) lets Postgres look claimed rows up by primary key
+            coalesced = select(reminder_table.c.id).where(
+                reminder_table.c.telegram_id.in_(select(due.c.telegram_id)),
+                reminder_table.c.due_at <= now + timedelta(seconds=coalesce_window),
+            )
+            query = query.where(reminder_table.c.id.in_(union(select(due.c.id), coalesced)))
+        else:
+            query = query.where(reminder_table.c.id == due.c.id)
+        return query.returning(
+            reminder_table.c.auid,
+            reminder_table.c.telegram_id,
+            reminder_table.c.for_master,
+            reminder_table.c.appointment_datetime,
+            reminder_table.c.due_at,
+        )
+
+    async def claim_due_reminders(
+        self, limit: int, coalesce_window: int = 0, transaction_hooks: List[TransactionHook] = None
+    ) -> Sequence[Row]:
+        """
+        Claim (delete) due reminders.
+        :param limit: Max number of due reminders.
+        :param coalesce_window: Reminders of the same recipients due within this window (in seconds) are claimed too.
+        :param transaction_hooks: Hooks called within the claim transaction (e.g. Outbox.enqueue_hook).
+        """
+        connection: AsyncConnection
+        query = self.claim_due_reminders_query(
+            now=datetime.now(tz=timezone.utc), limit=limit, coalesce_window=coalesce_window
+        )
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            rows = result.all()
+            for transaction_hook in transaction_hooks or []:
+                await transaction_hook(connection, rows)
+            return rows
+
+    @staticmethod
+    def backfill_query() -> TextClause:
+        """
+        Build query that plans reminders for every booked future appointment (same plan as in 'plan_reminders',
+        reminders already sent according to 'appointment.notifications' are skipped).
+        :return: Insert query (params: 'now').
+        """
+        return text(
+            "INSERT INTO reminder (auid, telegram_id, for_master, appointment_datetime, due_at) "
+            "SELECT DISTINCT a.auid, r.telegram_id, r.for_master, a.datetime, "
+            "greatest(a.datetime - make_interval(secs => :lead_time) + make_interval(secs => n * :cooldown), :now) "
+            "FROM appointment a "
+            "CROSS JOIN LATERAL (VALUES (a.client_telegram_id, false), (a.master_telegram_id, true)) "
+            "AS r(telegram_id, for_master) "
+            "CROSS JOIN generate_series(0, :notification_limit - 1) AS n "
+            "WHERE a.is_reserved AND a.client_telegram_id IS NOT NULL AND a.datetime > :now "
+            "AND n * :cooldown < :lead_time AND n >= coalesce(a.notifications, 0)"
+        ).bindparams(
+            lead_time=Config.APPOINTMENT_NOTIFICATION_TIME,
+            cooldown=Config.APPOINTMENT_NOTIFICATION_COOLDOWN,
+            notification_limit=Config.APPOINTMENT_NOTIFICATION_LIMIT,
+        )
+
+
+class MasterDigest(MasterDigestAbstractRepository):
+
+    def __init__(self, engine: AsyncEngine, logger: Logger):
+        self._engine = engine
+        self.logger = logger
+
+    @staticmethod
+    def daily_agenda_query(day_start: datetime, day_end: datetime) -> Select:
+        """
+        Build query that returns booked appointments of a day grouped by active master (one row per master).
+        :param day_start: Day start.
+        :param day_end: Next day start.
+        :return: Select query.
+        """
+        master = user_table.alias("master")
+        client = user_table.alias("client")
+        appointments = func.json_agg(
+            aggregate_order_by(
+                # keys are rendered as literals: json_build_object params have no type to infer
+                func.json_build_object(
+                    literal_column("'datetime'"), appointment_table.c.datetime,
+                    literal_column("'service'"), appointment_table.c.service,
+                    literal_column("'name'"), client.c.name,
+                    literal_column("'phone_number'"), client.c.phone_number,
+                    literal_column("'telegram_profile'"), client.c.telegram_profile,
                 ),
-                extract(
-                    "epoch", now - coalesce(
-                        appointment_table.c.notification_ts, text("'1970-01-01 00:00:00+00:00'")
-                    )
-                ) >= Config.APPOINTMENT_NOTIFICATION_COOLDOWN
+                appointment_table.c.datetime,
+            ),
+            type_=JSON,
+        )
+        return (
+            select(appointment_table.c.master_telegram_id, appointments.label("appointments"))
+            .select_from(appointment_table)
+            .join(master, master.c.telegram_id == appointment_table.c.master_telegram_id)
+            .outerjoin(client, client.c.telegram_id == appointment_table.c.client_telegram_id)
+            .where(
+                appointment_table.c.is_reserved.is_(True),
+                appointment_table.c.datetime >= day_start,
+                appointment_table.c.datetime < day_end,
+                master.c.is_master.is_(True),
+                master.c.is_active.is_(True),
             )
-        ).values(
-            notifications=appointment_table.c.notifications + 1,
-            notification_ts=datetime.now(),
-        ).returning(
-            appointment_table.c.auid,
-            appointment_table.c.client_telegram_id,
-            appointment_table.c.master_telegram_id,
-            appointment_table.c.datetime,
+            .group_by(appointment_table.c.master_telegram_id)
         )
+
+    async def create_digest(
+        self, day: date, day_start: datetime, day_end: datetime, transaction_hooks: List[TransactionHook] = None
+    ) -> Sequence[Row]:
+        """
+        Build masters agenda for a day. Digest of a day is built once: a day already marked in 'master_digest'
+        (by this or another process) is skipped.
+        :param day: Digest day.
+        :param day_start: Day start.
+        :param day_end: Next day start.
+        :param transaction_hooks: Hooks called with agenda rows within the digest transaction (e.g.
+            Outbox.enqueue_hook).
+        :return: Agenda rows (empty if digest has been already built).
+        """
+        connection: AsyncConnection
+        mark_query = (
+            pg_insert(master_digest_table)
+            .values(day=day)
+            .on_conflict_do_nothing()
+            .returning(master_digest_table.c.day)
+        )
+        async with self._engine.begin() as connection:
+            if not (await connection.execute(mark_query)).all():
+                return []
+            result = await connection.execute(self.daily_agenda_query(day_start=day_start, day_end=day_end))
+            rows = result.all()
+            for transaction_hook in transaction_hooks or []:
+                await transaction_hook(connection, rows)
+            return rows
+
+
+class UnreachableChat(UnreachableChatAbstractRepository):
+
+    def __init__(self, engine: AsyncEngine, logger: Logger):
+        self._engine = engine
+        self.logger = logger
+
+    async def mark_unreachable(self, chat_id: str, reason: str) -> None:
+        """
+        Record an unreachable chat (or refresh reason of an already recorded one).
+        :param chat_id: Telegram chat id.
+        :param reason: Why the chat is unreachable.
+        """
+        connection: AsyncConnection
+        query = pg_insert(unreachable_chat_table).values(chat_id=chat_id, reason=reason[:1000])
+        query = query.on_conflict_do_update(
+            index_elements=[unreachable_chat_table.c.chat_id],
+            set_={"reason": query.excluded.reason, "created_ts": func.now()},
+        )
+        async with self._engine.begin() as connection:
+            await connection.execute(query)
+
+    async def mark_reachable(self, chat_id: str) -> Sequence[Row]:
+        """
+        Forget an unreachable chat.
+        :param chat_id: Telegram chat id.
+        :return: Deleted rows.
+        """
+        connection: AsyncConnection
+        query = (
+            delete(unreachable_chat_table)
+            .where(unreachable_chat_table.c.chat_id == chat_id)
+            .returning(unreachable_chat_table.c.chat_id)
+        )
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            return result.all()
+
+    async def read_unreachable_chats(self) -> Sequence[Row]:
+        """
+        Get all unreachable chats.
+        """
+        connection: AsyncConnection
         async with self._engine.begin() as connection:
+            result = await connection.execute(select(unreachable_chat_table.c.chat_id))
+            return result.all()
+
+
+class Broadcast(BroadcastAbstractRepository):
+
+    def __init__(self, engine: AsyncEngine, logger: Logger):
+        self._engine = engine
+        self.logger = logger
+
+    async def create_broadcast(self, admin_telegram_id: str, audience: str) -> Sequence[Row]:
+        """
+        Create broadcast draft.
+        :param admin_telegram_id: Admin telegram id.
+        :param audience: Recipients: 'masters', 'clients' or 'all'.
+        """
+        connection: AsyncConnection
+        query = insert(broadcast_table).values(
+            admin_telegram_id=admin_telegram_id, audience=audience, status="draft"
+        ).returning(broadcast_table.c.id)
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            return result.all()
+
+    async def start_broadcast(self, admin_telegram_id: str, text: str) -> Sequence[Row]:
+        """
+        Set text of the latest admin's broadcast draft and start it.
+        :param admin_telegram_id: Admin telegram id.
+        :param text: Message text.
+        """
+        connection: AsyncConnection
+        draft_id = select(func.max(broadcast_table.c.id)).where(
+            broadcast_table.c.admin_telegram_id == admin_telegram_id,
+            broadcast_table.c.status == "draft",
+        ).scalar_subquery()
+        query = (
+            update(broadcast_table)
+            .where(broadcast_table.c.id == draft_id)
+            .values(text=text, status="running")
+            .returning(broadcast_table.c.id, broadcast_table.c.audience)
+        )
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            return result.all()
+
+    async def read_running_broadcasts(self) -> Sequence[Row]:
+        """
+        Get broadcasts that are not finished yet.
+        """
+        connection: AsyncConnection
+        query = select(broadcast_table).where(broadcast_table.c.status == "running").order_by(broadcast_table.c.id)
+        async with self._engine.begin() as connection:
+            result = await connection.execute(query)
+            return result.all()
+
+    async def update_progress(self, broadcast_id: int, last_seq_id: int, sent: int, failed: int) -> None:
+        """
+        Save broadcast progress, so that it is resumed from this point after a restart.
+        :param broadcast_id: Broadcast id.
+        :param last_seq_id: Last processed recipient seq_id.
+        :param sent: Number of delivered messages.
+        :param failed: Number of undelivered messages.
+        """
+        connection: AsyncConnection
+        query = update(broadcast_table).where(broadcast_table.c.id == broadcast_id).values(
+            last_seq_id=last_seq_id, sent=sent, failed=failed
+        )
+        async with self._engine.begin() as connection:
+            await connection.execute(query)
+
+    async def finish_broadcast(self, broadcast_id: int) -> None:
+        """
+        Mark broadcast as done.
+        :param broadcast_id: Broadcast id.
+        """
+        connection: AsyncConnection
+        query = update(broadcast_table).where(broadcast_table.c.id == broadcast_id).values(
+            status="done", finished_ts=func.now()
+        )
+        async with self._engine.begin() as connection:
+            await connection.execute(query)
+
+    @staticmethod
+    def recipients_query(audience: str, after_seq_id: int, limit: int) -> Select:
+        """
+        Build query that returns active recipients of a broadcast in seq_id order (keyset pagination).
+        :param audience: Recipients: 'masters', 'clients' or 'all'.
+        :param after_seq_id: Return recipients after this seq_id.
+        :param limit: Max number of recipients.
+        :return: Select query.
+        """
+        query = select(user_table.c.seq_id, user_table.c.telegram_id).where(
+            user_table.c.is_active.is_(True),
+            user_table.c.seq_id > after_seq_id,
+        )
+        if audience == "masters":
+            query = query.where(user_table.c.is_master.is_(True))
+        elif audience == "clients":
+            query = query.where(user_table.c.is_master.is_not(True))
+        return query.order_by(user_table.c.seq_id).limit(limit)
+
+    async def read_recipients(self, audience: str, after_seq_id: int, limit: int) -> Sequence[Row]:
+        """
+        Get a page of broadcast recipients. The connection is released before the page is returned, so nothing is
+        held open while messages are sent.
+        :param audience: Recipients: 'masters', 'clients' or 'all'.
+        :param after_seq_id: Return recipients after this seq_id.
+        :param limit: Max number of recipients.
+        """
+        connection: AsyncConnection
+        query = self.recipients_query(audience=audience, after_seq_id=after_seq_id, limit=limit)
+        async with self._engine.connect() as connection:
             result = await connection.execute(query)
             return result.all()
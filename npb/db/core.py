@@ -2,7 +2,9 @@ from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import registry
 
 from npb.config import Config
+from npb.db.instrumentation import instrument_engine
 
 
 engine = create_async_engine(Config.DB_DSN)
+instrument_engine(engine)
 mapper_registry = registry()
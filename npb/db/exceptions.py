@@ -24,3 +24,10 @@ class ReadMaxSequenceError(BaseDBException):
     Read Max Sequence Error.
     """
     ...
+
+
+class UpdateUserSessionInfoError(BaseDBException):
+    """
+    Update User Session Info Error.
+    """
+    ...
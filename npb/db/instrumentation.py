@@ -0,0 +1,93 @@
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+
+from npb.metrics import get_metrics_registry
+
+statement_duration_histogram = get_metrics_registry().histogram(
+    "npb_db_statement_duration_seconds",
+    "SQL statement execution time by operation.",
+    ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+statement_errors_counter = get_metrics_registry().counter(
+    "npb_db_statement_errors_total", "Failed SQL statements by operation.", ["operation"]
+)
+pool_size_gauge = get_metrics_registry().gauge("npb_db_pool_size", "Configured size of DB connection pool.")
+pool_connections_gauge = get_metrics_registry().gauge(
+    "npb_db_pool_connections", "DB connections of the pool by state: checked_out, checked_in, overflow.", ["state"]
+)
+
+# statement kinds used as label values, everything else is 'other', so that label cardinality is bounded
+OPERATIONS = frozenset(("select", "insert", "update", "delete", "with", "begin", "commit", "rollback"))
+STARTED_KEY = "npb_statement_started"
+
+
+class StatementStats:
+    """
+    SQL statements executed within a unit of work (e.g. handling of one update).
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# stats of the unit of work in progress, engine events run in the caller's context (greenlets inherit it)
+current_statement_stats: ContextVar[Optional[StatementStats]] = ContextVar("current_statement_stats", default=None)
+
+
+def statement_operation(statement: str) -> str:
+    """
+    Get statement kind.
+    :param statement: SQL statement.
+    :return: Label value, e.g. 'select'.
+    """
+    operation = statement.lstrip(" \n\t(").split(None, 1)[0].lower() if statement.strip() else ""
+    return operation if operation in OPERATIONS else "other"
+
+
+def before_cursor_execute(connection, cursor, statement, parameters, context, executemany) -> None:
+    connection.info.setdefault(STARTED_KEY, []).append(perf_counter())
+
+
+def after_cursor_execute(connection, cursor, statement, parameters, context, executemany) -> None:
+    duration = perf_counter() - connection.info[STARTED_KEY].pop()
+    statement_duration_histogram.observe(duration, operation=statement_operation(statement))
+    if (stats := current_statement_stats.get()) is not None:
+        stats.count += 1
+        stats.duration += duration
+
+
+def handle_error(exception_context: ExceptionContext) -> None:
+    if exception_context.connection is not None and exception_context.connection.info.get(STARTED_KEY):
+        exception_context.connection.info[STARTED_KEY].pop()
+    statement_errors_counter.inc(operation=statement_operation(exception_context.statement or ""))
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Record SQL statement metrics of the engine.
+    :param engine: DB engine object.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", handle_error)
+
+
+def observe_pool(engine: AsyncEngine) -> None:
+    """
+    Set pool usage gauges (pool state is sampled, e.g. when metrics are scraped).
+    :param engine: DB engine object.
+    """
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return
+    pool_size_gauge.set(pool.size())
+    pool_connections_gauge.set(pool.checkedout(), state="checked_out")
+    pool_connections_gauge.set(pool.checkedin(), state="checked_in")
+    pool_connections_gauge.set(max(pool.overflow(), 0), state="overflow")
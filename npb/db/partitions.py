@@ -0,0 +1,197 @@
+import re
+from datetime import datetime, timedelta, timezone
+from logging import Logger
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from npb.config import Config
+
+APPOINTMENT_TABLE = "appointment"
+APPOINTMENT_DEFAULT_PARTITION = "appointment_default"
+APPOINTMENT_ARCHIVE_SCHEMA = "appointment_archive"
+PARTITION_NAME_PATTERN = re.compile(r"^appointment_y(\d{4})m(\d{2})$")
+
+
+def add_months(month_start: datetime, months: int) -> datetime:
+    """
+    Shift beginning of a month by given number of months.
+    :param month_start: Beginning of a month.
+    :param months: Number of months (may be negative).
+    :return: Beginning of the shifted month.
+    """
+    month_index = month_start.year * 12 + month_start.month - 1 + months
+    return month_start.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def partition_timezone() -> timezone:
+    """
+    Time zone that partitions are cut in. It is the app time zone (Config.TZ_OFFSET), the one calendar queries take
+    month and day edges in (see npb.utils.common.get_month_edges), so that a month range hits a single partition.
+    Bounds of existing partitions are fixed in DB, so changing the offset needs appointment table re-partitioning.
+    :return: Time zone.
+    """
+    return timezone(timedelta(hours=Config.TZ_OFFSET))
+
+
+def partition_month_start(moment: datetime) -> datetime:
+    """
+    Beginning of the month (in partition time zone) that given moment belongs to.
+    :param moment: Moment (timezone aware).
+    :return: Beginning of the month.
+    """
+    moment = moment.astimezone(partition_timezone())
+    return datetime(moment.year, moment.month, 1, tzinfo=moment.tzinfo)
+
+
+def partition_name(month_start: datetime) -> str:
+    """
+    Name of appointment partition for a given month.
+    :param month_start: Beginning of a month.
+    :return: Partition name.
+    """
+    return f"{APPOINTMENT_TABLE}_y{month_start.year:04d}m{month_start.month:02d}"
+
+
+def partition_month(name: str) -> datetime | None:
+    """
+    Parse month back from appointment partition name.
+    :param name: Partition name.
+    :return: Beginning of a month or None (e.g. for default partition).
+    """
+    match = PARTITION_NAME_PATTERN.match(name)
+    if not match:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=partition_timezone())
+
+
+def create_partition_statements(month_start: datetime) -> List[str]:
+    """
+    SQL statements that create a monthly appointment partition. Rows that have already landed in the default
+    partition for this month are moved into the new partition, otherwise attaching would fail.
+    :param month_start: Beginning of a month.
+    :return: SQL statements (must be executed in a single transaction).
+    """
+    name = partition_name(month_start)
+    lower = month_start.isoformat()
+    upper = add_months(month_start, 1).isoformat()
+    return [
+        f"CREATE TABLE IF NOT EXISTS {name} (LIKE {APPOINTMENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+        (
+            f"WITH moved AS (DELETE FROM {APPOINTMENT_DEFAULT_PARTITION} "
+            f"WHERE datetime >= '{lower}' AND datetime < '{upper}' RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        f"ALTER TABLE {APPOINTMENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')",
+    ]
+
+
+async def list_appointment_partitions(connection: AsyncConnection) -> List[Tuple[str, datetime | None]]:
+    """
+    List attached appointment partitions.
+    :param connection: DB connection.
+    :return: Pairs of partition name and its month.
+    """
+    query = text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = CAST(:table AS regclass)"
+    )
+    result = await connection.execute(query, {"table": APPOINTMENT_TABLE})
+    return [(name, partition_month(name)) for name in result.scalars().all()]
+
+
+async def ensure_appointment_partitions(engine: AsyncEngine, logger: Logger, now: datetime = None) -> List[str]:
+    """
+    Create appointment partitions for current month and Config.APPOINTMENT_PARTITIONS_AHEAD months ahead.
+    :param engine: DB engine.
+    :param logger: Logger.
+    :param now: Current moment.
+    :return: Names of created partitions.
+    """
+    current_month = partition_month_start(now or datetime.now(tz=timezone.utc))
+    created = await create_missing_partitions(
+        engine=engine,
+        first_month=current_month,
+        last_month=add_months(current_month, Config.APPOINTMENT_PARTITIONS_AHEAD),
+    )
+    logger.info(f"Appointment partitions job: partitions created - {created}")
+    return created
+
+
+async def create_missing_partitions(engine: AsyncEngine, first_month: datetime, last_month: datetime) -> List[str]:
+    """
+    Create appointment partitions for every month in a range (both ends included) that has none yet.
+    :param engine: DB engine.
+    :param first_month: Beginning of the first month.
+    :param last_month: Beginning of the last month.
+    :return: Names of created partitions.
+    """
+    created = []
+    async with engine.begin() as connection:
+        existing = {name for name, _ in await list_appointment_partitions(connection=connection)}
+    month_start = first_month
+    while month_start <= last_month:
+        name = partition_name(month_start)
+        if name not in existing:
+            async with engine.begin() as connection:
+                for statement in create_partition_statements(month_start):
+                    await connection.execute(text(statement))
+            created.append(name)
+        month_start = add_months(month_start, 1)
+    return created
+
+
+async def drop_past_free_slots(engine: AsyncEngine, logger: Logger, now: datetime = None) -> int:
+    """
+    Delete slots that are in the past and have never been booked.
+    :param engine: DB engine.
+    :param logger: Logger.
+    :param now: Current moment.
+    :return: Number of deleted slots.
+    """
+    now = now or datetime.now(tz=timezone.utc)
+    query = text(f"DELETE FROM {APPOINTMENT_TABLE} WHERE is_reserved IS NOT TRUE AND datetime < :now")
+    async with engine.begin() as connection:
+        result = await connection.execute(query, {"now": now})
+    logger.info(f"Appointment retention job: past free slots deleted - {result.rowcount}")
+    return result.rowcount
+
+
+async def archive_old_partitions(engine: AsyncEngine, logger: Logger, now: datetime = None) -> List[str]:
+    """
+    Detach partitions older than Config.APPOINTMENT_RETENTION_MONTHS and move them to archive schema.
+    :param engine: DB engine.
+    :param logger: Logger.
+    :param now: Current moment.
+    :return: Names of archived partitions.
+    """
+    retention_border = add_months(
+        partition_month_start(now or datetime.now(tz=timezone.utc)), -Config.APPOINTMENT_RETENTION_MONTHS
+    )
+    archived = []
+    async with engine.begin() as connection:
+        partitions = await list_appointment_partitions(connection=connection)
+    for name, month_start in partitions:
+        if month_start is None or month_start >= retention_border:
+            continue
+        async with engine.begin() as connection:
+            await connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {APPOINTMENT_ARCHIVE_SCHEMA}"))
+            await connection.execute(text(f"ALTER TABLE {APPOINTMENT_TABLE} DETACH PARTITION {name}"))
+            await connection.execute(text(f"ALTER TABLE {name} SET SCHEMA {APPOINTMENT_ARCHIVE_SCHEMA}"))
+        archived.append(name)
+    logger.info(f"Appointment retention job: partitions archived - {archived}")
+    return archived
+
+
+async def maintain_appointment_partitions(engine: AsyncEngine, logger: Logger) -> None:
+    """
+    Create future partitions and apply retention policy.
+    :param engine: DB engine.
+    :param logger: Logger.
+    """
+    now = datetime.now(tz=timezone.utc)
+    await ensure_appointment_partitions(engine=engine, logger=logger, now=now)
+    await drop_past_free_slots(engine=engine, logger=logger, now=now)
+    await archive_old_partitions(engine=engine, logger=logger, now=now)
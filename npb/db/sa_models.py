@@ -1,6 +1,6 @@
 from uuid import uuid4
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Table, text, UniqueConstraint
+from sqlalchemy import Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, String, Table, text, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 
 from npb.config import CommonConstants
@@ -18,6 +18,45 @@ user_table = Table(
         comment="User services ({service: {sub_service: true/false, ...}, ...})",
         server_default=text("'{}'::jsonb"),
     ),
+    Column("phone_number", String(100), comment="Phone number."),
+    Column("instagram_link", String(100), comment="Instagram link."),
+    Column("description", String(500), comment="User description."),
+    Column("is_master", Boolean, comment="Is user a master."),
+    Column("is_admin", Boolean, comment="Is user an admin."),
+    Column("is_active", Boolean, comment="Is user subscription active.", default=True),
+    Column("fill_reg_form", Boolean, comment="Is registration form filled up.", default=False),
+    Column("ban_counter", Integer, comment="Ban counter."),
+    Column("ban_ts", DateTime, comment="Ban last timestamp."),
+    Column(
+        "profile_version",
+        Integer,
+        nullable=False,
+        comment="Incremented on every update of fields shown in the profile card (see npb.tg.profile_cards).",
+        server_default="0",
+    ),
+)
+# master search (see npb.utils.tg.client.master_search_where_clause) pages active masters by seq_id
+Index(
+    "ix_npb_user_active_master_seq_id",
+    user_table.c.seq_id,
+    postgresql_where=user_table.c.is_master.is_(True) & user_table.c.is_active.is_(True),
+)
+
+user_session_table = Table(
+    "user_session",
+    # volatile navigation state and counters live apart from the profile, so that every button press
+    # rewrites a narrow row (HOT-friendly, low fillfactor) instead of the whole npb_user row
+    mapper_registry.metadata,
+    Column(
+        "telegram_id",
+        String(100),
+        ForeignKey("npb_user.telegram_id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+        comment="Telegram id.",
+    ),
+    Column("state", String(100), comment="FSM storage state."),
+    Column("edit_mode", String(100), comment="Edit mode."),
     Column(
         "current_service",
         String(100),
@@ -30,27 +69,13 @@ user_table = Table(
         comment="Current picked sub service.",
         default=CommonConstants.TEMPORARY_DATA["current_sub_service"],
     ),
-    Column("phone_number", String(100), comment="Phone number."),
-    Column("instagram_link", String(100), comment="Instagram link."),
-    Column("description", String(500), comment="User description."),
-    Column("is_master", Boolean, comment="Is user a master."),
-    Column("is_admin", Boolean, comment="Is user an admin."),
-    Column("state", String(100), comment="FSM storage state."),
-    Column("edit_mode", String(100), comment="Edit mode."),
-    Column("is_active", Boolean, comment="Is user subscription active.", default=True),
-    Column("non_recogn_count", Integer, comment="Number of non recognized phrases.", default=0),
-    Column("non_recogn_ts", DateTime, comment="Non recognized phrases last timestamp."),
-    Column("fill_reg_form", Boolean, comment="Is registration form filled up.", default=False),
-    Column("last_ts", DateTime, comment="Last activity timestamp."),
-    Column("flood_count", Integer, comment="Number of user actions considered as flood."),
-    Column("flood_ts", DateTime, comment="Flood last timestamp."),
-    Column("ban_counter", Integer, comment="Ban counter."),
-    Column("ban_ts", DateTime, comment="Ban last timestamp."),
     Column(
-        "current_calendar",
-        JSONB,
-        comment="Current calendar state.",
-        server_default=CommonConstants.TEMPORARY_DATA["current_calendar"],
+        "current_calendar_mask",
+        Integer,
+        nullable=False,
+        comment="Days picked in current month of master's calendar (bit day - 1 is set for a picked day).",
+        server_default="0",
+        default=CommonConstants.TEMPORARY_DATA["current_calendar_mask"],
     ),
     Column(
         "current_day",
@@ -88,6 +113,22 @@ user_table = Table(
         comment="Current picked page",
         default=CommonConstants.TEMPORARY_DATA["current_page"],
     ),
+    Column("last_ts", DateTime, comment="Last activity timestamp."),
+    Column("flood_count", Integer, comment="Number of user actions considered as flood."),
+    Column("flood_ts", DateTime, comment="Flood last timestamp."),
+    Column("non_recogn_count", Integer, comment="Number of non recognized phrases.", default=0),
+    Column("non_recogn_ts", DateTime, comment="Non recognized phrases last timestamp."),
+)
+# counters are non-zero for a handful of users only, so reset jobs look up expired counters in these small indexes
+Index(
+    "ix_user_session_flood_ts",
+    user_session_table.c.flood_ts,
+    postgresql_where=user_session_table.c.flood_count > 0,
+)
+Index(
+    "ix_user_session_non_recogn_ts",
+    user_session_table.c.non_recogn_ts,
+    postgresql_where=user_session_table.c.non_recogn_count > 0,
 )
 
 appointment_table = Table(
@@ -126,4 +167,85 @@ appointment_table = Table(
         "notification_ts", DateTime(timezone=True), comment="Last notification ts"
     ),
     UniqueConstraint("master_telegram_id", "datetime"),
+    # partitioned by month, see npb.db.partitions
+    postgresql_partition_by="RANGE (datetime)",
+)
+Index("ix_appointment_client_telegram_id_datetime", appointment_table.c.client_telegram_id, appointment_table.c.datetime)
+Index(
+    "ix_appointment_reserved_datetime",
+    appointment_table.c.datetime,
+    postgresql_where=appointment_table.c.is_reserved.is_(True),
+)
+
+dead_letter_table = Table(
+    "dead_letter",
+    mapper_registry.metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True, comment="Dead letter id."),
+    Column("chat_id", String(100), nullable=False, comment="Telegram chat id."),
+    Column("method", String(100), nullable=False, comment="Bot API method."),
+    Column("payload", JSONB, comment="Bot API method params."),
+    Column("error", String(1000), comment="Last delivery error."),
+    Column("attempts", Integer, comment="Number of delivery attempts."),
+    Column("created_ts", DateTime(timezone=True), server_default=text("now()"), comment="Dead letter timestamp."),
+)
+
+outbox_table = Table(
+    "outbox",
+    mapper_registry.metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True, comment="Outbox message id."),
+    Column("chat_id", String(100), nullable=False, comment="Telegram chat id."),
+    Column("text", String(4096), nullable=False, comment="Message text."),
+    Column("parse_mode", String(100), comment="Message parse mode."),
+    Column("attempts", Integer, server_default=text("0"), comment="Number of dispatch attempts."),
+    Column(
+        "locked_until",
+        DateTime(timezone=True),
+        server_default=text("now()"),
+        comment="Message is claimed by a dispatcher until this timestamp.",
+    ),
+    Column("created_ts", DateTime(timezone=True), server_default=text("now()"), comment="Outbox message timestamp."),
+)
+
+reminder_table = Table(
+    "reminder",
+    mapper_registry.metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True, comment="Reminder id."),
+    Column("auid", UUID, nullable=False, comment="Appointment unique id (as uuid)."),
+    Column("telegram_id", String(100), nullable=False, comment="Recipient telegram id."),
+    Column("for_master", Boolean, nullable=False, comment="Is recipient a master of the appointment."),
+    Column("appointment_datetime", DateTime(timezone=True), nullable=False, comment="Appointment date and time."),
+    Column("due_at", DateTime(timezone=True), nullable=False, comment="When reminder has to be sent."),
+)
+Index("ix_reminder_due_at", reminder_table.c.due_at)
+Index("ix_reminder_auid", reminder_table.c.auid)
+
+master_digest_table = Table(
+    "master_digest",
+    mapper_registry.metadata,
+    Column("day", Date, primary_key=True, comment="Day the digest was sent for."),
+    Column("created_ts", DateTime(timezone=True), server_default=text("now()"), comment="Digest timestamp."),
+)
+
+unreachable_chat_table = Table(
+    "unreachable_chat",
+    mapper_registry.metadata,
+    Column("chat_id", String(100), primary_key=True, comment="Telegram chat id."),
+    Column("reason", String(1000), comment="Why the chat is unreachable."),
+    Column("created_ts", DateTime(timezone=True), server_default=text("now()"), comment="Detection timestamp."),
+)
+
+broadcast_table = Table(
+    "broadcast",
+    mapper_registry.metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True, comment="Broadcast id."),
+    Column("admin_telegram_id", String(100), nullable=False, comment="Telegram id of admin who started it."),
+    Column("audience", String(20), nullable=False, comment="Recipients: 'masters', 'clients' or 'all'."),
+    Column("text", String(4096), comment="Message text."),
+    Column("status", String(20), nullable=False, server_default="draft", comment="'draft', 'running' or 'done'."),
+    Column("last_seq_id", Integer, server_default=text("0"), comment="Last processed recipient seq_id."),
+    Column("sent", Integer, server_default=text("0"), comment="Number of delivered messages."),
+    Column("failed", Integer, server_default=text("0"), comment="Number of undelivered messages."),
+    Column("created_ts", DateTime(timezone=True), server_default=text("now()"), comment="Broadcast timestamp."),
+    Column("finished_ts", DateTime(timezone=True), comment="Broadcast finish timestamp."),
 )
+Index("ix_broadcast_status", broadcast_table.c.status)
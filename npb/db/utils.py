@@ -1,10 +1,10 @@
 from datetime import datetime, timezone, timedelta
 from enum import Enum
 import operator
-from typing import Any, List, Dict, Literal, Optional, Union
+from typing import Any, Awaitable, Callable, List, Dict, Literal, Optional, Sequence, Union
 
 from pydantic import BaseModel, ConfigDict, Field, model_validator
-from sqlalchemy import Column, Table, update
+from sqlalchemy import Column, Row, Table, Update, update
 from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
 
 from npb.config import Config
@@ -19,6 +19,11 @@ COMPARISON_OPERATOR_BY_SYMBOL = {
 }
 
 
+# called inside the transaction of a data change with its returned rows, so that dependent writes
+# (e.g. outbox messages) are committed or rolled back together with the change
+TransactionHook = Callable[[AsyncConnection, Sequence[Row]], Awaitable[None]]
+
+
 class JoinTypes(Enum):
     left = "left"
     right = "right"
@@ -94,15 +99,33 @@ class Join(BaseModel):
     )
 
 
-async def basic_update(
-    engine: AsyncEngine,
+def apply_where_clause(query: Any, where_clause: WhereClause) -> Any:
+    """
+    Apply where clause (either 'params + values' or 'filter' form) to a query.
+    :param query: Select / update / delete query.
+    :param where_clause: Where clause.
+    :return: Query with where clause applied.
+    """
+    if where_clause.filter:
+        return query.filter(*where_clause.filter)
+    for number, where_clause_param in enumerate(where_clause.params):
+        comparison_operator = get_comparison_operator_by_symbol(where_clause.comparison_operators[number])
+        query = query.where(comparison_operator(where_clause_param, where_clause.values[number]))
+    return query
+
+
+def build_update_query(
     table: Table,
     data_to_set: Dict[str, Any] | List[Dict[str, Any]],
     where_clause: WhereClause = None,
-    returning_values: List[Column] = None,
-    return_all: bool = False,
-):
-    connection: AsyncConnection
+) -> Update:
+    """
+    Build update query (without returning clause).
+    :param table: Table to update.
+    :param data_to_set: Data to set.
+    :param where_clause: Where clause.
+    :return: Update query.
+    """
     query = update(table)
     if where_clause:
         if where_clause.params and where_clause.values and where_clause.comparison_operators:
@@ -118,6 +141,20 @@ async def basic_update(
     else:
         for data in data_to_set:
             query = query.values(data)
+    return query
+
+
+async def basic_update(
+    engine: AsyncEngine,
+    table: Table,
+    data_to_set: Dict[str, Any] | List[Dict[str, Any]],
+    where_clause: WhereClause = None,
+    returning_values: List[Column] = None,
+    return_all: bool = False,
+    transaction_hooks: List[TransactionHook] = None,
+):
+    connection: AsyncConnection
+    query = build_update_query(table=table, data_to_set=data_to_set, where_clause=where_clause)
     if not return_all and returning_values:
         query = query.returning(*returning_values)
     else:
@@ -126,7 +163,10 @@ async def basic_update(
         print(f"DEBUG basic update query: {str(query)}")
         result = await connection.execute(query)
         print(f"DEBUG basic update result: {str(result)}")
-        return result.all()
+        rows = result.all()
+        for transaction_hook in transaction_hooks or []:
+            await transaction_hook(connection, rows)
+        return rows
 
 
 def create_timestamp_with_timezone() -> datetime:
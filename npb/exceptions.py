@@ -54,6 +54,20 @@ class CouldNotNotify(BaseError):
     pass
 
 
+class DeliveryFailed(BaseError):
+    """
+    Telegram request could not be delivered (even after retries).
+    """
+    pass
+
+
+class ChatUnreachable(DeliveryFailed):
+    """
+    Telegram chat is unreachable (e.g. user has blocked the bot).
+    """
+    pass
+
+
 class DropIsProhibited(BaseError):
     """
     Drop Is Prohibited
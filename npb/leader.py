@@ -0,0 +1,102 @@
+import asyncio
+import os
+from logging import Logger
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from npb.config import Config
+from npb.db.core import engine
+from npb.logger import get_logger
+from npb.metrics import get_metrics_registry
+
+is_leader_gauge = get_metrics_registry().gauge(
+    "npb_background_leader", "1 if this process currently runs background jobs, 0 otherwise."
+)
+leadership_changes_counter = get_metrics_registry().counter(
+    "npb_background_leadership_changes_total", "Number of times leadership was acquired or lost.", ["event"]
+)
+
+
+class LeaderElector:
+    """
+    Elects a single process (among all workers and hosts) to run background jobs. The leader holds a session level
+    Postgres advisory lock on a dedicated connection; when the leader dies, its connection is closed, the lock is
+    released and another process takes it over on its next attempt.
+    """
+    def __init__(self, engine: AsyncEngine, logger: Logger, lock_key: int = Config.LEADER_LOCK_KEY):
+        self._engine = engine
+        self._logger = logger
+        self._lock_key = lock_key
+        self._connection: Optional[AsyncConnection] = None
+        self._is_leader = False
+        self._stopped = False
+        is_leader_gauge.set(0)
+
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader
+
+    async def run(self) -> None:
+        """
+        Try to acquire (or check that this process still holds) leadership every Config.LEADER_CHECK_INTERVAL.
+        """
+        while not self._stopped:
+            try:
+                if self._is_leader:
+                    await self._check_connection()
+                else:
+                    await self._try_acquire()
+            except Exception as exc:
+                self._logger.error(f"Leader election error (pid {os.getpid()}): {exc}.")
+                await self._lose_leadership()
+            await asyncio.sleep(Config.LEADER_CHECK_INTERVAL)
+
+    async def stop(self) -> None:
+        """
+        Stop election and release leadership (if held).
+        """
+        self._stopped = True
+        if self._connection is not None:
+            try:
+                await self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self._lock_key})
+            except Exception as exc:
+                self._logger.error(f"Could not release leader lock: {exc}.")
+        await self._lose_leadership()
+
+    async def _try_acquire(self) -> None:
+        if self._connection is None:
+            connection = await self._engine.connect()
+            # no transaction is kept open on the dedicated connection, only the advisory lock
+            self._connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        result = await self._connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self._lock_key})
+        if result.scalar_one():
+            self._is_leader = True
+            is_leader_gauge.set(1)
+            leadership_changes_counter.inc(event="acquired")
+            self._logger.info(f"Background jobs leadership acquired (pid {os.getpid()}).")
+
+    async def _check_connection(self) -> None:
+        await self._connection.execute(text("SELECT 1"))
+
+    async def _lose_leadership(self) -> None:
+        if self._is_leader:
+            self._is_leader = False
+            is_leader_gauge.set(0)
+            leadership_changes_counter.inc(event="lost")
+            self._logger.info(f"Background jobs leadership lost (pid {os.getpid()}).")
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            try:
+                await connection.close()
+            except Exception as exc:
+                self._logger.error(f"Could not close leader connection: {exc}.")
+
+
+leader_elector = LeaderElector(engine=engine, logger=get_logger())
+
+
+def get_leader_elector():
+    """Returns a leader_elector global instance."""
+    return leader_elector
@@ -1,9 +1,76 @@
-from typing import Any, Awaitable, Callable, Dict
+from contextvars import ContextVar
+from logging import DEBUG
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware
-from aiogram.types import Message
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import Message, Update
 
+from npb.db.instrumentation import StatementStats, current_statement_stats
 from npb.logger import get_logger
+from npb.metrics import get_metrics_registry
+
+UNHANDLED = "unhandled"
+# statements per update are counted, so these are counts, not seconds
+STATEMENTS_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+update_duration_histogram = get_metrics_registry().histogram(
+    "npb_tg_update_duration_seconds", "Update handling latency by event type and handler.", ["event", "handler"]
+)
+update_errors_counter = get_metrics_registry().counter(
+    "npb_tg_update_errors_total", "Updates whose handling has failed by event type and handler.", ["event", "handler"]
+)
+update_statements_histogram = get_metrics_registry().histogram(
+    "npb_tg_update_sql_statements", "SQL statements executed per update by handler.", ["handler"],
+    buckets=STATEMENTS_BUCKETS,
+)
+update_sql_duration_histogram = get_metrics_registry().histogram(
+    "npb_tg_update_sql_duration_seconds", "Time spent in SQL statements per update by handler.", ["handler"]
+)
+
+
+class UpdateMetrics:
+    """
+    Metrics of the update being handled: handler is set once the update is routed.
+    """
+    def __init__(self):
+        self.handler = UNHANDLED
+
+
+current_update_metrics: ContextVar[Optional[UpdateMetrics]] = ContextVar("current_update_metrics", default=None)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Update outer middleware that records update latency and SQL statements by handler. It must be registered first,
+    so that time spent in other middlewares (authorization, FSM) is included. Labels are event types and handler
+    names (both are bounded by the code), updates rejected before routing are labeled 'unhandled'.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        update_metrics = UpdateMetrics()
+        statement_stats = StatementStats()
+        metrics_token = current_update_metrics.set(update_metrics)
+        statements_token = current_statement_stats.set(statement_stats)
+        started = perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            update_errors_counter.inc(event=event.event_type, handler=update_metrics.handler)
+            raise
+        finally:
+            update_duration_histogram.observe(
+                perf_counter() - started, event=event.event_type, handler=update_metrics.handler
+            )
+            update_statements_histogram.observe(statement_stats.count, handler=update_metrics.handler)
+            update_sql_duration_histogram.observe(statement_stats.duration, handler=update_metrics.handler)
+            current_statement_stats.reset(statements_token)
+            current_update_metrics.reset(metrics_token)
 
 
 class HandlerInfoMiddleware(BaseMiddleware):
@@ -15,9 +82,19 @@ class HandlerInfoMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         logger = get_logger()
-        logger.info(f"Handler triggered: {handler.__name__}")
-        logger.debug(f"Data passed to handler: {data}")
-        logger.debug(f"Event passed to handler: {event}")
+        handler_object: Optional[HandlerObject] = data.get("handler")
+        callback = handler_object.callback if handler_object else handler
+        # qualified: handlers in different modules (or even in one module) may share a function name
+        handler_name = f"{callback.__module__}.{callback.__qualname__}"
+        if (update_metrics := current_update_metrics.get()) is not None:
+            update_metrics.handler = handler_name
+        logger.info(f"Handler triggered: {handler_name}")
+        # middleware runs for every update, data is not formatted unless it is logged
+        debug = logger.isEnabledFor(DEBUG)
+        if debug:
+            logger.debug(f"Data passed to handler: {data}")
+            logger.debug(f"Event passed to handler: {event}")
         result = await handler(event, data)
-        logger.debug(f"Handler processing result: {result}")
+        if debug:
+            logger.debug(f"Handler processing result: {result}")
         return result
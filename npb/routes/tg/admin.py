@@ -2,7 +2,6 @@ from datetime import datetime, timedelta, timezone
 from logging import Logger
 from typing import Dict, List, Tuple
 
-from aiogram import F
 from aiogram import Router
 from aiogram.enums import ParseMode
 from aiogram.filters import Command
@@ -17,7 +16,7 @@ from sqlalchemy import func
 
 from npb.config import ClientConstants, RegistrationConstants, MasterConstants, CommonConstants, AdminConstants
 from npb.config import Config
-from npb.db.api import Appointment, User
+from npb.db.api import Appointment, Broadcast, User
 from npb.db.sa_models import appointment_table, user_table
 from npb.db.utils import WhereClause, Join
 from npb.db.core import engine
@@ -26,6 +25,7 @@ from npb.state_machine.admin_states import Admin
 from npb.state_machine.client_states import Client
 from npb.tg.black_list import get_black_list_manager
 from npb.tg.bot import bot
+from npb.tg.fast_routes import fast_route
 from npb.tg.models import AppointmentModel, UserModel
 from npb.utils.tg.client import pick_master_keyboard, pick_day_keyboard, my_appointments_keyboard
 from npb.utils.common import get_user_data, log_handler_info, master_profile_info, pick_sub_service_keyboard, \
@@ -72,7 +72,7 @@ async def _handle_activate_deactivate_user(message: Message, activate: bool = Tr
     await message.answer(text=text)
 
 
-@admin_router.callback_query(Admin.default, F.data.casefold() == AdminConstants.ADD_MASTER)
+@fast_route(admin_router, AdminConstants.ADD_MASTER, state=Admin.default)
 async def handle_add_master_start(callback: CallbackQuery, state: FSMContext):
     """Activates when admin is going to add a new master."""
     logger = get_logger()
@@ -102,10 +102,7 @@ async def handle_add_master(message: Message, state: FSMContext):
     await message.answer(text=text)
 
 
-@admin_router.callback_query(
-    Admin.default,
-    (F.data.casefold() == AdminConstants.ACTIVATE_USER) | (F.data.casefold() == AdminConstants.DEACTIVATE_USER)
-)
+@fast_route(admin_router, AdminConstants.ACTIVATE_USER, AdminConstants.DEACTIVATE_USER, state=Admin.default)
 async def handle_activate_deactivate_user_start(callback: CallbackQuery, state: FSMContext):
     """Activates when admin is going to activate / deactivate a user."""
     logger = get_logger()
@@ -126,7 +123,68 @@ async def handle_activate_user(message: Message, state: FSMContext):
 
 
 @admin_router.message(Admin.deactivate_user)
-async def handle_activate_user(message: Message, state: FSMContext):
+async def handle_deactivate_user(message: Message, state: FSMContext):
     """Activates when admin is deactivating a user."""
     await _handle_activate_deactivate_user(message=message, activate=False)
 
+
+@fast_route(admin_router, AdminConstants.BROADCAST, state=Admin.default)
+async def handle_broadcast_start(callback: CallbackQuery, state: FSMContext):
+    """Activates when admin is going to send a broadcast."""
+    logger = get_logger()
+    log_handler_info(handler_name="admin.handle_broadcast_start", logger=logger, callback_data=callback.data)
+    await state.set_state(Admin.broadcast_audience)
+    text = "Пожалуйста, выберите получателей рассылки."
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="Мастерам", callback_data=AdminConstants.BROADCAST_MASTERS)],
+            [InlineKeyboardButton(text="Клиентам", callback_data=AdminConstants.BROADCAST_CLIENTS)],
+            [InlineKeyboardButton(text="Всем", callback_data=AdminConstants.BROADCAST_ALL)],
+        ]
+    )
+    await callback.message.answer(text=text, reply_markup=keyboard)
+
+
+@fast_route(
+    admin_router,
+    AdminConstants.BROADCAST_MASTERS,
+    AdminConstants.BROADCAST_CLIENTS,
+    AdminConstants.BROADCAST_ALL,
+    state=Admin.broadcast_audience,
+)
+async def handle_broadcast_audience(callback: CallbackQuery, state: FSMContext):
+    """Activates when admin has picked broadcast recipients."""
+    logger = get_logger()
+    log_handler_info(handler_name="admin.handle_broadcast_audience", logger=logger, callback_data=callback.data)
+    audience = {
+        AdminConstants.BROADCAST_MASTERS: "masters",
+        AdminConstants.BROADCAST_CLIENTS: "clients",
+        AdminConstants.BROADCAST_ALL: "all",
+    }[callback.data]
+    await Broadcast(engine=engine, logger=logger).create_broadcast(
+        admin_telegram_id=str(callback.message.chat.id), audience=audience
+    )
+    await state.set_state(Admin.broadcast_text)
+    await callback.message.answer(text="Пожалуйста, введите текст рассылки.")
+
+
+@admin_router.message(Admin.broadcast_text)
+async def handle_broadcast_text(message: Message, state: FSMContext):
+    """Activates when admin has entered broadcast text."""
+    logger = get_logger()
+    log_handler_info(handler_name="admin.handle_broadcast_text", logger=logger, message_text=message.text)
+    if not message.text or len(message.text) > 4096:
+        await message.answer(text="Текст рассылки должен быть не длиннее 4096 символов. Пожалуйста, введите текст.")
+        return
+    broadcast = await Broadcast(engine=engine, logger=logger).start_broadcast(
+        admin_telegram_id=str(message.chat.id), text=message.text
+    )
+    await state.set_state(Admin.default)
+    if broadcast:
+        text = (
+            f"Рассылка №{broadcast[0].id} запущена. Каждые {Config.BROADCAST_PROGRESS_EVERY} сообщений Вы будете "
+            f"получать отчёт о ходе рассылки."
+        )
+    else:
+        text = "Не удалось найти рассылку. Пожалуйста, начните заново."
+    await message.answer(text=text)
@@ -9,32 +9,34 @@ from aiogram.enums import ParseMode
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State
+from aiogram.methods import TelegramMethod
 from aiogram.types import (
     CallbackQuery,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
     Message,
 )
-from sqlalchemy import func, Row
 from sqlalchemy.ext.asyncio import AsyncEngine
 
 from npb.config import ClientConstants, RegistrationConstants, MasterConstants, CommonConstants
 from npb.config import Config
-from npb.db.api import Appointment, User
+from npb.db.api import Appointment, Outbox, User
 from npb.db.sa_models import appointment_table, user_table
-from npb.db.utils import WhereClause, Join
+from npb.db.utils import WhereClause, Join, create_timestamp_with_timezone
 from npb.db.core import engine
 from npb.logger import get_logger
 from npb.state_machine.client_states import Client
 from npb.text.client import pick_sub_service_text, month_appointments_text, pick_time_text
-from npb.tg.bot import bot
-from npb.tg.models import AppointmentModel
+from npb.tg.callbacks import BookingActions, BookingNavigation, get_booking_codec
+from npb.tg.fast_routes import fast_route
+from npb.tg.models import AppointmentModel, OutboxMessageModel
+from npb.tg.view_cache import edit_or_answer
 from npb.utils.tg.client import pick_master_keyboard, pick_day_keyboard, my_appointments_keyboard, \
     count_appointments_for_client
 from npb.utils.common import get_user_data, log_handler_info, master_profile_info, pick_sub_service_keyboard, \
-    get_month_edges, get_picked_services_and_sub_services, get_month, _prepare_user_info, appointment_info, is_uuid, \
-    notify_user, cancel_appointment_and_notify_user
-from npb.utils.tg.client import pick_single_service_keyboard, pick_master_available_slots_keyboard
+    get_day_edges, get_picked_services_and_sub_services, _prepare_user_info, appointment_info, is_uuid, \
+    master_month_where_clause, cancel_appointment_and_notify_user
+from npb.utils.tg.client import all_services_keyboard, pick_master_available_slots_keyboard
 from npb.routes.tg.registration_form import _handle_sub_service, _handle_start_edit_phone_number, \
     _handle_start_edit_instagram_link, _handle_phone_number, _handle_start_edit_telegram_profile, \
     _handle_telegram_profile
@@ -49,7 +51,7 @@ async def _handle_service(
     text: str = None,
     page_number: int = None,
     next_state: State = None,
-) -> None:
+) -> TelegramMethod:
     """
     Activates when client has already picked service.
     """
@@ -75,32 +77,29 @@ async def _handle_service(
             data_to_set["state"] = next_state.state
         await User(engine=engine, logger=logger).update_user_info(where_clause=where_clause, data_to_set=data_to_set)
     text = text or "Пожалуйста, выберите Мастера (или нажмите на 'Фильтр', чтобы выбрать подуслуги)"
-    await bot.edit_message_text(
+    return edit_or_answer(
+        callback=callback,
         text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
         parse_mode=ParseMode.MARKDOWN,
         reply_markup=keyboard,
     )
 
 
-async def _handle_pick_service(callback: CallbackQuery, state: FSMContext) -> None:
+async def _handle_pick_service(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     """
     Activates when client has already picked 'Выбрать услугу' option.
     """
-    services = list(Config.MASTER_SERVICES.keys())
-    keyboard = pick_single_service_keyboard(services)
+    keyboard = all_services_keyboard()
     text = "Пожалуйста, выберите услугу:"
-    await bot.edit_message_text(
+    return edit_or_answer(
+        callback=callback,
         text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
         parse_mode=ParseMode.MARKDOWN,
         reply_markup=keyboard,
     )
 
 
-async def _handle_master(callback: CallbackQuery) -> None:
+async def _handle_master(callback: CallbackQuery) -> TelegramMethod:
     """
     Activates when client has already picked master.
     """
@@ -117,16 +116,15 @@ async def _handle_master(callback: CallbackQuery) -> None:
             ]
         ]
     )
-    await bot.edit_message_text(
+    return edit_or_answer(
+        callback=callback,
         text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
         reply_markup=keyboard,
         parse_mode=ParseMode.MARKDOWN,
     )
 
 
-async def _handle_filter(callback: CallbackQuery) -> None:
+async def _handle_filter(callback: CallbackQuery) -> TelegramMethod:
     """
     Activates when client has already picked filter.
     """
@@ -137,10 +135,9 @@ async def _handle_filter(callback: CallbackQuery) -> None:
     text = pick_sub_service_text
     sub_services = Config.MASTER_SERVICES[picked_service]
     keyboard = pick_sub_service_keyboard(sub_services, {}, picked_service)
-    await bot.edit_message_text(
+    return edit_or_answer(
+        callback=callback,
         text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
         reply_markup=keyboard,
     )
 
@@ -151,9 +148,9 @@ async def _handle_my_appointments_start(
     month: int = None,
     text: str = None,
     now: datetime = None,
-):
+) -> TelegramMethod:
     telegram_id = str(callback.message.chat.id)
-    now = now or datetime.now()
+    now = now or create_timestamp_with_timezone()
     month = month or now.month
     keyboard = await my_appointments_keyboard(
         current_month=month,
@@ -163,10 +160,9 @@ async def _handle_my_appointments_start(
         now=now,
     )
     text = text or month_appointments_text % (Config.MONTHS_MAP.get(month)[0], now.year)
-    await bot.edit_message_text(
+    return edit_or_answer(
+        callback=callback,
         text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
         reply_markup=keyboard,
         parse_mode=ParseMode.MARKDOWN,
     )
@@ -177,24 +173,17 @@ async def _handle_pick_day(
     current_month: int,
     current_year: int,
     telegram_id: str,
-    arrows: bool = False,
-    callback: CallbackQuery = None,
-    next_state: State = None,
-) -> Tuple[int, int, InlineKeyboardMarkup]:
-    if arrows:
-        current_month, current_year = get_month(
-            action_type=callback.data, current_month=current_month, current_year=current_year
-        )
-    month_begin, month_end = get_month_edges(month=current_month, year=current_year)
-    appointment_where_clause = WhereClause(
-        params=[
-            appointment_table.c.master_telegram_id,
-            appointment_table.c.datetime,
-            appointment_table.c.datetime,
-            appointment_table.c.is_reserved,
-        ],
-        values=[telegram_id, month_begin, month_end, False],
-        comparison_operators=["==", ">=", "<=", "=="],
+) -> InlineKeyboardMarkup:
+    """
+    Form master's calendar for a month.
+    :param logger: Logger.
+    :param current_month: Month.
+    :param current_year: Year.
+    :param telegram_id: Master telegram id.
+    :return: Inline keyboard.
+    """
+    appointment_where_clause = master_month_where_clause(
+        master_telegram_id=telegram_id, month=current_month, year=current_year, is_reserved=False
     )
     appointments = await Appointment(engine=engine, logger=logger).read_appointment_info(
         where_clause=appointment_where_clause
@@ -202,76 +191,246 @@ async def _handle_pick_day(
     appointments = Appointment.appointments_as_dict(appointments=appointments)
     print("DEBUG appointments: ", appointments)
     print("DEBUG current_month, current_year: ", current_month, current_year)
-    keyboard = pick_day_keyboard(
+    return pick_day_keyboard(
         picked_month=current_month,
         picked_year=current_year,
         master_time_slots=appointments,
+        master_telegram_id=telegram_id,
     )
-    where_clause = WhereClause(
-        params=[user_table.c.telegram_id],
-        values=[telegram_id],
-        comparison_operators=["=="]
-    )
-    data_to_set = {"current_month": int(current_month), "current_year": int(current_year)}
-    if next_state:
-        data_to_set["state"] = next_state.state
-    await User(engine=engine, logger=logger).update_user_info(where_clause=where_clause, data_to_set=data_to_set)
-    return current_month, current_year, keyboard
 
 
 async def _handle_pick_time(
+    logger: Logger,
+    master_telegram_id: str,
+    current_day: int,
     current_month: int,
     current_year: int,
-    user: Row,
-    logger: Logger,
-    state: FSMContext = None,
-    callback: CallbackQuery = None,
-    data_to_set: dict = None,
-    current_day: int = None,
     text: str = None,
-):
-    text = text or pick_time_text % (
-        current_day or callback.data, Config.MONTHS_MAP.get(current_month)[1], current_year
-    )
+) -> Tuple[str, InlineKeyboardMarkup]:
+    """
+    Form free slots of master's day.
+    :param logger: Logger.
+    :param master_telegram_id: Master telegram id.
+    :param current_day: Day.
+    :param current_month: Month.
+    :param current_year: Year.
+    :param text: Text (default one if not specified).
+    :return: Text and inline keyboard.
+    """
+    text = text or pick_time_text % (current_day, Config.MONTHS_MAP.get(current_month)[1], current_year)
     tz = timezone(timedelta(hours=Config.TZ_OFFSET))
-    if data_to_set is not None:
-        data_to_set["current_day"] = int(callback.data)
+    day_begin, day_end = get_day_edges(day=current_day, month=current_month, year=current_year)
     appointment_where_clause = WhereClause(
         filter=[
-            appointment_table.c.master_telegram_id == user.current_master,
+            appointment_table.c.master_telegram_id == master_telegram_id,
             appointment_table.c.is_reserved.is_(False),
-            func.extract("day", appointment_table.c.datetime) == int(current_day or callback.data),
-            func.extract("month", appointment_table.c.datetime) == current_month,
-            func.extract("year", appointment_table.c.datetime) == current_year,
+            appointment_table.c.datetime >= day_begin,
+            appointment_table.c.datetime < day_end,
             appointment_table.c.datetime > datetime.now(tz=tz),
         ]
     )
     appointments = await Appointment(engine=engine, logger=logger).read_appointment_info(
         where_clause=appointment_where_clause
     )
+    codec = get_booking_codec()
+    master = int(master_telegram_id)
     buttons = []
     for appointment in appointments:
-        slot_time = f"{appointment.datetime.strftime('%H:%M')}"
-        buttons.append([InlineKeyboardButton(text=slot_time, callback_data=slot_time)])
-    buttons.append([InlineKeyboardButton(text="Назад", callback_data=ClientConstants.CANCEL)])
+        slot_time = appointment.datetime
+        minutes = slot_time.hour * 60 + slot_time.minute
+        navigation = BookingNavigation(BookingActions.TIME, master, current_year, current_month, current_day, minutes)
+        buttons.append([InlineKeyboardButton(text=slot_time.strftime('%H:%M'), callback_data=codec.encode(navigation))])
+    back_navigation = BookingNavigation(BookingActions.MONTH, master, current_year, current_month)
+    buttons.append([InlineKeyboardButton(text="Назад", callback_data=codec.encode(back_navigation))])
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-    if state:
-        await state.set_state(Client.master_calendar_time)
-    return text, keyboard, data_to_set
+    return text, keyboard
 
 
-@client_router.callback_query(F.data == ClientConstants.BACK_TO_SERVICES)
-async def handle_back_to_services(callback: CallbackQuery, state: FSMContext):
+@fast_route(client_router, ClientConstants.BACK_TO_SERVICES)
+async def handle_back_to_services(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     """
     Activates when user goes back from any state to pick service.
     """
     logger = get_logger()
     log_handler_info(handler_name="client.handle_back_to_services", logger=logger, callback_data=callback.data)
     await state.set_state(Client.service)
-    await _handle_pick_service(callback, state=state)
+    return await _handle_pick_service(callback, state=state)
+
+
+# booking navigation: context is carried by callback data (see npb.tg.callbacks), so these handlers do not depend on
+# FSM state and do not store it in user data. They must be registered before catch-all state handlers.
+@client_router.callback_query(F.data.func(get_booking_codec().is_outdated))
+async def handle_booking_outdated(callback: CallbackQuery) -> TelegramMethod:
+    """
+    Activates when client presses a booking button sent by another version of the bot.
+    """
+    logger = get_logger()
+    log_handler_info(handler_name="client.handle_booking_outdated", logger=logger, callback_data=callback.data)
+    return callback.answer("Эта кнопка устарела. Пожалуйста, выберите мастера заново.", show_alert=True)
+
+
+@fast_route(client_router, get_booking_codec().filter(BookingActions.MONTH))
+async def handle_booking_month(callback: CallbackQuery, navigation: BookingNavigation) -> TelegramMethod:
+    """
+    Activates when client switches month of master's calendar or goes back from picking time.
+    """
+    logger = get_logger()
+    log_handler_info(handler_name="client.handle_booking_month", logger=logger, callback_data=callback.data)
+    keyboard = await _handle_pick_day(
+        logger=logger,
+        current_month=navigation.month,
+        current_year=navigation.year,
+        telegram_id=str(navigation.master),
+    )
+    text = f"*{Config.MONTHS_MAP.get(navigation.month)[0]} {navigation.year}*\nПожалуйста, выберите день:"
+    return edit_or_answer(
+        callback=callback,
+        text=text,
+        reply_markup=keyboard,
+        parse_mode=ParseMode.MARKDOWN,
+    )
+
+
+@fast_route(client_router, get_booking_codec().filter(BookingActions.DAY))
+async def handle_booking_day(callback: CallbackQuery, navigation: BookingNavigation) -> TelegramMethod:
+    """
+    Activates when client has picked a day in master's calendar.
+    """
+    logger = get_logger()
+    log_handler_info(handler_name="client.handle_booking_day", logger=logger, callback_data=callback.data)
+    text, keyboard = await _handle_pick_time(
+        logger=logger,
+        master_telegram_id=str(navigation.master),
+        current_day=navigation.day,
+        current_month=navigation.month,
+        current_year=navigation.year,
+    )
+    return edit_or_answer(
+        callback=callback,
+        text=text,
+        reply_markup=keyboard,
+        parse_mode=ParseMode.MARKDOWN,
+    )
+
+
+@fast_route(client_router, get_booking_codec().filter(BookingActions.TIME))
+async def handle_booking_time(callback: CallbackQuery, navigation: BookingNavigation) -> TelegramMethod:
+    """
+    Activates when client has picked appointment time.
+    """
+    telegram_id = str(callback.message.chat.id)
+    logger = get_logger()
+    log_handler_info(handler_name="client.handle_booking_time", logger=logger, callback_data=callback.data)
+    keyboard = None
+    master_telegram_id = str(navigation.master)
+    month_text = f"{Config.MONTHS_MAP.get(navigation.month)[0]} {navigation.year}"
+    user = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
+    number_of_appointments = await count_appointments_for_client(
+        client_telegram_id=telegram_id,
+        master_telegram_id=master_telegram_id,
+        day=navigation.day,
+        month=navigation.month,
+        year=navigation.year,
+        logger=logger,
+    )
+    if number_of_appointments >= Config.MAX_APPOINTMENTS_PER_DAY:
+        text = (
+            f"Вы не можете создать больше записей у этого мастера в этот день.\n\n*"
+            f"{month_text}*\nПожалуйста, выберите другой день:"
+        )
+        keyboard = await _handle_pick_day(
+            logger=logger,
+            current_month=navigation.month,
+            current_year=navigation.year,
+            telegram_id=master_telegram_id,
+        )
+    elif not user.phone_number and not user.telegram_profile:
+        # picked day is stored only here: the time picker is shown again after contact is specified
+        where_clause = WhereClause(
+            params=[user_table.c.telegram_id],
+            values=[telegram_id],
+            comparison_operators=["=="]
+        )
+        data_to_set = {
+            "current_master": master_telegram_id,
+            "current_day": navigation.day,
+            "current_month": navigation.month,
+            "current_year": navigation.year,
+        }
+        await User(engine=engine, logger=logger).update_user_info(where_clause=where_clause, data_to_set=data_to_set)
+        text = (
+            "Чтобы мастер мог с Вами связаться вам необходимо указать номер телефона или название вашего профиля в "
+            "телеграм."
+        )
+        keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton(text="Указать телефон", callback_data=ClientConstants.SPECIFY_PHONE)],
+                [InlineKeyboardButton(text="Указать телеграм", callback_data=CommonConstants.EDIT_TELEGRAM_PROFILE)],
+            ]
+        )
+    else:
+        tz = timezone(timedelta(hours=Config.TZ_OFFSET))
+        hour, minute = divmod(navigation.minutes, 60)
+        date_and_time = datetime(
+            year=navigation.year,
+            month=navigation.month,
+            day=navigation.day,
+            hour=hour,
+            minute=minute,
+            tzinfo=tz
+        )
+        # master and time come from callback data (a stale or forged button, a tap on another worker), so the slot is
+        # booked only if it is still free: otherwise nothing is updated and the client picks another day
+        appointment_where_clause = WhereClause(
+            filter=[
+                appointment_table.c.master_telegram_id == master_telegram_id,
+                appointment_table.c.datetime == date_and_time,
+                appointment_table.c.is_reserved.is_not(True),
+            ],
+        )
+        master = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=master_telegram_id)
+        client_info = _prepare_user_info(user=user, for_master=True)
+        notification_text = appointment_info(
+            date_and_time=date_and_time,
+            user_info=client_info,
+            service=user.current_service,
+            user=user,
+            for_master=True,
+        )
+        notification = OutboxMessageModel(
+            chat_id=master.telegram_id, text="У Вас новая запись!\n" + notification_text
+        )
+        data_to_set = {"is_reserved": True, "client_telegram_id": telegram_id, "service": user.current_service}
+        # master is notified by outbox dispatcher, only if the slot was actually booked
+        updated = await Appointment(engine=engine, logger=logger).update_appointment_info(
+            data_to_set=data_to_set,
+            where_clause=appointment_where_clause,
+            transaction_hooks=[Outbox.enqueue_hook(lambda rows: [notification])],
+        )
+        if not updated:
+            text = (
+                f"*{month_text}*\nИзвините, произошла ошибка при попытке создать запись на выбранное время.\n\n*"
+                f"{month_text}*\nПожалуйста, выберите другой день:"
+            )
+            keyboard = await _handle_pick_day(
+                logger=logger,
+                current_month=navigation.month,
+                current_year=navigation.year,
+                telegram_id=master_telegram_id,
+            )
+        else:
+            master_info = _prepare_user_info(user=master)
+            text = appointment_info(date_and_time=date_and_time, user=user, user_info=master_info)
+            text = "Вы успешно записались! " + text
+    return edit_or_answer(
+        callback=callback,
+        text=text,
+        reply_markup=keyboard,
+        parse_mode=ParseMode.MARKDOWN,
+    )
 
 
-@client_router.callback_query(Client.default, F.data.casefold() == ClientConstants.BECOME_MASTER)
+@fast_route(client_router, ClientConstants.BECOME_MASTER, state=Client.default)
 async def handle_become_master(callback: CallbackQuery, state: FSMContext):
     telegram_id = callback.message.chat.id
     logger = get_logger()
@@ -280,35 +439,33 @@ async def handle_become_master(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer(text=text)
 
 
-@client_router.callback_query(Client.default, F.data.casefold() == ClientConstants.MY_APPOINTMENTS)
-async def handle_my_appointments_start(callback: CallbackQuery, state: FSMContext):
+@fast_route(client_router, ClientConstants.MY_APPOINTMENTS, state=Client.default)
+async def handle_my_appointments_start(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     logger = get_logger()
     log_handler_info(handler_name="client.handle_my_appointments_start", logger=logger, callback_data=callback.data)
     await state.set_state(Client.appointment_info)
-    await _handle_my_appointments_start(callback=callback, logger=logger)
+    return await _handle_my_appointments_start(callback=callback, logger=logger)
 
 
-@client_router.callback_query(
-    Client.appointment_info, (F.data == ClientConstants.CANCEL) | (F.data == ClientConstants.APPOINTMENTS_BACK)
-)
-async def handle_my_appointments_cancel(callback: CallbackQuery, state: FSMContext):
+@fast_route(client_router, ClientConstants.CANCEL, ClientConstants.APPOINTMENTS_BACK, state=Client.appointment_info)
+async def handle_my_appointments_cancel(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     telegram_id = str(callback.message.chat.id)
     logger = get_logger()
     log_handler_info(handler_name="client.handle_my_appointments_cancel", logger=logger, callback_data=callback.data)
     user = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
     if callback.data == ClientConstants.APPOINTMENTS_BACK:  # кнопка назад
-        await _handle_my_appointments_start(callback=callback, logger=logger, month=user.current_month)
+        return await _handle_my_appointments_start(callback=callback, logger=logger, month=user.current_month)
     else:  # отмена записи
         await cancel_appointment_and_notify_user(user=user, logger=logger, for_master=True, engine=engine)
-        now = datetime.now()
+        now = create_timestamp_with_timezone()
         text = f"Запись успешно отменена.\n{month_appointments_text % (Config.MONTHS_MAP.get(now.month)[0], now.year)}"
-        await _handle_my_appointments_start(
+        return await _handle_my_appointments_start(
             callback=callback, logger=logger, month=user.current_month, text=text, now=now
         )
 
 
 @client_router.callback_query(Client.appointment_info)
-async def handle_my_appointments(callback: CallbackQuery, state: FSMContext):
+async def handle_my_appointments(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     logger = get_logger()
     log_handler_info(handler_name="client.handle_my_appointments", logger=logger, callback_data=callback.data)
     if callback.data == ClientConstants.ANOTHER_MONTH:
@@ -370,43 +527,38 @@ async def handle_my_appointments(callback: CallbackQuery, state: FSMContext):
             where_clause=user_where_clause,
         )
     else:  # user picked month
-        await _handle_my_appointments_start(callback=callback, logger=logger, month=int(callback.data))
-        return
-    await bot.edit_message_text(
+        return await _handle_my_appointments_start(callback=callback, logger=logger, month=int(callback.data))
+    return edit_or_answer(
+        callback=callback,
         text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
         reply_markup=keyboard,
         parse_mode=ParseMode.MARKDOWN,
     )
 
 
-@client_router.callback_query(Client.default, F.data.casefold() == ClientConstants.PICK_SERVICE)
-async def handle_pick_service(callback: CallbackQuery, state: FSMContext) -> None:
+@fast_route(client_router, ClientConstants.PICK_SERVICE, state=Client.default)
+async def handle_pick_service(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     """
     Activates when client has already picked 'Выбрать услугу' option.
     """
     logger = get_logger()
     log_handler_info(handler_name="client.handle_pick_service", logger=logger, callback_data=callback.data)
     await state.set_state(Client.service)
-    await _handle_pick_service(callback, state=state)
+    return await _handle_pick_service(callback, state=state)
 
 
 @client_router.callback_query(Client.service)
-async def handle_service(callback: CallbackQuery, state: FSMContext) -> None:
+async def handle_service(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     """
     Activates when client has already picked service.
     """
     logger = get_logger()
     log_handler_info(handler_name="client.handle_service", logger=logger, callback_data=callback.data)
-    await _handle_service(callback=callback, next_state=Client.master_or_filter)
+    return await _handle_service(callback=callback, next_state=Client.master_or_filter)
 
 
-@client_router.callback_query(
-    Client.master_or_filter,
-    (F.data == ClientConstants.MASTER_BACK) | (F.data == ClientConstants.MASTER_FORWARD),
-)
-async def handle_master_pagination(callback: CallbackQuery, state: FSMContext) -> None:
+@fast_route(client_router, ClientConstants.MASTER_BACK, ClientConstants.MASTER_FORWARD, state=Client.master_or_filter)
+async def handle_master_pagination(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     """Activates when client use pagination to see another masters."""
     telegram_id = str(callback.message.chat.id)
     logger = get_logger()
@@ -422,11 +574,11 @@ async def handle_master_pagination(callback: CallbackQuery, state: FSMContext) -
     where_clause = WhereClause(params=[user_table.c.telegram_id], values=[telegram_id], comparison_operators=["=="])
     data_to_set = {"current_page": page_number}
     await User(engine=engine, logger=logger).update_user_info(where_clause=where_clause, data_to_set=data_to_set)
-    await _handle_service(callback=callback, picked_service=current_service, page_number=page_number)
+    return await _handle_service(callback=callback, picked_service=current_service, page_number=page_number)
 
 
 @client_router.callback_query(Client.master_or_filter)
-async def handle_master_or_filter(callback: CallbackQuery, state: FSMContext) -> None:
+async def handle_master_or_filter(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     """
     Activates when client has already picked master or filter.
     """
@@ -441,19 +593,18 @@ async def handle_master_or_filter(callback: CallbackQuery, state: FSMContext) ->
         sub_services = Config.MASTER_SERVICES[current_service]
         keyboard = pick_sub_service_keyboard(sub_services, all_picked_services, current_service)
         text = pick_sub_service_text % current_service
-        await bot.edit_message_text(
+        return edit_or_answer(
+            callback=callback,
             text=text,
-            chat_id=callback.message.chat.id,
-            message_id=callback.message.message_id,
             reply_markup=keyboard,
         )
     else:
         await state.set_state(Client.master)
-        await _handle_master(callback=callback)
+        return await _handle_master(callback=callback)
 
 
-@client_router.callback_query(Client.sub_service, F.data == RegistrationConstants.DONE_SUB_SERVICE)
-async def handle_sub_service_done(callback: CallbackQuery, state: FSMContext) -> None:
+@fast_route(client_router, RegistrationConstants.DONE_SUB_SERVICE, state=Client.sub_service)
+async def handle_sub_service_done(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     """
     Activates when client done with picking sub services.
     """
@@ -463,7 +614,7 @@ async def handle_sub_service_done(callback: CallbackQuery, state: FSMContext) ->
     picked_service, picked_sub_services = await get_picked_services_and_sub_services(
         engine=engine, logger=logger, telegram_id=telegram_id
     )
-    await _handle_service(
+    return await _handle_service(
         callback=callback,
         picked_service=picked_service,
         picked_sub_services=picked_sub_services,
@@ -481,8 +632,8 @@ async def handle_sub_service(callback: CallbackQuery, state: FSMContext) -> None
     await _handle_sub_service(callback=callback, client_picks=True)
 
 
-@client_router.callback_query(Client.master, F.data == ClientConstants.CANCEL)
-async def handle_master_cancel(callback: CallbackQuery, state: FSMContext) -> None:
+@fast_route(client_router, ClientConstants.CANCEL, state=Client.master)
+async def handle_master_cancel(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     """
     Activates when client is going back from checking master info.
     """
@@ -492,7 +643,7 @@ async def handle_master_cancel(callback: CallbackQuery, state: FSMContext) -> No
     user = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
     current_service = user.current_service
     current_page = user.current_page
-    await _handle_service(
+    return await _handle_service(
         callback=callback,
         picked_service=current_service,
         page_number=current_page,
@@ -501,7 +652,7 @@ async def handle_master_cancel(callback: CallbackQuery, state: FSMContext) -> No
 
 
 @client_router.callback_query(Client.master)
-async def handle_make_appointment_start(callback: CallbackQuery, state: FSMContext) -> None:
+async def handle_make_appointment_start(callback: CallbackQuery, state: FSMContext) -> TelegramMethod:
     """
     Activates when client is going to make an appointment.
     """
@@ -509,29 +660,9 @@ async def handle_make_appointment_start(callback: CallbackQuery, state: FSMConte
     logger = get_logger()
     log_handler_info(handler_name="client.handle_make_appointment_start", logger=logger, callback_data=callback.data)
     master_telegram_id = callback.data
-    now = datetime.now()
-    month_begin, month_end = get_month_edges(now=now)
-    where_clause = WhereClause(
-        params=[user_table.c.telegram_id],
-        values=[telegram_id],
-        comparison_operators=["=="]
-    )
-    data_to_set = {
-        "current_master": master_telegram_id,
-        "current_month": now.month,
-        "current_year": now.year,
-        "current_day": None,
-    }
-    await User(engine=engine, logger=logger).update_user_info(where_clause=where_clause, data_to_set=data_to_set)
-    appointment_where_clause = WhereClause(
-        params=[
-            appointment_table.c.master_telegram_id,
-            appointment_table.c.datetime,
-            appointment_table.c.datetime,
-            appointment_table.c.is_reserved,
-        ],
-        values=[master_telegram_id, month_begin, month_end, False],
-        comparison_operators=["==", ">=", "<=", "=="],
+    now = create_timestamp_with_timezone()
+    appointment_where_clause = master_month_where_clause(
+        master_telegram_id=master_telegram_id, month=now.month, year=now.year, is_reserved=False
     )
     appointments = await Appointment(engine=engine, logger=logger).read_appointment_info(
         where_clause=appointment_where_clause
@@ -544,116 +675,47 @@ async def handle_make_appointment_start(callback: CallbackQuery, state: FSMConte
         picked_service, picked_sub_services = await get_picked_services_and_sub_services(
             engine=engine, logger=logger, telegram_id=telegram_id
         )
-        await _handle_service(
+        return await _handle_service(
             callback=callback,
             picked_service=picked_service,
             picked_sub_services=picked_sub_services,
             text=text,
             next_state=Client.master_or_filter
         )
-        return
     else:
         text = f"*{Config.MONTHS_MAP.get(now.month)[0]} {now.year}*\nПожалуйста, выберите день:"
-        keyboard = pick_day_keyboard(picked_month=now.month, picked_year=now.year, master_time_slots=appointments)
+        keyboard = pick_day_keyboard(
+            picked_month=now.month,
+            picked_year=now.year,
+            master_time_slots=appointments,
+            master_telegram_id=master_telegram_id,
+        )
         await state.set_state(Client.master_calendar_day)
-        await bot.edit_message_text(
+        return edit_or_answer(
+            callback=callback,
             text=text,
-            chat_id=callback.message.chat.id,
-            message_id=callback.message.message_id,
             reply_markup=keyboard,
             parse_mode=ParseMode.MARKDOWN,
         )
 
 
-@client_router.callback_query(Client.master_calendar_day)
-async def handle_make_appointment_pick_time(callback: CallbackQuery, state: FSMContext) -> None:
-    """
-    Activates when client is going to make an appointment.
-    """
-    telegram_id = str(callback.message.chat.id)
-    logger = get_logger()
-    log_handler_info(
-        handler_name="client.handle_make_appointment_pick_time", logger=logger, callback_data=callback.data
-    )
-    data_to_set = {}
-    now = datetime.now()
-    user = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
-    current_month = user.current_month or now.month
-    current_year = user.current_year or now.year
-    where_clause = WhereClause(
-        params=[user_table.c.telegram_id],
-        values=[telegram_id],
-        comparison_operators=["=="]
-    )
-    if callback.data == MasterConstants.CALENDAR_IGNORE:
-        await callback.answer("Этот день невозможно выбрать. Пожалуйста, выберите другой день")
-        return
-    elif callback.data == MasterConstants.CALENDAR_FORWARD or callback.data == MasterConstants.CALENDAR_BACK:
-        current_month, current_year, keyboard = await _handle_pick_day(
-            callback=callback,
-            logger=logger,
-            current_month=current_month,
-            current_year=current_year,
-            telegram_id=user.current_master,
-            arrows=True,
-        )
-        data_to_set.update({"current_month": int(current_month), "current_year": int(current_year)})
-        text = f"*{Config.MONTHS_MAP.get(current_month)[0]} {current_year}*\nПожалуйста, выберите день:"
-    else:
-        text, keyboard, data_to_set = await _handle_pick_time(
-            callback=callback,
-            current_month=current_month,
-            current_year=current_year,
-            user=user,
-            data_to_set=data_to_set,
-            logger=logger,
-            state=state,
-        )
-    if data_to_set:
-        await User(engine=engine, logger=logger).update_user_info(where_clause=where_clause, data_to_set=data_to_set)
-    await bot.edit_message_text(
-        text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
-        reply_markup=keyboard,
-        parse_mode=ParseMode.MARKDOWN,
-    )
-
-
-@client_router.callback_query(Client.master_calendar_time, F.data == ClientConstants.CANCEL)
-async def handle_make_appointment_time_cancel(callback: CallbackQuery, state: FSMContext) -> None:
+@fast_route(
+    client_router, MasterConstants.CALENDAR_IGNORE, state=(Client.master_calendar_day, Client.master_calendar_time)
+)
+async def handle_make_appointment_ignore(callback: CallbackQuery) -> TelegramMethod:
     """
-    Activates when client is going back from choosing day.
+    Activates when client presses a day that can not be picked.
     """
-    telegram_id = str(callback.message.chat.id)
     logger = get_logger()
-    log_handler_info(
-        handler_name="client.handle_make_appointment_time_cancel", logger=logger, callback_data=callback.data
-    )
-    user = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
-    text = (
-        f"*{Config.MONTHS_MAP.get(user.current_month)[0]} {user.current_year}*\nПожалуйста, выберите день:"
-    )
-    _, _, keyboard = await _handle_pick_day(
-        callback=callback,
-        logger=logger,
-        current_month=user.current_month,
-        current_year=user.current_year,
-        telegram_id=user.current_master,
-        next_state=Client.master_calendar_day,
-    )
-    await bot.edit_message_text(
-        text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
-        reply_markup=keyboard,
-        parse_mode=ParseMode.MARKDOWN,
-    )
+    log_handler_info(handler_name="client.handle_make_appointment_ignore", logger=logger, callback_data=callback.data)
+    return callback.answer("Этот день невозможно выбрать. Пожалуйста, выберите другой день")
 
 
-@client_router.callback_query(
-    Client.master_calendar_time,
-    (F.data == ClientConstants.SPECIFY_PHONE) | (F.data == CommonConstants.EDIT_TELEGRAM_PROFILE)
+@fast_route(
+    client_router,
+    ClientConstants.SPECIFY_PHONE,
+    CommonConstants.EDIT_TELEGRAM_PROFILE,
+    state=(Client.master_calendar_day, Client.master_calendar_time),
 )
 async def handle_make_appointment_specify_contact(callback: CallbackQuery, state: FSMContext) -> None:
     """
@@ -680,22 +742,16 @@ async def handle_specify_phone_number(message: Message, state: FSMContext) -> No
     log_handler_info(handler_name="client.handle_specify_phone_number", logger=logger, message_text=message.text)
     telegram_id = str(message.chat.id)
     user = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
-    current_month, current_year, keyboard = await _handle_pick_day(
-        logger=logger,
-        current_month=user.current_month,
-        current_year=user.current_year,
-        telegram_id=user.current_master,
-    )
     text = (
         f"Ваш номер телефона успешно сохранён!\n"
-        f"{pick_time_text % (user.current_day, Config.MONTHS_MAP.get(current_month)[1], current_year)}"
+        f"{pick_time_text % (user.current_day, Config.MONTHS_MAP.get(user.current_month)[1], user.current_year)}"
     )
-    _, keyboard, _ = await _handle_pick_time(
+    text, keyboard = await _handle_pick_time(
+        logger=logger,
+        master_telegram_id=user.current_master,
+        current_day=user.current_day,
         current_month=user.current_month,
         current_year=user.current_year,
-        current_day=user.current_day,
-        user=user,
-        logger=logger,
         text=text,
     )
     await _handle_phone_number(
@@ -717,22 +773,16 @@ async def handle_specify_telegram_profile(message: Message, state: FSMContext) -
     log_handler_info(handler_name="client.handle_specify_telegram_profile", logger=logger, message_text=message.text)
     telegram_id = str(message.chat.id)
     user = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
-    current_month, current_year, _ = await _handle_pick_day(
-        logger=logger,
-        current_month=user.current_month,
-        current_year=user.current_year,
-        telegram_id=user.current_master,
-    )
     text = (
-        f"Название Вашего телеграм профиля успешно сохранёно! *{user.current_day} "
-        f"{pick_time_text % (user.current_day, Config.MONTHS_MAP.get(current_month)[1], current_year)}"
+        f"Название Вашего телеграм профиля успешно сохранёно!\n"
+        f"{pick_time_text % (user.current_day, Config.MONTHS_MAP.get(user.current_month)[1], user.current_year)}"
     )
-    _, keyboard, _ = await _handle_pick_time(
+    text, keyboard = await _handle_pick_time(
+        logger=logger,
+        master_telegram_id=user.current_master,
+        current_day=user.current_day,
         current_month=user.current_month,
         current_year=user.current_year,
-        current_day=user.current_day,
-        user=user,
-        logger=logger,
         text=text,
     )
     await _handle_telegram_profile(
@@ -743,98 +793,3 @@ async def handle_specify_telegram_profile(message: Message, state: FSMContext) -
         logger=logger,
         telegram_id=telegram_id,
     )
-
-
-@client_router.callback_query(Client.master_calendar_time)
-async def handle_make_appointment_time(callback: CallbackQuery, state: FSMContext) -> None:
-    """
-    Activates when client has already specified appointment time.
-    """
-    telegram_id = str(callback.message.chat.id)
-    logger = get_logger()
-    log_handler_info(handler_name="client.handle_make_appointment_time", logger=logger, callback_data=callback.data)
-    keyboard = None
-    user = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
-    number_of_appointments = await count_appointments_for_client(
-        client_telegram_id=telegram_id, master_telegram_id=user.current_master, day=user.current_day, logger=logger
-    )
-    if number_of_appointments >= Config.MAX_APPOINTMENTS_PER_DAY:
-        text = (
-            f"Вы не можете создать больше записей у этого мастера в этот день.\n\n*"
-            f"{Config.MONTHS_MAP.get(user.current_month)[0]} {user.current_year}*\nПожалуйста, выберите другой день:"
-        )
-        _, _, keyboard = await _handle_pick_day(
-            callback=callback,
-            logger=logger,
-            current_month=user.current_month,
-            current_year=user.current_year,
-            telegram_id=user.current_master,
-            next_state=Client.master_calendar_day,
-        )
-    elif not user.phone_number and not user.telegram_profile:
-        text = (
-            "Чтобы мастер мог с Вами связаться вам необходимо указать номер телефона или название вашего профиля в "
-            "телеграм."
-        )
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [InlineKeyboardButton(text="Указать телефон", callback_data=ClientConstants.SPECIFY_PHONE)],
-                [InlineKeyboardButton(text="Указать телеграм", callback_data=CommonConstants.EDIT_TELEGRAM_PROFILE)],
-            ]
-        )
-    else:
-        tz = timezone(timedelta(hours=Config.TZ_OFFSET))
-        hour_and_minutes = callback.data.split(":")
-        date_and_time = datetime(
-            year=user.current_year,
-            month=user.current_month,
-            day=user.current_day,
-            hour=int(hour_and_minutes[0]),
-            minute=int(hour_and_minutes[1]),
-            tzinfo=tz
-        )
-        appointment_where_clause = WhereClause(
-            params=[appointment_table.c.master_telegram_id, appointment_table.c.datetime],
-            values=[user.current_master, date_and_time],
-            comparison_operators=["==", "=="],
-        )
-        data_to_set = {"is_reserved": True, "client_telegram_id": telegram_id, "service": user.current_service}
-        updated = await Appointment(engine=engine, logger=logger).update_appointment_info(
-            data_to_set=data_to_set, where_clause=appointment_where_clause
-        )
-        if not updated:
-            text = (
-                f"*{Config.MONTHS_MAP.get(user.current_month)[0]} {user.current_year}*\nИзвините, произошла ошибка при "
-                f"попытке создать запись на выбранное время.\n\n*{Config.MONTHS_MAP.get(user.current_month)[0]} "
-                f"{user.current_year}*\nПожалуйста, выберите другой день:"
-            )
-            _, _, keyboard = await _handle_pick_day(
-                callback=callback,
-                logger=logger,
-                current_month=user.current_month,
-                current_year=user.current_year,
-                telegram_id=user.current_master,
-                next_state=Client.master_calendar_day,
-            )
-        else:
-            master = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=user.current_master)
-            master_info = _prepare_user_info(user=master)
-            text = appointment_info(date_and_time=date_and_time, user=user, user_info=master_info)
-            text = "Вы успешно записались! " + text
-            client_info = _prepare_user_info(user=user, for_master=True)
-            notification_text = appointment_info(
-                date_and_time=date_and_time,
-                user_info=client_info,
-                service=user.current_service,
-                user=user,
-                for_master=True,
-            )
-            notification_text = "У Вас новая запись!\n" + notification_text
-            await notify_user(text=notification_text, telegram_id=master.telegram_id, logger=logger)
-    await bot.edit_message_text(
-        text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
-        reply_markup=keyboard,
-        parse_mode=ParseMode.MARKDOWN,
-    )
@@ -3,14 +3,16 @@ from aiogram import Router
 from aiogram import F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
+from aiogram.methods import SendMessage
 from aiogram.types import Message, KeyboardButton, ReplyKeyboardMarkup
 
-from npb.config import Config, CommonConstants
+from npb.config import CommonConstants
 from npb.db.api import User
 from npb.db.core import engine
 from npb.logger import get_logger
 from npb.state_machine.admin_states import Admin
 from npb.text.registration_form import bp
+from npb.tg.reachability import get_reachability_manager
 from npb.tg.models import UserModel
 from npb.state_machine.client_states import Client
 from npb.state_machine.master_states import Master
@@ -18,7 +20,7 @@ from npb.state_machine.registration_form_states import RegistrationForm
 from npb.utils.common import log_handler_info
 from npb.utils.tg.entry_point import client_profile_options_keyboard, master_profile_options_keyboard, get_max_seq_id, \
     admin_profile_options_keyboard
-from npb.utils.tg.client import pick_single_service_keyboard
+from npb.utils.tg.client import all_services_keyboard
 from npb.db.utils import WhereClause
 from npb.db.sa_models import user_table
 
@@ -37,7 +39,7 @@ entry_point_router = Router()
 
 
 @entry_point_router.message(Command(commands=["start", "commands"]))
-async def command_start_handler(message: Message, state: FSMContext) -> None:
+async def command_start_handler(message: Message, state: FSMContext) -> SendMessage:
     """
     Activates when /start or /commands.
     """
@@ -46,6 +48,8 @@ async def command_start_handler(message: Message, state: FSMContext) -> None:
     telegram_profile = str(message.chat.username) if message.chat.username else None
     phone_number = str(message.contact.phone_number) if message.contact else None
     keyboard = None
+    # user is talking to the bot, so notifications can be delivered again
+    await get_reachability_manager().mark_reachable(chat_id=telegram_id)
 
     if user := await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id):
         await User(engine=engine, logger=logger).drop_temporary_data(telegram_id=telegram_id)
@@ -74,7 +78,7 @@ async def command_start_handler(message: Message, state: FSMContext) -> None:
                 keyboard = client_profile_options_keyboard()
         if message.text == "/start":
             text += "Воспользуйтесь командой /commands, чтобы узнать доступные Вам возможности."
-        await message.answer(text=text, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN)
+        return message.answer(text=text, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN)
     else:
         max_seq_id = await get_max_seq_id(logger=logger)
         max_seq_id = max_seq_id + 1 if max_seq_id else 1
@@ -91,7 +95,7 @@ async def command_start_handler(message: Message, state: FSMContext) -> None:
             keyboard=[[KeyboardButton(text="Мастер"), KeyboardButton(text="Клиент")]],
             one_time_keyboard=True,
         )
-        await message.answer(f"Добрый день! Вы Мастер или Клиент?", reply_markup=keyboard)
+        return message.answer(f"Добрый день! Вы Мастер или Клиент?", reply_markup=keyboard)
 
 
 @entry_point_router.message(F.text.casefold() == "мастер")
@@ -109,8 +113,7 @@ async def client_handler(message: Message, state: FSMContext) -> None:
     """
     Activates when user already picked 'Клиент'.
     """
-    services = list(Config.MASTER_SERVICES.keys())
-    keyboard = pick_single_service_keyboard(services)
+    keyboard = all_services_keyboard()
     await state.set_state(Client.service)
     await message.answer(
         f"Пожалуйста, выберите услугу:",
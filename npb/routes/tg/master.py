@@ -1,12 +1,11 @@
-from copy import deepcopy
 from datetime import datetime, timedelta, timezone
 from logging import Logger
 from pprint import pprint
 import time
 import traceback
+from typing import List
 from uuid import UUID
 
-from aiogram import F
 from aiogram import Router
 from aiogram.enums import ParseMode
 from aiogram.filters import Command
@@ -24,7 +23,7 @@ from sqlalchemy.exc import IntegrityError
 
 from npb.config import MasterConstants
 from npb.config import Config
-from npb.db.api import Appointment, User
+from npb.db.api import Appointment, Outbox, User
 from npb.db.sa_models import appointment_table, user_table
 from npb.db.utils import WhereClause, Join
 from npb.db.core import engine
@@ -33,19 +32,21 @@ from npb.text.master import pick_one_or_more_days_text, pick_day_to_check_timeta
 from npb.utils.common import (
     delete_appointment_keyboard,
     edit_profile_keyboard,
-    get_month_edges,
     get_user_data,
     handle_start_edit_name,
     log_handler_info,
+    master_month_where_clause,
     master_profile_info,
-    pick_appointment_keyboard, _prepare_user_info, appointment_info, notify_user, cancel_appointment_and_notify_user,
+    pick_appointment_keyboard, _prepare_user_info, appointment_info, cancel_appointment_and_notify_user,
 )
 from npb.utils.tg.master import filled_registration_form, edit_month_calendar, handle_start_registration, \
     update_appointment_with_collision_check, appointments_per_period
 from npb.state_machine.master_states import Master
 from npb.state_machine.registration_form_states import RegistrationForm
-from npb.tg.bot import bot
-from npb.tg.models import AppointmentList, AppointmentModel
+from npb.tg.fast_routes import fast_route
+from npb.tg.models import AppointmentList, AppointmentModel, OutboxMessageModel
+from npb.tg.view_cache import edit_or_answer
+from npb.utils.calendar_mask import mask_days
 from npb.utils.common import get_month
 from npb.utils.common import is_uuid
 from npb.exceptions import NoTelegramUpdateObject
@@ -72,18 +73,14 @@ async def _handle_my_timetable(
         now = datetime.now()  # TODO: specify timezone
     else:
         now = datetime(year=year, month=month, day=1)
-    month_begin, month_end = get_month_edges(now=now)
-    appointment_where_clause = WhereClause(
-        params=[appointment_table.c.master_telegram_id, appointment_table.c.datetime, appointment_table.c.datetime],
-        values=[telegram_id, month_begin, month_end],
-        comparison_operators=["==", ">=", "<="],
+    appointment_where_clause = master_month_where_clause(
+        master_telegram_id=telegram_id, month=now.month, year=now.year
     )
     appointments = await Appointment(engine=engine, logger=logger).read_appointment_info(
         where_clause=appointment_where_clause
     )
     appointments = Appointment.appointments_as_dict(appointments=appointments)
     calendar, _ = await edit_month_calendar(
-        current_calendar={},
         picked_month=now.month,
         picked_year=now.year,
         appointments=appointments,
@@ -97,7 +94,7 @@ async def _handle_my_timetable(
     data_to_set = {
         "current_month": now.month,
         "current_year": now.year,
-        "current_calendar": {},
+        "current_calendar_mask": 0,
         "state": next_state.state,
         "edit_mode": edit_mode,
     }
@@ -114,10 +111,9 @@ async def _handle_my_timetable(
             parse_mode=ParseMode.MARKDOWN,
         )
     else:
-        await bot.edit_message_text(
+        await edit_or_answer(
+            callback=callback,
             text=text,
-            chat_id=callback.message.chat.id,
-            message_id=callback.message.message_id,
             reply_markup=calendar,
             parse_mode=ParseMode.MARKDOWN,
         )
@@ -154,10 +150,9 @@ async def _handle_day_check(callback: CallbackQuery = None, message: Message = N
     if message:
         await message.answer(text=text, reply_markup=keyboard)
     else:
-        await bot.edit_message_text(
+        await edit_or_answer(
+            callback=callback,
             text=text,
-            chat_id=callback.message.chat.id,
-            message_id=callback.message.message_id,
             reply_markup=keyboard,
         )
 
@@ -235,10 +230,9 @@ async def _handle_time_slot_check(callback: CallbackQuery, state: FSMContext) ->
                 data_to_set=data_to_set,
                 where_clause=user_where_clause,
             )
-            await bot.edit_message_text(
+            await edit_or_answer(
+                callback=callback,
                 text=text,
-                chat_id=callback.message.chat.id,
-                message_id=callback.message.message_id,
                 reply_markup=keyboard,
                 parse_mode=ParseMode.MARKDOWN,
             )
@@ -267,10 +261,9 @@ async def _handle_time_slot_delete(callback: CallbackQuery, state: FSMContext) -
         text = "Пожалуйста, выберите время для удаления."
     else:
         text = "Кажется у Вас нет ни одного слота, который можно было бы удалить."
-    await bot.edit_message_text(
+    await edit_or_answer(
+        callback=callback,
         text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
         reply_markup=keyboard,
         parse_mode=ParseMode.MARKDOWN,
     )
@@ -284,10 +277,9 @@ async def _handle_day_edit(callback: CallbackQuery, state: FSMContext) -> None:
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[[InlineKeyboardButton(text="Назад", callback_data=MasterConstants.BACK_TO_TIMETABLE)]]
     )
-    await bot.edit_message_text(
+    await edit_or_answer(
+        callback=callback,
         text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
         parse_mode=ParseMode.MARKDOWN,
         reply_markup=keyboard,
     )
@@ -321,18 +313,34 @@ async def _handle_time_add_or_edit(message: Message, edit_mode: bool = False, st
             tzinfo=tz,
         )
         appointment_data = AppointmentModel(datetime=date_and_time, master_telegram_id=telegram_id)  # TODO: do i need to check if this is a master?
+
+        def make_notifications(old_appointment: Row, new_appointment: List[Row]) -> List[OutboxMessageModel]:
+            if not new_appointment[0].client_telegram_id:
+                return []
+            master_info = _prepare_user_info(user=user)
+            notification_text = appointment_info(
+                date_and_time=date_and_time,
+                user_info=master_info,
+                service=new_appointment[0].service,
+                for_master=False,
+            )
+            notification_text = (
+                f"Время вашей записи {old_appointment.datetime.strftime('%d.%m.%Y %H:%M')} было изменено на "
+                f"{new_appointment[0].datetime.strftime('%d.%m.%Y %H:%M')}\n" +
+                notification_text + "\nОтменить запись можно в разделе 'Мои записи'."
+            )
+            return [OutboxMessageModel(chat_id=new_appointment[0].client_telegram_id, text=notification_text)]
+
         try:
             if edit_mode:
+                # client is notified by outbox dispatcher once the new time is committed
                 old_appointment, new_appointment = await update_appointment_with_collision_check(
-                    date_and_time=date_and_time, logger=logger, user=user
+                    date_and_time=date_and_time, logger=logger, user=user, make_notifications=make_notifications
                 )
-                old_appointment_datetime = old_appointment.datetime.strftime("%d.%m.%Y %H:%M")  # noqa
             else:
                 new_appointment = await Appointment(engine=engine, logger=logger).create_appointment(
                     appointment=appointment_data
                 )
-                old_appointment_datetime = None
-            new_appointment_datetime = new_appointment[0].datetime.strftime("%d.%m.%Y %H:%M")
         except IntegrityError as exc:
             logger.error(f"Error during appointment creation: {str(exc)}")
             text = (
@@ -345,28 +353,13 @@ async def _handle_time_add_or_edit(message: Message, edit_mode: bool = False, st
                 await state.set_state(Master.edit_day)
             if edit_mode:
                 text = "Время успешно изменено!"
-                master = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
-                master_info = _prepare_user_info(user=master)
-                notification_text = appointment_info(
-                    date_and_time=date_and_time,
-                    user_info=master_info,
-                    service=new_appointment[0].service,
-                    for_master=False,
-                )
-                notification_text = (
-                    f"Время вашей записи {old_appointment_datetime} было изменено на {new_appointment_datetime}\n" +
-                    notification_text + "\nОтменить запись можно в разделе 'Мои записи'."
-                )
-                await notify_user(
-                    text=notification_text, telegram_id=new_appointment[0].client_telegram_id, logger=logger
-                )
             else:
                 text = "Время успешно добавлено в расписание!"
         await message.answer(text=text, parse_mode=ParseMode.MARKDOWN)
         await _handle_day_check(message=message)
 
 
-@master_router.callback_query(Master.default, F.data == MasterConstants.MY_PROFILE)
+@fast_route(master_router, MasterConstants.MY_PROFILE, state=Master.default)
 async def handle_my_profile(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master has already picked 'Мой профиль'.
@@ -382,7 +375,7 @@ async def handle_my_profile(callback: CallbackQuery, state: FSMContext) -> None:
         await callback.message.answer(text=text, parse_mode=ParseMode.MARKDOWN)
 
 
-@master_router.callback_query(Master.default, F.data == MasterConstants.EDIT_PROFILE)
+@fast_route(master_router, MasterConstants.EDIT_PROFILE, state=Master.default)
 async def handle_edit_profile(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master has already picked 'Редактировать профиль'.
@@ -400,7 +393,7 @@ async def handle_edit_profile(callback: CallbackQuery, state: FSMContext) -> Non
         await callback.message.answer(text=text, reply_markup=keyboard)
 
 
-@master_router.callback_query(Master.default, F.data == MasterConstants.MY_TIMETABLE)
+@fast_route(master_router, MasterConstants.MY_TIMETABLE, state=Master.default)
 async def handle_my_timetable(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master is going to check his timetable.
@@ -410,7 +403,7 @@ async def handle_my_timetable(callback: CallbackQuery, state: FSMContext) -> Non
     await _handle_my_timetable(callback=callback, next_state=Master.edit_timetable, edit_mode=None)
 
 
-@master_router.callback_query(Master.edit_timetable, F.data == MasterConstants.EDIT_TIMETABLE)
+@fast_route(master_router, MasterConstants.EDIT_TIMETABLE, state=Master.edit_timetable)
 async def handle_edit_timetable_start(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master is going to edit his timetable.
@@ -428,7 +421,7 @@ async def handle_edit_timetable_start(callback: CallbackQuery, state: FSMContext
     )
 
 
-@master_router.callback_query(Master.edit_timetable, F.data == MasterConstants.BACK_TO_TIMETABLE)
+@fast_route(master_router, MasterConstants.BACK_TO_TIMETABLE, state=Master.edit_timetable)
 async def handle_edit_timetable_cancel(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master is going to go back from checking day OR go back from editing timetable.
@@ -446,7 +439,7 @@ async def handle_edit_timetable_cancel(callback: CallbackQuery, state: FSMContex
     )
 
 
-@master_router.callback_query(Master.edit_timetable, F.data == MasterConstants.CALENDAR_ADD_TIME_BULK)
+@fast_route(master_router, MasterConstants.CALENDAR_ADD_TIME_BULK, state=Master.edit_timetable)
 async def handle_edit_timetable_bulk_start(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master is going to edit multiple days by adding time to each one.
@@ -457,13 +450,10 @@ async def handle_edit_timetable_bulk_start(callback: CallbackQuery, state: FSMCo
     user = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
     text = None
     go_back_to_pick_day = False
-    current_calendar = user.current_calendar
-    current_year = str(user.current_year)
-    current_month = str(user.current_month)
-    days = list(current_calendar.get(current_year, {}).get(current_month, {}).keys())
+    days = mask_days(user.current_calendar_mask)
     if days:
         number_of_appointments = await appointments_per_period(
-            telegram_id=telegram_id, engine=engine, logger=logger, month=user.current_month
+            telegram_id=telegram_id, engine=engine, logger=logger, month=user.current_month, year=user.current_year
         )
         if len(days) + number_of_appointments > Config.MAX_APPOINTMENTS_PER_MONTH:
             go_back_to_pick_day = True
@@ -486,7 +476,7 @@ async def handle_edit_timetable_bulk_start(callback: CallbackQuery, state: FSMCo
         )
 
 
-@master_router.callback_query(Master.edit_timetable_bulk, F.data == MasterConstants.BACK_TO_TIMETABLE)
+@fast_route(master_router, MasterConstants.BACK_TO_TIMETABLE, state=Master.edit_timetable_bulk)
 async def handle_edit_timetable_bulk_cancel(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master is going to edit multiple days by adding time to each one.
@@ -527,12 +517,9 @@ async def handle_edit_timetable_bulk(message: Message, state: FSMContext) -> Non
         await message.answer(text=text, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN)
         return
     else:
-        current_calendar = user.current_calendar
-        current_year = str(user.current_year)
-        current_month = str(user.current_month)
-        for day in current_calendar[current_year][current_month]:  # maximum 31
+        for day in mask_days(user.current_calendar_mask):  # maximum 31
             date_and_time = datetime(
-                day=int(day),
+                day=day,
                 year=user.current_year,
                 month=user.current_month,
                 hour=slot_time.hour,
@@ -575,62 +562,57 @@ async def handle_edit_timetable(callback: CallbackQuery, state: FSMContext) -> N
     current_month = user.current_month or datetime.now().month
     current_year = user.current_year or datetime.now().year
     data_to_set = {"current_month": current_month, "current_year": current_year}
-    current_calendar = {}
+    selected_days = user.current_calendar_mask
+    navigated = False
     if callback.data == MasterConstants.CALENDAR_IGNORE:
-        await callback.answer("Невозможно выбрать эту дату.", reply_markup=user.current_calendar)
+        await callback.answer("Невозможно выбрать эту дату.")
         return
     elif callback.data == MasterConstants.CALENDAR_BACK or callback.data == MasterConstants.CALENDAR_FORWARD:
         current_month, current_year = get_month(
             action_type=callback.data, current_month=current_month, current_year=current_year
         )
-        month_begin, month_end = get_month_edges(month=current_month, year=current_year)
-        appointment_where_clause = WhereClause(
-            params=[appointment_table.c.master_telegram_id, appointment_table.c.datetime, appointment_table.c.datetime],
-            values=[telegram_id, month_begin, month_end],
-            comparison_operators=["==", ">=", "<="],
+        appointment_where_clause = master_month_where_clause(
+            master_telegram_id=telegram_id, month=current_month, year=current_year
         )
         appointments = await Appointment(engine=engine, logger=logger).read_appointment_info(
             where_clause=appointment_where_clause
         )
         appointments = Appointment.appointments_as_dict(appointments=appointments)
-        calendar, current_calendar = await edit_month_calendar(
+        calendar, selected_days = await edit_month_calendar(
             picked_month=current_month,
             picked_year=current_year,
-            current_calendar={},
             edit_mode=edit_mode,
             appointments=appointments,
         )
+        navigated = True
         data_to_set.update(
             {
                 "current_month": int(current_month),
                 "current_year": int(current_year),
-                "current_calendar": current_calendar,
+                "current_calendar_mask": selected_days,
             }
         )
     elif callback.data == MasterConstants.CALENDAR_MON_FRI or callback.data == MasterConstants.CALENDAR_WEEKEND:
-        calendar, current_calendar = await edit_month_calendar(
+        calendar, selected_days = await edit_month_calendar(
             picked_month=current_month,
             picked_year=current_year,
-            current_calendar={},
             week_part=callback.data,
             edit_mode=edit_mode,
         )
-        data_to_set = {"current_calendar": current_calendar}
+        data_to_set = {"current_calendar_mask": selected_days}
     elif callback.data == MasterConstants.CALENDAR_WHOLE:
-        calendar, current_calendar = await edit_month_calendar(
-            picked_month=current_month, picked_year=current_year, current_calendar={}, whole=True, edit_mode=edit_mode,
+        calendar, selected_days = await edit_month_calendar(
+            picked_month=current_month, picked_year=current_year, whole=True, edit_mode=edit_mode,
         )
-        data_to_set = {"current_calendar": current_calendar}
+        data_to_set = {"current_calendar_mask": selected_days}
     elif callback.data == MasterConstants.CALENDAR_DROP:
-        # we use str() because JSON keys are stored as strings:
-        print(f"DEBUG: ", user.current_calendar)
-        if not user.current_calendar.get(str(current_year), {}).get(str(current_month)):
+        if not user.current_calendar_mask:
             await callback.answer(text="Вы ещё не выбрали ни одного дня")
             return
-        calendar, _ = await edit_month_calendar(
-            picked_month=current_month, picked_year=current_year, current_calendar={}, drop=True, edit_mode=edit_mode,
+        calendar, selected_days = await edit_month_calendar(
+            picked_month=current_month, picked_year=current_year, drop=True, edit_mode=edit_mode,
         )
-        data_to_set = {"current_calendar": {}}
+        data_to_set = {"current_calendar_mask": selected_days}
     else:
         if not edit_mode:
             data_to_set.update({"current_day": int(callback.data), "state": Master.edit_day.state})
@@ -640,22 +622,17 @@ async def handle_edit_timetable(callback: CallbackQuery, state: FSMContext) -> N
             )
             await _handle_day_check(callback=callback)
             return
-        calendar, current_calendar = await edit_month_calendar(
+        calendar, selected_days = await edit_month_calendar(
             picked_day=callback.data,
             picked_month=current_month,
             picked_year=current_year,
-            current_calendar=deepcopy(user.current_calendar),
+            selected_days=user.current_calendar_mask,
             edit_mode=edit_mode,
         )
-        data_to_set = {"current_calendar": current_calendar}
-    if user.current_calendar == current_calendar:
-        del data_to_set["current_calendar"]  # update calendar only if it was changed
-        if data_to_set:
-            await User(engine=engine, logger=logger).update_user_info(
-                where_clause=where_clause,
-                data_to_set=data_to_set
-            )
-            # if calendar was the only thing to update and it did not change - do not update at all
+        # a toggle rewrites a single integer
+        data_to_set = {"current_calendar_mask": selected_days}
+    if user.current_calendar_mask == selected_days and not navigated:
+        # if calendar was the only thing to update and it did not change - do not update at all
         await callback.answer(text="Вы уже выбрали эту опцию.")
     else:
         await User(engine=engine, logger=logger).update_user_info(where_clause=where_clause, data_to_set=data_to_set)
@@ -665,19 +642,15 @@ async def handle_edit_timetable(callback: CallbackQuery, state: FSMContext) -> N
         else:
             text += pick_day_to_check_timetable_text
         pprint(calendar)
-        if user.current_calendar == current_calendar:
-            await callback.answer(text="Вы уже выбрали эту опцию.")
-        else:
-            await bot.edit_message_text(
-                text=text,
-                chat_id=callback.message.chat.id,
-                message_id=callback.message.message_id,
-                reply_markup=calendar,
-                parse_mode=ParseMode.MARKDOWN
-            )
+        await edit_or_answer(
+            callback=callback,
+            text=text,
+            reply_markup=calendar,
+            parse_mode=ParseMode.MARKDOWN
+        )
 
 
-@master_router.callback_query(Master.edit_day, F.data == MasterConstants.CALENDAR_ADD_TIME)
+@fast_route(master_router, MasterConstants.CALENDAR_ADD_TIME, state=Master.edit_day)
 async def handle_day_edit(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master is going to add time.
@@ -688,7 +661,12 @@ async def handle_day_edit(callback: CallbackQuery, state: FSMContext) -> None:
     user = await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
     current_day = user.current_day
     number_of_appointments = await appointments_per_period(
-        telegram_id=telegram_id, engine=engine, logger=logger, day=current_day
+        telegram_id=telegram_id,
+        engine=engine,
+        logger=logger,
+        day=current_day,
+        month=user.current_month,
+        year=user.current_year,
     )
     if number_of_appointments + 1 > Config.MAX_TIME_SLOTS_PER_DAY:
         text = (
@@ -699,7 +677,7 @@ async def handle_day_edit(callback: CallbackQuery, state: FSMContext) -> None:
         await _handle_day_edit(callback=callback, state=state)
 
 
-@master_router.callback_query(Master.edit_day, F.data == MasterConstants.BACK_TO_DAY)
+@fast_route(master_router, MasterConstants.BACK_TO_DAY, state=Master.edit_day)
 async def handle_day_edit_cancel(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master is going to go back from adding .
@@ -709,7 +687,7 @@ async def handle_day_edit_cancel(callback: CallbackQuery, state: FSMContext) ->
     await _handle_day_check(callback=callback)
 
 
-@master_router.callback_query(Master.edit_day, F.data == MasterConstants.BACK_TO_TIMETABLE)
+@fast_route(master_router, MasterConstants.BACK_TO_TIMETABLE, state=Master.edit_day)
 async def handle_day_check_cancel(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master is going to go back from checking day OR go back from editing timetable.
@@ -727,7 +705,7 @@ async def handle_day_check_cancel(callback: CallbackQuery, state: FSMContext) ->
     )
 
 
-@master_router.callback_query(Master.edit_day, F.data == MasterConstants.CALENDAR_DELETE_TIME)
+@fast_route(master_router, MasterConstants.CALENDAR_DELETE_TIME, state=Master.edit_day)
 async def handle_time_slot_delete_start(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master is going to delete a time slot.
@@ -763,7 +741,7 @@ async def handle_day_add_time(message: Message, state: FSMContext) -> None:
     await _handle_time_add_or_edit(message=message, edit_mode=False)
 
 
-@master_router.callback_query(Master.delete_time, F.data == MasterConstants.BACK_TO_DAY)
+@fast_route(master_router, MasterConstants.BACK_TO_DAY, state=Master.delete_time)
 async def handle_time_slot_delete_done(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master is done deleting a time slot.
@@ -808,6 +786,7 @@ async def handle_time_slot_delete(callback: CallbackQuery, state: FSMContext) ->
         ],
     )
     appointments_and_master_info = appointments_and_master_info[0]
+    notifications = []
     if appointments_and_master_info.client_telegram_id:
         master_info = _prepare_user_info(user=appointments_and_master_info)
         notification_text = appointment_info(
@@ -816,15 +795,20 @@ async def handle_time_slot_delete(callback: CallbackQuery, state: FSMContext) ->
             service=appointments_and_master_info.service,
             for_master=False,
         )
-        notification_text = "Вашу запись отменили\n" + notification_text
-        await notify_user(
-            text=notification_text, telegram_id=appointments_and_master_info.client_telegram_id, logger=logger
+        notifications.append(
+            OutboxMessageModel(
+                chat_id=appointments_and_master_info.client_telegram_id,
+                text="Вашу запись отменили\n" + notification_text,
+            )
         )
-    await Appointment(engine=engine, logger=logger).delete_appointment(auid=callback.data)
+    # client is notified by outbox dispatcher once the slot is actually deleted
+    await Appointment(engine=engine, logger=logger).delete_appointment(
+        auid=callback.data, transaction_hooks=[Outbox.enqueue_hook(lambda rows: notifications)]
+    )
     await _handle_time_slot_delete(callback=callback, state=state)
 
 
-@master_router.callback_query(Master.edit_time, F.data == MasterConstants.EDIT_TIME)
+@fast_route(master_router, MasterConstants.EDIT_TIME, state=Master.edit_time)
 async def handle_time_slot_edit_start(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master is going to edit existing time slot.
@@ -835,19 +819,15 @@ async def handle_time_slot_edit_start(callback: CallbackQuery, state: FSMContext
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[[InlineKeyboardButton(text="Назад", callback_data=MasterConstants.BACK_TO_TIME)]]
     )
-    await bot.edit_message_text(
+    await edit_or_answer(
+        callback=callback,
         text=text,
-        chat_id=callback.message.chat.id,
-        message_id=callback.message.message_id,
         parse_mode=ParseMode.MARKDOWN,
         reply_markup=keyboard,
     )
 
 
-@master_router.callback_query(
-    Master.edit_time,
-    (F.data == MasterConstants.BACK_TO_TIME) | (F.data == MasterConstants.CANCEL_APPOINTMENT),
-)
+@fast_route(master_router, MasterConstants.BACK_TO_TIME, MasterConstants.CANCEL_APPOINTMENT, state=Master.edit_time)
 async def handle_time_slot_cancel(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when master has canceled appointment or pressed 'Назад'.
@@ -2,7 +2,6 @@ import re
 from logging import Logger
 from typing import Union
 
-from aiogram import F
 from aiogram import Router
 from aiogram.enums import ParseMode
 from aiogram.fsm.context import FSMContext
@@ -34,6 +33,7 @@ from npb.text.registration_form import (
     what_do_you_want_to_change_text,
 )
 from npb.tg.bot import bot
+from npb.tg.fast_routes import fast_route
 from npb.utils.common import (
     edit_profile_keyboard,
     get_user_data,  # TODO:  this should be in db.utils
@@ -542,7 +542,7 @@ async def handle_name(message: Message, state: FSMContext) -> None:
     )
 
 
-@registration_form_router.callback_query(RegistrationForm.service, F.data == RegistrationConstants.DONE_SERVICE)
+@fast_route(registration_form_router, RegistrationConstants.DONE_SERVICE, state=RegistrationForm.service)
 async def handle_service_done(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when client done picking services.
@@ -561,7 +561,7 @@ async def handle_service_done(callback: CallbackQuery, state: FSMContext) -> Non
         await _handle_start_edit_phone_number(callback=callback)
 
 
-@registration_form_router.callback_query(RegistrationForm.service, F.data == CommonConstants.EDIT_SERVICE)
+@fast_route(registration_form_router, CommonConstants.EDIT_SERVICE, state=RegistrationForm.service)
 async def handle_service_delete_start(callback: CallbackQuery, state: FSMContext):
     """
     Activates when client going to delete service.
@@ -582,7 +582,7 @@ async def handle_service_delete_start(callback: CallbackQuery, state: FSMContext
     )
 
 
-@registration_form_router.callback_query(RegistrationForm.edit_service, F.data == CommonConstants.EDIT_SERVICE_DONE)
+@fast_route(registration_form_router, CommonConstants.EDIT_SERVICE_DONE, state=RegistrationForm.edit_service)
 async def handle_service_delete_done(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when client done deleting services.
@@ -650,7 +650,7 @@ async def handle_service(callback: CallbackQuery, state: FSMContext) -> None:
     )
 
 
-@registration_form_router.callback_query(RegistrationForm.sub_service, F.data == RegistrationConstants.DONE_SUB_SERVICE)
+@fast_route(registration_form_router, RegistrationConstants.DONE_SUB_SERVICE, state=RegistrationForm.sub_service)
 async def handle_sub_service_done(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when client done with picking sub services.
@@ -715,7 +715,7 @@ async def handle_phone_number_edit(message: Message, state: FSMContext) -> None:
     )
 
 
-@registration_form_router.callback_query(RegistrationForm.instagram_link, F.data == RegistrationConstants.SKIP)
+@fast_route(registration_form_router, RegistrationConstants.SKIP, state=RegistrationForm.instagram_link)
 async def handle_instagram_link_skip(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when user does not want to specify his instagram link.
@@ -779,7 +779,7 @@ async def handle_instagram_link_edit(message: Message, state: FSMContext) -> Non
     )
 
 
-@registration_form_router.callback_query(RegistrationForm.description, F.data == RegistrationConstants.SKIP)
+@fast_route(registration_form_router, RegistrationConstants.SKIP, state=RegistrationForm.description)
 async def handle_description_skip(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when user does not want to specify description.
@@ -857,7 +857,7 @@ async def handle_description_edit(message: Message, state: FSMContext) -> None:
     )
 
 
-@registration_form_router.callback_query(RegistrationForm.telegram_profile, F.data == RegistrationConstants.SKIP)
+@fast_route(registration_form_router, RegistrationConstants.SKIP, state=RegistrationForm.telegram_profile)
 async def handle_telegram_profile_skip(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Activates when user does not want to specify his telegram profile.
@@ -1007,7 +1007,7 @@ async def handle_edit(callback: CallbackQuery, state: FSMContext) -> None:
 
 
 @registration_form_router.message(RegistrationForm.edit)
-async def handle_edit(message: Message) -> None:
+async def handle_edit_message(message: Message) -> None:
     """
     Activates when user writes something in chat during 'RegistrationForm.edit' mode.
     :param message:
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from npb.config import Config
+from npb.db.core import engine
+from npb.db.instrumentation import observe_pool
+from npb.metrics import EXPOSITION_CONTENT_TYPE, get_metrics_registry
+
+
+router = APIRouter()
+
+
+@router.get(f"{Config.METRICS_PATH}")
+async def metrics():
+    """
+    Metrics of this worker in Prometheus text format.
+    :return: Metrics.
+    """
+    observe_pool(engine=engine)
+    return PlainTextResponse(content=get_metrics_registry().exposition(), media_type=EXPOSITION_CONTENT_TYPE)
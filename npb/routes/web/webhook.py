@@ -1,9 +1,15 @@
+from typing import Any, Dict, Optional
+
+from aiogram.methods import TelegramMethod
 from aiogram.types import Update
 from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
 
 from npb.tg.bot import bot
 from npb.config import Config
 from npb.tg.dispatcher import dp
+from npb.tg.idempotency import get_callback_deduplicator
+from npb.tg.keyboards import get_keyboard_registry
 
 
 router = APIRouter()
@@ -12,6 +18,27 @@ router = APIRouter()
 processed_update_ids = set()
 
 
+def webhook_reply_payload(method: TelegramMethod) -> Optional[Dict[str, Any]]:
+    """
+    Build webhook response body which makes Telegram call a Bot API method on our behalf.
+    :param method: Bot API method returned by a handler.
+    :return: Response body or None, if the method can not be passed in a webhook response (e.g. uploads files).
+    """
+    files = {}
+    payload = {"method": method.__api_method__}
+    exclude = set()
+    if (keyboard := get_keyboard_registry().dumped(getattr(method, "reply_markup", None))) is not None:
+        payload["reply_markup"] = keyboard
+        exclude.add("reply_markup")
+    for key, value in method.model_dump(warnings=False, exclude=exclude).items():
+        value = bot.session.prepare_value(value, bot=bot, files=files, _dumps_json=False)
+        if value is not None:
+            payload[key] = value
+    if files:
+        return None
+    return payload
+
+
 @router.post(f"{Config.TELEGRAM_WEBHOOK_PATH}")
 async def tg_webhook(request: Request):
     """
@@ -28,5 +55,14 @@ async def tg_webhook(request: Request):
         print(f"length of processed_update_ids: {len(processed_update_ids)}.")
         return "ok"
     processed_update_ids.add(update.update_id)
-    await dp.feed_update(bot=bot, update=update)
+    if (callback := update.callback_query) and not get_callback_deduplicator().claim(callback=callback):
+        # double tap: the first tap is (being) handled, the duplicate only stops the button's loading indicator
+        result = callback.answer()
+    else:
+        result = await dp.feed_update(bot=bot, update=update)
+    if isinstance(result, TelegramMethod):
+        # handler's final answer: hand it back to Telegram instead of making a separate request
+        if Config.TELEGRAM_WEBHOOK_REPLY and (payload := webhook_reply_payload(method=result)):
+            return JSONResponse(content=payload)
+        await dp.silent_call_request(bot=bot, result=result)
     return "ok"
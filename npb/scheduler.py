@@ -0,0 +1,116 @@
+import asyncio
+import heapq
+from datetime import datetime, timedelta, timezone
+from logging import Logger
+from typing import List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from npb.background import appointment_notification, run_job
+from npb.config import Config
+from npb.db.api import REMINDERS_CHANNEL, Reminder
+from npb.db.core import engine
+from npb.logger import get_logger
+
+
+class ReminderScheduler:
+    """
+    Sends appointment reminders right when they become due: planned reminders ('reminder' table) of the next
+    Config.REMINDER_SCHEDULER_WINDOW are kept in a heap and the scheduler sleeps until the nearest deadline. Booked /
+    rescheduled appointments wake it up through Postgres NOTIFY, so every process (and every host) reloads its heap.
+    Due rows are claimed with 'FOR UPDATE SKIP LOCKED', so several schedulers never send the same reminder twice.
+    """
+    def __init__(self, engine: AsyncEngine, logger: Logger):
+        self._engine = engine
+        self._logger = logger
+        self._heap: List[Tuple[datetime, int]] = []
+        self._wakeup = asyncio.Event()
+        self._listen_connection: Optional[AsyncConnection] = None
+        self._listen_driver_connection = None
+
+    def wake(self, *args) -> None:
+        """
+        Make scheduler reload upcoming reminders (also used as NOTIFY listener callback).
+        """
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        reload_at = None
+        retry_at = None
+        while True:
+            try:
+                if await self._ensure_listener():
+                    # notifications sent while nobody was listening are lost, so reload right away
+                    reload_at = None
+                now = datetime.now(tz=timezone.utc)
+                if reload_at is None or now >= reload_at:
+                    await self._load()
+                    reload_at = now + timedelta(seconds=Config.REMINDER_SCHEDULER_WINDOW / 2)
+                next_deadline = reload_at
+                if self._heap:
+                    next_deadline = min(max(self._heap[0][0], retry_at or now), reload_at)
+                timeout = max((next_deadline - now).total_seconds(), 0)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                    self._wakeup.clear()
+                    reload_at = None
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+                now = datetime.now(tz=timezone.utc)
+                if self._heap and self._heap[0][0] <= now and (retry_at is None or retry_at <= now):
+                    await run_job(
+                        name="appointment_notification",
+                        job=lambda: appointment_notification(logger=self._logger),
+                        logger=self._logger,
+                    )
+                    # reminders that could not be claimed (e.g. locked by another scheduler) are retried a bit later
+                    retry_at = datetime.now(tz=timezone.utc) + timedelta(seconds=Config.REMINDER_SCHEDULER_RETRY)
+                    reload_at = None
+            except Exception as exc:
+                self._logger.error(f"Unexpected error in reminder scheduler: {exc}.")
+                await self._close_listener()
+                reload_at = None
+                await asyncio.sleep(Config.LEADER_CHECK_INTERVAL)
+
+    async def _load(self) -> None:
+        reminders = await Reminder(engine=self._engine, logger=self._logger).read_upcoming_reminders(
+            window=Config.REMINDER_SCHEDULER_WINDOW
+        )
+        heap = [(reminder.due_at, reminder.id) for reminder in reminders]
+        heapq.heapify(heap)
+        self._heap = heap
+        self._logger.info(
+            f"Reminder scheduler: {len(heap)} reminders loaded, next one at {heap[0][0] if heap else None}."
+        )
+
+    async def _ensure_listener(self) -> bool:
+        """
+        (Re)create connection listening for reminder changes.
+        :return: True if connection was (re)created.
+        """
+        if self._listen_connection is not None and not self._listen_driver_connection.is_closed():
+            return False
+        await self._close_listener()
+        self._listen_connection = await self._engine.connect()
+        raw_connection = await self._listen_connection.get_raw_connection()
+        self._listen_driver_connection = raw_connection.driver_connection
+        await self._listen_driver_connection.add_listener(REMINDERS_CHANNEL, self.wake)
+        return True
+
+    async def _close_listener(self) -> None:
+        if self._listen_connection is not None:
+            connection, self._listen_connection = self._listen_connection, None
+            self._listen_driver_connection = None
+            try:
+                await connection.invalidate()
+            except Exception as exc:
+                self._logger.error(f"Could not close reminder listener connection: {exc}.")
+
+
+reminder_scheduler = ReminderScheduler(engine=engine, logger=get_logger())
+
+
+def get_reminder_scheduler():
+    """Returns a reminder_scheduler global instance."""
+    return reminder_scheduler
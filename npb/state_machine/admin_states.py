@@ -9,3 +9,5 @@ class Admin(StatesGroup):
     add_master = State()
     activate_user = State()
     deactivate_user = State()
+    broadcast_audience = State()
+    broadcast_text = State()
@@ -33,7 +33,7 @@ class BlackListManager:
             self._black_list.add(telegram_id)
             print("DEBUG _black_list: ", self._black_list)
         else:
-            data_to_set = {"flood_count": user.flood_count + 1}
+            data_to_set = {"flood_count": (user.flood_count or 0) + 1, "flood_ts": datetime.now()}
             text = (
                 "Внимание! Вы слишком часто взаимодействуете с ботом! Ваши действия могут быть "
                 "расценены, как флуд-атака. При сохранении текущих темпов взаимодействия "
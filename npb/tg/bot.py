@@ -1,5 +1,6 @@
 from aiogram import Bot
 
 from npb.config import Config
+from npb.tg.session import create_bot_session
 
-bot = Bot(token=Config.BOT_TOKEN)
+bot = Bot(token=Config.BOT_TOKEN, session=create_bot_session())
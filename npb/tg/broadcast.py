@@ -0,0 +1,108 @@
+import asyncio
+from logging import Logger
+from typing import Sequence
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from npb.config import Config
+from npb.db.api import Broadcast
+from npb.db.core import engine
+from npb.exceptions import DeliveryFailed
+from npb.leader import get_leader_elector
+from npb.logger import get_logger
+from npb.metrics import get_metrics_registry
+from npb.tg.delivery import TokenBucket, get_delivery_pipeline
+
+broadcast_messages_counter = get_metrics_registry().counter(
+    "npb_broadcast_messages_total", "Broadcast messages by delivery outcome.", ["status"]
+)
+
+
+class BroadcastRunner:
+    """
+    Sends admin broadcasts on the leader process. Recipients are read from 'npb_user' in keyset pages (in seq_id
+    order, Config.BROADCAST_PAGE_SIZE per page), messages go through the delivery pipeline, paced by
+    an own token bucket (Config.BROADCAST_RATE), so that a broadcast leaves room for regular notifications. Progress
+    is saved after every batch, so a broadcast is resumed after a restart (or by a new leader).
+    """
+    def __init__(self, engine: AsyncEngine, logger: Logger):
+        self._engine = engine
+        self._logger = logger
+        self._bucket = TokenBucket(rate=Config.BROADCAST_RATE, capacity=Config.BROADCAST_RATE)
+
+    async def run(self) -> None:
+        leader_elector = get_leader_elector()
+        while True:
+            if leader_elector.is_leader:
+                try:
+                    for broadcast in await Broadcast(engine=self._engine, logger=self._logger).read_running_broadcasts():
+                        await self._run_broadcast(broadcast=broadcast)
+                except Exception as exc:
+                    self._logger.error(f"Unexpected error in broadcast runner: {exc}.")
+            await asyncio.sleep(Config.LEADER_CHECK_INTERVAL)
+
+    async def _run_broadcast(self, broadcast: Row) -> None:
+        repository = Broadcast(engine=self._engine, logger=self._logger)
+        leader_elector = get_leader_elector()
+        last_seq_id, sent, failed = broadcast.last_seq_id or 0, broadcast.sent or 0, broadcast.failed or 0
+        reported = sent + failed
+        self._logger.info(f"Broadcast {broadcast.id}: running from seq_id {last_seq_id}.")
+        while True:
+            recipients = await repository.read_recipients(
+                audience=broadcast.audience, after_seq_id=last_seq_id, limit=Config.BROADCAST_PAGE_SIZE
+            )
+            for start in range(0, len(recipients), Config.BROADCAST_CONCURRENCY):
+                if not leader_elector.is_leader:
+                    # new leader resumes the broadcast from saved progress
+                    return
+                batch = recipients[start:start + Config.BROADCAST_CONCURRENCY]
+                delivered = await self._send_batch(broadcast=broadcast, batch=batch)
+                sent, failed, last_seq_id = sent + delivered, failed + len(batch) - delivered, batch[-1].seq_id
+                await repository.update_progress(
+                    broadcast_id=broadcast.id, last_seq_id=last_seq_id, sent=sent, failed=failed
+                )
+                if sent + failed - reported >= Config.BROADCAST_PROGRESS_EVERY:
+                    reported = sent + failed
+                    await self._report(broadcast=broadcast, text=f"отправлено {sent}, не доставлено {failed}.")
+            if len(recipients) < Config.BROADCAST_PAGE_SIZE:
+                break
+        await repository.finish_broadcast(broadcast_id=broadcast.id)
+        self._logger.info(f"Broadcast {broadcast.id}: done, sent {sent}, failed {failed}.")
+        await self._report(broadcast=broadcast, text=f"завершена. Отправлено {sent}, не доставлено {failed}.")
+
+    async def _send_batch(self, broadcast: Row, batch: Sequence[Row]) -> int:
+        """
+        Send broadcast message to a batch of recipients concurrently.
+        :param broadcast: Broadcast.
+        :param batch: Recipients.
+        :return: Number of delivered messages.
+        """
+        delivered = await asyncio.gather(*(self._send(recipient.telegram_id, broadcast.text) for recipient in batch))
+        return sum(delivered)
+
+    async def _send(self, chat_id: str, text: str) -> bool:
+        await self._bucket.acquire()
+        try:
+            await get_delivery_pipeline().send_message(chat_id=chat_id, text=text, parse_mode=None)
+        except DeliveryFailed:
+            broadcast_messages_counter.inc(status="failed")
+            return False
+        broadcast_messages_counter.inc(status="sent")
+        return True
+
+    async def _report(self, broadcast: Row, text: str) -> None:
+        try:
+            await get_delivery_pipeline().send_message(
+                chat_id=broadcast.admin_telegram_id, text=f"Рассылка №{broadcast.id}: {text}", parse_mode=None
+            )
+        except DeliveryFailed as exc:
+            self._logger.error(f"Could not report broadcast {broadcast.id} progress: {exc}.")
+
+
+broadcast_runner = BroadcastRunner(engine=engine, logger=get_logger())
+
+
+def get_broadcast_runner():
+    """Returns a broadcast_runner global instance."""
+    return broadcast_runner
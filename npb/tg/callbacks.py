@@ -0,0 +1,135 @@
+import string
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Type, Union
+
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery
+
+CALLBACK_DATA_MAX_LENGTH = 64  # bytes, Telegram limit
+BASE36_DIGITS = string.digits + string.ascii_lowercase
+
+
+def encode_int(value: int) -> str:
+    """
+    Pack a non negative int (e.g. telegram id) into base36.
+    :param value: Int.
+    :return: Packed int.
+    """
+    if value < 0:
+        raise ValueError(f"Only non negative ints can be packed, given: {value}.")
+    digits = []
+    while True:
+        value, digit = divmod(value, 36)
+        digits.append(BASE36_DIGITS[digit])
+        if not value:
+            return "".join(reversed(digits))
+
+
+def decode_int(value: str) -> int:
+    return int(value, 36)
+
+
+class CallbackCodec:
+    """
+    Compact versioned callback_data that carries navigation context in the button itself:
+    '<prefix><version><action>:<base36 ints separated by dots>', trailing zero fields are omitted. Context is a
+    NamedTuple whose first field is 'action' (one letter) and other fields are non negative ints.
+    """
+    def __init__(self, prefix: str, version: int, model: Type[NamedTuple]):
+        self.prefix = prefix
+        self.version = str(version)
+        self.model = model
+        self._fields = model._fields[1:]
+
+    def encode(self, context: NamedTuple) -> str:
+        """
+        Encode context into callback_data.
+        :param context: Context.
+        :return: Callback data.
+        """
+        values = [encode_int(getattr(context, field)) for field in self._fields]
+        while values and values[-1] == "0":
+            values.pop()
+        data = f"{self.prefix}{self.version}{context.action}:{'.'.join(values)}"
+        if len(data.encode()) > CALLBACK_DATA_MAX_LENGTH:
+            raise ValueError(f"Callback data '{data}' is longer than {CALLBACK_DATA_MAX_LENGTH} bytes.")
+        return data
+
+    def decode(self, data: str) -> Optional[NamedTuple]:
+        """
+        Decode callback_data.
+        :param data: Callback data.
+        :return: Context or None if data was not encoded by this codec (or by its another version).
+        """
+        header, separator, payload = data.partition(":")
+        if not separator or header[:-1] != f"{self.prefix}{self.version}":
+            return None
+        try:
+            values = [decode_int(value) for value in payload.split(".")] if payload else []
+        except ValueError:
+            return None
+        if len(values) > len(self._fields):
+            return None
+        values += [0] * (len(self._fields) - len(values))
+        return self.model(header[-1], *values)
+
+    def is_outdated(self, data: str) -> bool:
+        """
+        Check whether callback_data was encoded by another version of this codec (e.g. a button sent before update).
+        :param data: Callback data.
+        """
+        if not data:
+            return False
+        header, separator, _ = data.partition(":")
+        return bool(separator) and header.startswith(self.prefix) and header[len(self.prefix):-1] != self.version
+
+    def filter(self, *actions: str) -> "CallbackCodecFilter":
+        return CallbackCodecFilter(codec=self, actions=actions)
+
+
+class CallbackCodecFilter(Filter):
+    """
+    Passes callbacks encoded by the codec (with one of given actions), decoded context is passed to handler as
+    'navigation' argument.
+    """
+    def __init__(self, codec: CallbackCodec, actions: tuple = ()):
+        self.codec = codec
+        self.actions = actions
+
+    @property
+    def headers(self) -> Tuple[str, ...]:
+        """
+        Callback data headers (part before ':') that can pass the filter, empty if any action passes.
+        """
+        return tuple(f"{self.codec.prefix}{self.codec.version}{action}" for action in self.actions)
+
+    async def __call__(self, callback: CallbackQuery) -> Union[bool, Dict[str, Any]]:
+        navigation = self.codec.decode(callback.data or "")
+        if navigation is None or (self.actions and navigation.action not in self.actions):
+            return False
+        return {"navigation": navigation}
+
+
+class BookingNavigation(NamedTuple):
+    """
+    Context of client booking flow: master's calendar month, picked day and time.
+    """
+    action: str
+    master: int
+    year: int
+    month: int
+    day: int = 0
+    minutes: int = 0
+
+
+class BookingActions:
+    MONTH = "m"  # show master's calendar for a month
+    DAY = "d"  # show free slots of a day
+    TIME = "t"  # book a slot
+
+
+booking_codec = CallbackCodec(prefix="b", version=1, model=BookingNavigation)
+
+
+def get_booking_codec():
+    """Returns a booking_codec global instance."""
+    return booking_codec
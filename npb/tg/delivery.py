@@ -0,0 +1,184 @@
+import asyncio
+import random
+from logging import Logger
+from time import monotonic
+from typing import Any, Dict, Optional
+
+from aiogram import Bot
+from aiogram.enums import ParseMode
+from aiogram.exceptions import (
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.methods import SendMessage, TelegramMethod
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from npb.config import Config
+from npb.db.api import DeadLetter
+from npb.db.core import engine
+from npb.exceptions import ChatUnreachable, DeliveryFailed
+from npb.logger import get_logger
+from npb.metrics import get_metrics_registry
+from npb.tg.bot import bot
+from npb.tg.reachability import get_reachability_manager
+
+deliveries_counter = get_metrics_registry().counter(
+    "npb_tg_deliveries_total", "Outgoing Telegram deliveries by outcome.", ["status"]
+)
+delivery_retries_counter = get_metrics_registry().counter(
+    "npb_tg_delivery_retries_total", "Telegram delivery retries by reason.", ["reason"]
+)
+suppressed_counter = get_metrics_registry().counter(
+    "npb_tg_suppressed_total", "Telegram deliveries skipped because the chat is unreachable.", ["method"]
+)
+
+
+class TokenBucket:
+    """
+    Allows at most 'rate' acquisitions per second on average, with bursts up to 'capacity'.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Drain the bucket for given time (e.g. when Telegram asked to retry later).
+        :param seconds: Pause duration.
+        """
+        self._tokens = min(self._tokens, 0) - seconds * self._rate
+        self._updated = monotonic()
+
+
+class DeliveryPipeline:
+    """
+    Sends Bot API requests within Telegram limits: a global token bucket (Config.TG_GLOBAL_RATE messages per second),
+    pacing per chat (Config.TG_PER_CHAT_INTERVAL), retries with exponential backoff that honour 'retry_after'.
+    Requests that could not be delivered are recorded in 'dead_letter' table. Requests to chats that have blocked the
+    bot are not sent at all (see npb.tg.reachability).
+    """
+    def __init__(self, bot: Bot, engine: AsyncEngine, logger: Logger):
+        self._bot = bot
+        self._engine = engine
+        self._logger = logger
+        self._bucket = TokenBucket(rate=Config.TG_GLOBAL_RATE, capacity=Config.TG_GLOBAL_RATE)
+        self._chat_locks: Dict[str, asyncio.Lock] = {}
+        self._chat_last_sent: Dict[str, float] = {}
+
+    async def send_message(
+        self, chat_id: str, text: str, parse_mode: Optional[str] = ParseMode.MARKDOWN, **kwargs
+    ) -> Any:
+        """
+        Send a text message.
+        :param chat_id: Telegram chat id.
+        :param text: Message text.
+        :param parse_mode: Parse mode.
+        :param kwargs: Other SendMessage params.
+        :return: Sent message.
+        """
+        return await self.deliver(SendMessage(chat_id=chat_id, text=text, parse_mode=parse_mode, **kwargs))
+
+    async def deliver(self, method: TelegramMethod) -> Any:
+        """
+        Deliver a Bot API request.
+        :param method: Bot API method (must have 'chat_id').
+        :return: Bot API response.
+        """
+        chat_id = str(method.chat_id)
+        reachability_manager = get_reachability_manager()
+        if await reachability_manager.is_unreachable(chat_id):
+            suppressed_counter.inc(method=method.__api_method__)
+            raise ChatUnreachable(f"Chat {chat_id} is unreachable, {method.__api_method__} is not sent.")
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self._chat_lock(chat_id):
+                    await self._wait_for_chat(chat_id)
+                    await self._bucket.acquire()
+                    self._chat_last_sent[chat_id] = monotonic()
+                    result = await self._bot(method)
+                deliveries_counter.inc(status="sent")
+                return result
+            except TelegramRetryAfter as exc:
+                delivery_retries_counter.inc(reason="retry_after")
+                # flood control is applied to the whole bot, so every other send has to wait too
+                self._bucket.pause(exc.retry_after)
+                delay = exc.retry_after
+                error = exc
+            except (TelegramNetworkError, TelegramServerError) as exc:
+                delivery_retries_counter.inc(reason="network")
+                delay = Config.TG_DELIVERY_BACKOFF * 2 ** (attempt - 1) * (1 + random.random() / 2)
+                error = exc
+            except TelegramForbiddenError as exc:
+                # user has blocked the bot (or was deactivated): retries and dead letters are useless
+                deliveries_counter.inc(status="unreachable")
+                await reachability_manager.mark_unreachable(chat_id=chat_id, reason=exc.message)
+                raise ChatUnreachable(f"Chat {chat_id} is unreachable. Details: {exc}.")
+            except Exception as exc:
+                await self._dead_letter(chat_id=chat_id, method=method, error=exc, attempts=attempt)
+                raise DeliveryFailed(f"Could not deliver {method.__api_method__} to {chat_id}. Details: {exc}.")
+            if attempt >= Config.TG_DELIVERY_MAX_ATTEMPTS:
+                await self._dead_letter(chat_id=chat_id, method=method, error=error, attempts=attempt)
+                raise DeliveryFailed(
+                    f"Could not deliver {method.__api_method__} to {chat_id} in {attempt} attempts. Details: {error}."
+                )
+            self._logger.info(f"Delivery to {chat_id} failed ({error}), retry in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+
+    def _chat_lock(self, chat_id: str) -> asyncio.Lock:
+        if len(self._chat_locks) > Config.TG_DELIVERY_MAX_TRACKED_CHATS:
+            self._forget_idle_chats()
+        return self._chat_locks.setdefault(chat_id, asyncio.Lock())
+
+    async def _wait_for_chat(self, chat_id: str) -> None:
+        last_sent = self._chat_last_sent.get(chat_id)
+        if last_sent is not None:
+            delay = last_sent + Config.TG_PER_CHAT_INTERVAL - monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    def _forget_idle_chats(self) -> None:
+        border = monotonic() - Config.TG_PER_CHAT_INTERVAL
+        for chat_id, lock in list(self._chat_locks.items()):
+            if not lock.locked() and self._chat_last_sent.get(chat_id, 0) < border:
+                del self._chat_locks[chat_id]
+                self._chat_last_sent.pop(chat_id, None)
+
+    async def _dead_letter(self, chat_id: str, method: TelegramMethod, error: Exception, attempts: int) -> None:
+        deliveries_counter.inc(status="dead_letter")
+        self._logger.error(f"Delivery of {method.__api_method__} to {chat_id} failed: {error}. Moving to dead letters.")
+        try:
+            await DeadLetter(engine=self._engine, logger=self._logger).create_dead_letter(
+                chat_id=chat_id,
+                method=method.__api_method__,
+                payload=method.model_dump(mode="json", exclude_none=True),
+                error=str(error),
+                attempts=attempts,
+            )
+        except Exception as exc:
+            self._logger.error(f"Could not save dead letter for {chat_id}: {exc}.")
+
+
+delivery_pipeline = DeliveryPipeline(bot=bot, engine=engine, logger=get_logger())
+
+
+def get_delivery_pipeline():
+    """Returns a delivery_pipeline global instance."""
+    return delivery_pipeline
@@ -0,0 +1,182 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+from aiogram import BaseMiddleware, F, Router
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.dispatcher.middlewares.manager import MiddlewareManager
+from aiogram.filters import StateFilter
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery, Update
+
+from npb.metrics import get_metrics_registry
+from npb.tg.callbacks import CallbackCodecFilter
+
+fast_routes_counter = get_metrics_registry().counter(
+    "npb_tg_fast_routes_total", "Callback updates by routing: resolved by route table or passed to routers.", ["result"]
+)
+
+RouteKey = Tuple[Optional[str], str]
+
+
+@dataclass
+class Route(HandlerObject):
+    """
+    Routed handler: inner middlewares of its router's callback observer (and of parent routers) are applied to it as
+    if the callback were routed by routers.
+    """
+    observer: Optional[TelegramEventObserver] = None
+
+    async def handle(self, callback: CallbackQuery, **kwargs: Any) -> Any:
+        if self.observer is None:
+            return await self.call(callback, **kwargs)
+        # the same chain that TelegramEventObserver.trigger builds for a matched handler
+        wrapped = MiddlewareManager.wrap_middlewares(self.observer._resolve_middlewares(), self.call)
+        return await wrapped(callback, kwargs)
+
+
+class FastRouteTable:
+    """
+    Callback routes resolved with dict lookups instead of checking filters of every handler of every router in order.
+    Namespaced callback constants are looked up by (state, data) and callbacks encoded by a codec (see
+    npb.tg.callbacks) by their header (prefix, version and action), so a namespaced callback has exactly one owner.
+    Free-form callback data (ids, days, services) is not routed here and goes to routers as before.
+    """
+    def __init__(self):
+        self._exact: Dict[RouteKey, Route] = {}
+        self._prefixed: Dict[RouteKey, Route] = {}
+
+    @staticmethod
+    def _states(state: Union[None, State, Sequence[State]]) -> Tuple[Optional[str], ...]:
+        if state is None:
+            return None,  # any state
+        if isinstance(state, State):
+            return state.state,
+        return tuple(item.state for item in state)
+
+    @staticmethod
+    def _add(routes: Dict[RouteKey, Route], keys: Iterable[RouteKey], handler_object: Route) -> None:
+        for key in keys:
+            if key in routes:
+                raise ValueError(f"Callback {key} is already routed to '{routes[key].callback.__name__}'.")
+            routes[key] = handler_object
+
+    def add(
+        self,
+        handler: Callable[..., Any],
+        data: Sequence[str] = (),
+        codec_filters: Sequence[CallbackCodecFilter] = (),
+        state: Union[None, State, Sequence[State]] = None,
+        observer: TelegramEventObserver = None,
+    ) -> None:
+        """
+        Add handler to the table.
+        :param handler: Handler.
+        :param data: Callback data constants.
+        :param codec_filters: Codec filters (with actions), their results are passed to handler.
+        :param state: State, several states or None for any state.
+        :param observer: Callback observer of the router the handler is registered in.
+        """
+        states = self._states(state)
+        if data:
+            keys = [(state, key) for state in states for key in data]
+            self._add(self._exact, keys, Route(callback=handler, observer=observer))
+        for codec_filter in codec_filters:
+            if not codec_filter.headers:
+                raise ValueError(f"Codec filter of '{handler.__name__}' must be limited to actions to be routed.")
+            handler_object = Route(callback=handler, filters=[FilterObject(codec_filter)], observer=observer)
+            keys = [(state, key) for state in states for key in codec_filter.headers]
+            self._add(self._prefixed, keys, handler_object)
+
+    def resolve(self, raw_state: Optional[str], data: str) -> Optional[Route]:
+        """
+        Find handler of callback data.
+        :param raw_state: Current state.
+        :param data: Callback data.
+        :return: Handler or None if callback must be routed by routers.
+        """
+        route = self._exact.get((raw_state, data)) or self._exact.get((None, data))
+        if route is None and self._prefixed:
+            header = data.partition(":")[0]
+            route = self._prefixed.get((raw_state, header)) or self._prefixed.get((None, header))
+        return route
+
+    def route(
+        self,
+        router: Router,
+        *routes: Union[str, CallbackCodecFilter],
+        state: Union[None, State, Sequence[State]] = None,
+    ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """
+        Register callback handler in the router (routers handle callbacks if table is not used) and in the table.
+        :param router: Router.
+        :param routes: Callback data constants and codec filters.
+        :param state: State, several states or None for any state.
+        :return: Decorator.
+        """
+        data = [route for route in routes if isinstance(route, str)]
+        codec_filters = [route for route in routes if isinstance(route, CallbackCodecFilter)]
+        filters = []
+        if state is not None:
+            filters.append(StateFilter(*self._states(state)))
+
+        def decorator(handler: Callable[..., Any]) -> Callable[..., Any]:
+            if data:
+                router.callback_query(*filters, F.data.in_(set(data)))(handler)
+            for codec_filter in codec_filters:
+                router.callback_query(*filters, codec_filter)(handler)
+            self.add(
+                handler=handler, data=data, codec_filters=codec_filters, state=state, observer=router.callback_query
+            )
+            return handler
+        return decorator
+
+
+class FastRouteMiddleware(BaseMiddleware):
+    """
+    Update middleware that calls handlers of routed callbacks directly. It must be registered after FSM middleware
+    (state is taken from it) and after authorization, everything else is passed to routers.
+    """
+    def __init__(self, table: FastRouteTable = None):
+        self.table = table or get_fast_route_table()
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        callback = event.callback_query
+        route = self.table.resolve(data.get("raw_state"), callback.data) if callback and callback.data else None
+        if route is not None:
+            passed, kwargs = await route.check(callback, **data, event_update=event)
+            if passed:
+                fast_routes_counter.inc(result="resolved")
+                return await route.handle(callback, **kwargs, handler=route)
+        if callback:
+            fast_routes_counter.inc(result="passed")
+        return await handler(event, data)
+
+
+fast_route_table = FastRouteTable()
+
+
+def get_fast_route_table():
+    """Returns a fast_route_table global instance."""
+    return fast_route_table
+
+
+def fast_route(
+    router: Router,
+    *routes: Union[str, CallbackCodecFilter],
+    state: Union[None, State, Sequence[State]] = None,
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Register callback handler in the router and in the global route table, e.g.:
+        @fast_route(client_router, ClientConstants.CANCEL, state=Client.master)
+    :param router: Router.
+    :param routes: Callback data constants and codec filters.
+    :param state: State, several states or None for any state.
+    :return: Decorator.
+    """
+    return get_fast_route_table().route(router, *routes, state=state)
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Optional, Tuple
+
+from aiogram.types import CallbackQuery
+
+from npb.config import Config
+from npb.metrics import get_metrics_registry
+
+duplicates_counter = get_metrics_registry().counter(
+    "npb_tg_callback_duplicates_total", "Repeated callbacks (e.g. double taps) answered without handling."
+)
+
+CallbackKey = Tuple[int, int, str]
+
+
+class CallbackDeduplicator:
+    """
+    Short window idempotency of callbacks. Each tap of a button is a separate update with its own update_id, so a
+    double tap is recognized by (chat id, message id, callback data): a callback seen within the window is a
+    duplicate, it is answered at once and is not handled (no state, DB or Bot API work).
+    Taps are remembered in process memory, so duplicates are caught if they are delivered to the same worker.
+    """
+    def __init__(self, window: float, max_size: int):
+        self._window = window
+        self._max_size = max_size
+        self._seen: OrderedDict[CallbackKey, float] = OrderedDict()
+
+    @staticmethod
+    def key(callback: CallbackQuery) -> Optional[CallbackKey]:
+        if callback.message is None or callback.data is None:
+            return None
+        return callback.message.chat.id, callback.message.message_id, callback.data
+
+    def _expire(self, now: float) -> None:
+        # taps are kept in order of arrival, so expired ones are at the beginning
+        while self._seen:
+            oldest = next(iter(self._seen.values()))
+            if now - oldest < self._window and len(self._seen) < self._max_size:
+                return
+            self._seen.popitem(last=False)
+
+    def claim(self, callback: CallbackQuery) -> bool:
+        """
+        Register a tap.
+        :param callback: Callback.
+        :return: True if callback must be handled, False if it is a duplicate.
+        """
+        key = self.key(callback)
+        if key is None:
+            return True
+        now = monotonic()
+        self._expire(now)
+        if key in self._seen:
+            duplicates_counter.inc()
+            return False
+        self._seen[key] = now
+        return True
+
+    def release(self, callback: CallbackQuery) -> None:
+        """
+        Forget a tap, so that it can be repeated at once (e.g. its handling has failed).
+        :param callback: Callback.
+        """
+        if (key := self.key(callback)) is not None:
+            self._seen.pop(key, None)
+
+
+callback_deduplicator = CallbackDeduplicator(
+    window=Config.TG_CALLBACK_DEDUP_WINDOW, max_size=Config.TG_CALLBACK_DEDUP_SIZE
+)
+
+
+def get_callback_deduplicator():
+    """Returns a callback_deduplicator global instance."""
+    return callback_deduplicator
@@ -0,0 +1,75 @@
+import json
+from typing import Any, Dict, Optional
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from pydantic import ConfigDict
+
+
+class FrozenInlineKeyboardButton(InlineKeyboardButton):
+    model_config = ConfigDict(frozen=True)
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+
+
+# aiogram defers building of model schemas, they are needed at once to dump keyboards built with model_construct
+FrozenInlineKeyboardButton.model_rebuild()
+FrozenInlineKeyboardMarkup.model_rebuild()
+
+
+class KeyboardRegistry:
+    """
+    Static keyboards built once. They are frozen (rows are tuples), so they can be shared between responses, and
+    serialized once, so that requests carrying them do not dump and encode the models again (see npb.tg.session).
+    """
+    def __init__(self):
+        self._keyboards: Dict[str, FrozenInlineKeyboardMarkup] = {}
+        self._dumped: Dict[int, Dict[str, Any]] = {}
+        self._serialized: Dict[int, str] = {}
+
+    def register(self, name: str, keyboard: InlineKeyboardMarkup) -> FrozenInlineKeyboardMarkup:
+        """
+        Freeze and serialize a static keyboard.
+        :param name: Keyboard name.
+        :param keyboard: Keyboard.
+        :return: Frozen keyboard.
+        """
+        dumped = keyboard.model_dump(exclude_none=True)
+        rows = tuple(
+            tuple(FrozenInlineKeyboardButton.model_construct(**button) for button in row)
+            for row in dumped["inline_keyboard"]
+        )
+        frozen = FrozenInlineKeyboardMarkup.model_construct(**{**dumped, "inline_keyboard": rows})
+        self._keyboards[name] = frozen
+        # registered keyboards live as long as the registry, so their ids are never reused
+        self._dumped[id(frozen)] = dumped
+        self._serialized[id(frozen)] = json.dumps(dumped)
+        return frozen
+
+    def get(self, name: str) -> FrozenInlineKeyboardMarkup:
+        return self._keyboards[name]
+
+    def dumped(self, keyboard: Any) -> Optional[Dict[str, Any]]:
+        """
+        Get prepared dict of a registered keyboard.
+        :param keyboard: Any reply markup.
+        :return: Dict or None if keyboard is not registered.
+        """
+        return self._dumped.get(id(keyboard))
+
+    def serialized(self, keyboard: Any) -> Optional[str]:
+        """
+        Get prepared JSON of a registered keyboard.
+        :param keyboard: Any reply markup.
+        :return: JSON or None if keyboard is not registered.
+        """
+        return self._serialized.get(id(keyboard))
+
+
+keyboard_registry = KeyboardRegistry()
+
+
+def get_keyboard_registry():
+    """Returns a keyboard_registry global instance."""
+    return keyboard_registry
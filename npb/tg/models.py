@@ -41,8 +41,10 @@ class UserModel(BaseModel):
     non_recogn_ts: Optional[python_datetime] = Field(default=None, description="Non recognized phrases last timestamp.")
     ban_counter: Optional[int] = Field(default=None, description="Ban counter.")
     ban_ts: [python_datetime] = Field(default=None, description="Ban last timestamp.")
+    profile_version: int = Field(default=0, description="Profile card fields version.")
     fill_reg_form: bool = Field(default=False, description="Is registration form filled up")
-    current_calendar: Optional[dict] = Field(default={}, description="Current calendar state.")
+    current_calendar_mask: int = Field(
+        default=CommonConstants.TEMPORARY_DATA["current_calendar_mask"], description="Days picked in master's calendar.")
     current_day: Optional[int] = Field(
         default=CommonConstants.TEMPORARY_DATA["current_day"], description="Current picked day.")
     current_month: Optional[int] = Field(
@@ -80,3 +82,12 @@ class AppointmentModel(BaseModel):
 
 class AppointmentList(BaseModel):
     appointment_list: List[AppointmentModel] = Field(default=None, description="Appointments list")
+
+
+class OutboxMessageModel(BaseModel):
+    """
+    Outbox message model (a notification that is sent after the change that caused it is committed).
+    """
+    chat_id: str = Field(description="Telegram chat id.")
+    text: str = Field(description="Message text.")
+    parse_mode: Optional[str] = Field(default="Markdown", description="Message parse mode.")
@@ -0,0 +1,114 @@
+import asyncio
+from logging import Logger
+
+from aiogram.methods import SendMessage
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from npb.config import Config
+from npb.db.api import DeadLetter, Outbox
+from npb.db.core import engine
+from npb.exceptions import ChatUnreachable, DeliveryFailed
+from npb.leader import get_leader_elector
+from npb.logger import get_logger
+from npb.metrics import get_metrics_registry
+from npb.tg.delivery import get_delivery_pipeline
+
+outbox_messages_counter = get_metrics_registry().counter(
+    "npb_outbox_messages_total", "Outbox messages by dispatch outcome.", ["status"]
+)
+
+
+class OutboxDispatcher:
+    """
+    Drains 'outbox' table: messages are claimed in batches (Config.OUTBOX_BATCH_SIZE) with 'FOR UPDATE SKIP LOCKED'
+    and a lease (Config.OUTBOX_LEASE), sent through the delivery pipeline and deleted. Only the leader (see npb.leader)
+    dispatches, so the bot-wide send rate is the one of a single delivery pipeline (Config.TG_GLOBAL_RATE). Messages of
+    a leader that died in the middle of a batch are sent by the next one once their lease expires.
+    Sending a message (with its retries) is cut off after Config.OUTBOX_DISPATCH_TIMEOUT, so a lease never expires
+    while the message is still being sent (it would be sent twice) and a message left unsent is claimed again.
+    """
+    def __init__(self, engine: AsyncEngine, logger: Logger):
+        if Config.OUTBOX_DISPATCH_TIMEOUT >= Config.OUTBOX_LEASE:
+            raise ValueError(
+                f"OUTBOX_DISPATCH_TIMEOUT ({Config.OUTBOX_DISPATCH_TIMEOUT}) must be less than OUTBOX_LEASE "
+                f"({Config.OUTBOX_LEASE}), otherwise claimed messages can be sent twice."
+            )
+        self._engine = engine
+        self._logger = logger
+
+    async def run(self) -> None:
+        leader_elector = get_leader_elector()
+        while True:
+            if not leader_elector.is_leader:
+                await asyncio.sleep(Config.OUTBOX_POLL_INTERVAL)
+                continue
+            try:
+                dispatched = await self.dispatch_batch()
+            except Exception as exc:
+                self._logger.error(f"Unexpected error in outbox dispatcher: {exc}.")
+                dispatched = 0
+            if dispatched < Config.OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(Config.OUTBOX_POLL_INTERVAL)
+
+    async def dispatch_batch(self) -> int:
+        """
+        Claim and send a batch of outbox messages.
+        :return: Number of claimed messages.
+        """
+        outbox = Outbox(engine=self._engine, logger=self._logger)
+        messages = await outbox.claim_messages(limit=Config.OUTBOX_BATCH_SIZE, lease=Config.OUTBOX_LEASE)
+        if not messages:
+            return 0
+        # messages are sent concurrently, so the timeout bounds the whole batch and it is done within the lease
+        timeout = Config.OUTBOX_DISPATCH_TIMEOUT
+        results = await asyncio.gather(
+            *(asyncio.wait_for(self._dispatch(message), timeout=timeout) for message in messages),
+            return_exceptions=True,
+        )
+        dispatched_ids = []
+        for message, result in zip(messages, results):
+            if isinstance(result, asyncio.TimeoutError):
+                # e.g. flood control: message stays in outbox and is claimed again when its lease expires
+                outbox_messages_counter.inc(status="timeout")
+                self._logger.error(f"Outbox message {message.id} is not sent in {Config.OUTBOX_DISPATCH_TIMEOUT}s.")
+            elif isinstance(result, Exception):
+                # message stays in outbox and is claimed again when its lease expires
+                outbox_messages_counter.inc(status="retry")
+                self._logger.error(f"Could not dispatch outbox message {message.id}: {result}.")
+            else:
+                dispatched_ids.append(message.id)
+        await outbox.delete_messages(ids=dispatched_ids)
+        return len(messages)
+
+    async def _dispatch(self, message: Row) -> None:
+        method = SendMessage(chat_id=message.chat_id, text=message.text, parse_mode=message.parse_mode)
+        if message.attempts > Config.OUTBOX_MAX_ATTEMPTS:
+            # dispatcher died while sending this message several times in a row, do not try it again
+            outbox_messages_counter.inc(status="dead_letter")
+            await DeadLetter(engine=self._engine, logger=self._logger).create_dead_letter(
+                chat_id=message.chat_id,
+                method=method.__api_method__,
+                payload=method.model_dump(mode="json", exclude_none=True),
+                error="Outbox dispatch attempts exceeded.",
+                attempts=message.attempts,
+            )
+            return
+        try:
+            await get_delivery_pipeline().deliver(method)
+        except ChatUnreachable:
+            outbox_messages_counter.inc(status="unreachable")
+            return
+        except DeliveryFailed:
+            # delivery pipeline has already moved the message to dead letters
+            outbox_messages_counter.inc(status="failed")
+            return
+        outbox_messages_counter.inc(status="sent")
+
+
+outbox_dispatcher = OutboxDispatcher(engine=engine, logger=get_logger())
+
+
+def get_outbox_dispatcher():
+    """Returns an outbox_dispatcher global instance."""
+    return outbox_dispatcher
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from npb.config import Config
+from npb.metrics import get_metrics_registry
+
+profile_cards_counter = get_metrics_registry().counter(
+    "npb_profile_cards_total", "Profile card renders by outcome: served from cache or rendered.", ["result"]
+)
+
+# columns shown in a profile card (or deciding whether it is shown), updating any of them bumps profile_version
+PROFILE_CARD_FIELDS = frozenset(
+    ("name", "services", "phone_number", "instagram_link", "description", "telegram_profile", "is_master")
+)
+
+
+class ProfileCardCache:
+    """
+    Rendered profile cards (markdown text shown to clients) keyed by (telegram id, profile version). Callers always
+    ask for the current version read from DB, so a card rendered for an older version (e.g. before the profile was
+    updated by another worker) is never served.
+    """
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._cards: OrderedDict[str, Tuple[int, str]] = OrderedDict()
+
+    def get(self, telegram_id: str, version: int) -> Optional[str]:
+        """
+        Get rendered card.
+        :param telegram_id: Telegram id.
+        :param version: Current profile version.
+        :return: Card or None if it must be rendered.
+        """
+        cached = self._cards.get(telegram_id)
+        if cached is None or cached[0] != version:
+            return None
+        self._cards.move_to_end(telegram_id)
+        profile_cards_counter.inc(result="cached")
+        return cached[1]
+
+    def put(self, telegram_id: str, version: int, card: str) -> None:
+        profile_cards_counter.inc(result="rendered")
+        self._cards[telegram_id] = (version, card)
+        self._cards.move_to_end(telegram_id)
+        if len(self._cards) > self._max_size:
+            self._cards.popitem(last=False)
+
+    def invalidate(self, telegram_id: str) -> None:
+        self._cards.pop(telegram_id, None)
+
+
+profile_card_cache = ProfileCardCache(max_size=Config.PROFILE_CARD_CACHE_SIZE)
+
+
+def get_profile_card_cache():
+    """Returns a profile_card_cache global instance."""
+    return profile_card_cache
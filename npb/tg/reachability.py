@@ -0,0 +1,68 @@
+from logging import Logger
+from time import monotonic
+from typing import Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from npb.config import Config
+from npb.db.api import UnreachableChat
+from npb.db.core import engine
+from npb.logger import get_logger
+
+
+class ReachabilityManager:
+    """
+    Keeps track of chats the bot can not message (e.g. user has blocked the bot). Chats are stored in
+    'unreachable_chat' table and cached in memory, the cache is reloaded every Config.TG_UNREACHABLE_REFRESH_INTERVAL,
+    so that chats marked / cleared by other processes are picked up.
+    """
+    def __init__(self, engine: AsyncEngine, logger: Logger):
+        self._engine = engine
+        self._logger = logger
+        self._unreachable: Set[str] = set()
+        self._loaded_at: Optional[float] = None
+
+    async def is_unreachable(self, chat_id: str) -> bool:
+        """
+        Check whether chat is unreachable.
+        :param chat_id: Telegram chat id.
+        :return: True if chat is unreachable and False otherwise.
+        """
+        if self._loaded_at is None or monotonic() - self._loaded_at >= Config.TG_UNREACHABLE_REFRESH_INTERVAL:
+            # set before reloading, so that concurrent sends do not reload it too
+            self._loaded_at = monotonic()
+            try:
+                chats = await UnreachableChat(engine=self._engine, logger=self._logger).read_unreachable_chats()
+                self._unreachable = {chat.chat_id for chat in chats}
+            except Exception as exc:
+                self._logger.error(f"Could not load unreachable chats: {exc}.")
+        return chat_id in self._unreachable
+
+    async def mark_unreachable(self, chat_id: str, reason: str) -> None:
+        """
+        Mark chat as unreachable.
+        :param chat_id: Telegram chat id.
+        :param reason: Why the chat is unreachable.
+        """
+        self._unreachable.add(chat_id)
+        self._logger.info(f"Chat {chat_id} is unreachable: {reason}.")
+        await UnreachableChat(engine=self._engine, logger=self._logger).mark_unreachable(
+            chat_id=chat_id, reason=reason
+        )
+
+    async def mark_reachable(self, chat_id: str) -> None:
+        """
+        Mark chat as reachable again (e.g. user has sent /start).
+        :param chat_id: Telegram chat id.
+        """
+        self._unreachable.discard(chat_id)
+        if await UnreachableChat(engine=self._engine, logger=self._logger).mark_reachable(chat_id=chat_id):
+            self._logger.info(f"Chat {chat_id} is reachable again.")
+
+
+reachability_manager = ReachabilityManager(engine=engine, logger=get_logger())
+
+
+def get_reachability_manager():
+    """Returns a reachability_manager global instance."""
+    return reachability_manager
@@ -0,0 +1,166 @@
+import asyncio
+from time import monotonic
+from typing import Any, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramServerError
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import FormData
+
+from npb.config import Config
+from npb.metrics import get_metrics_registry
+from npb.tg.keyboards import get_keyboard_registry
+from npb.tg.view_cache import RenderedViewMiddleware
+
+request_latency_histogram = get_metrics_registry().histogram(
+    "npb_tg_api_request_duration_seconds", "Bot API request latency by method.", ["method"]
+)
+request_errors_counter = get_metrics_registry().counter(
+    "npb_tg_api_request_errors_total", "Failed Bot API requests by method and error.", ["method", "error"]
+)
+circuit_open_gauge = get_metrics_registry().gauge(
+    "npb_tg_api_circuit_open", "1 if Bot API requests are failed fast by circuit breaker, 0 otherwise."
+)
+# token of a request let through by a closed circuit breaker
+REGULAR_REQUEST = object()
+
+
+class CircuitBreaker:
+    """
+    Opens after 'failure_threshold' consecutive failures: while open, requests are failed fast. After 'reset_timeout'
+    seconds one trial request is let through, its success closes the breaker, its failure opens it again.
+    """
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial: Optional[object] = None  # token of the trial request in flight
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow_request(self) -> Optional[object]:
+        """
+        Check whether a request can be made.
+        :return: None if request must be failed fast, otherwise request token (a trial request gets its own one).
+        """
+        if self._opened_at is None:
+            return REGULAR_REQUEST
+        if self._trial is None and monotonic() - self._opened_at >= self._reset_timeout:
+            self._trial = object()
+            return self._trial
+        return None
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._trial = None
+        circuit_open_gauge.set(0)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial = None
+        if self._failures >= self._failure_threshold:
+            self._opened_at = monotonic()
+            circuit_open_gauge.set(1)
+
+    def cancel_trial(self, token: object) -> None:
+        """
+        Request was cancelled (its outcome is unknown): if it was the trial one, the trial is given to the next request.
+        :param token: Token of the cancelled request (see 'allow_request').
+        """
+        if token is self._trial:
+            self._trial = None
+
+
+class NPBAiohttpSession(AiohttpSession):
+    """
+    Aiohttp session with bounded keep-alive connection pool, per-method timeouts, circuit breaker and latency / error
+    metrics for every Bot API request.
+    """
+    def __init__(
+        self,
+        api: TelegramAPIServer = PRODUCTION,
+        timeout: float = Config.TG_SESSION_TIMEOUT,
+        limit: int = Config.TG_SESSION_LIMIT,
+        keepalive_timeout: float = Config.TG_SESSION_KEEPALIVE,
+        method_timeouts: Dict[str, float] = None,
+        circuit_breaker: CircuitBreaker = None,
+        **kwargs: Any,
+    ):
+        super().__init__(api=api, timeout=timeout, **kwargs)
+        self._connector_init.update({"limit": limit, "keepalive_timeout": keepalive_timeout})
+        self._method_timeouts = Config.TG_METHOD_TIMEOUTS if method_timeouts is None else method_timeouts
+        self._circuit_breaker = circuit_breaker or CircuitBreaker(
+            failure_threshold=Config.TG_CIRCUIT_FAILURE_THRESHOLD, reset_timeout=Config.TG_CIRCUIT_RESET_TIMEOUT
+        )
+
+    def build_form_data(self, bot: Bot, method: TelegramMethod[TelegramType]) -> FormData:
+        serialized_keyboard = get_keyboard_registry().serialized(getattr(method, "reply_markup", None))
+        if serialized_keyboard is None:
+            return super().build_form_data(bot=bot, method=method)
+        # static keyboard: send its prepared JSON instead of dumping and encoding the models again
+        form = FormData(quote_fields=False)
+        files = {}
+        for key, value in method.model_dump(warnings=False, exclude={"reply_markup"}).items():
+            value = self.prepare_value(value, bot=bot, files=files)
+            if not value:
+                continue
+            form.add_field(key, value)
+        form.add_field("reply_markup", serialized_keyboard)
+        for key, value in files.items():
+            form.add_field(key, value.read(bot), filename=value.filename or key)
+        return form
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: Optional[int] = None
+    ) -> TelegramType:
+        api_method = method.__api_method__
+        token = self._circuit_breaker.allow_request()
+        if token is None:
+            request_errors_counter.inc(method=api_method, error="circuit_open")
+            raise TelegramNetworkError(method=method, message="Bot API is unavailable (circuit breaker is open)")
+        if timeout is None:
+            timeout = self._method_timeouts.get(api_method)
+        start = monotonic()
+        try:
+            result = await super().make_request(bot=bot, method=method, timeout=timeout)
+        except (TelegramNetworkError, TelegramServerError) as exc:
+            # Bot API is (or the way to it is) degraded
+            self._circuit_breaker.record_failure()
+            request_errors_counter.inc(method=api_method, error=type(exc).__name__)
+            raise
+        except TelegramAPIError as exc:
+            # Bot API has answered, request itself is wrong (bad request, blocked chat, flood control etc.)
+            self._circuit_breaker.record_success()
+            request_errors_counter.inc(method=api_method, error=type(exc).__name__)
+            raise
+        except asyncio.CancelledError:
+            # e.g. webhook request is cancelled: a trial request must not keep the breaker open forever
+            self._circuit_breaker.cancel_trial(token=token)
+            raise
+        except Exception as exc:
+            # unexpected response (or error while checking it)
+            self._circuit_breaker.record_failure()
+            request_errors_counter.inc(method=api_method, error=type(exc).__name__)
+            raise
+        finally:
+            request_latency_histogram.observe(monotonic() - start, method=api_method)
+        self._circuit_breaker.record_success()
+        return result
+
+
+def create_bot_session() -> NPBAiohttpSession:
+    """
+    Create bot session, Config.TG_API_BASE allows to point the bot to a local Bot API server (or a fake one).
+    :return: Bot session.
+    """
+    api = TelegramAPIServer.from_base(Config.TG_API_BASE) if Config.TG_API_BASE else PRODUCTION
+    session = NPBAiohttpSession(api=api)
+    session.middleware(RenderedViewMiddleware())
+    return session
@@ -2,11 +2,11 @@ from typing import Any, Dict, Optional
 
 from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
 
-from npb.db.api import User
+from npb.db.api import UserSession
 from npb.db.core import engine
 from npb.db.utils import WhereClause
 from npb.logger import get_logger
-from npb.db.sa_models import user_table
+from npb.db.sa_models import user_session_table
 
 
 class NPBStateMachineStorage(BaseStorage):
@@ -23,12 +23,12 @@ class NPBStateMachineStorage(BaseStorage):
         logger = get_logger()
         telegram_id = str(key.chat_id)
         where_clause = WhereClause(
-            params=[user_table.c.telegram_id],
+            params=[user_session_table.c.telegram_id],
             values=[telegram_id],
             comparison_operators=["=="]
         )
         data_to_set = {"state": state.state}
-        res = await User(engine=engine, logger=logger).update_user_info(
+        res = await UserSession(engine=engine, logger=logger).update_session_info(
             where_clause=where_clause,
             data_to_set=data_to_set
         )
@@ -42,14 +42,7 @@ class NPBStateMachineStorage(BaseStorage):
         :return: current state
         """
         logger = get_logger()
-        if user := await User(engine=engine, logger=logger).read_single_user_info(
-            tg_user_id=str(key.chat_id)
-        ):
-            # print("DEBUG get_state, user.state: ", user.state)
-            # print("DEBUG get_state, user: ", user)
-            return user.state
-        else:
-            return None
+        return await UserSession(engine=engine, logger=logger).read_state(tg_user_id=str(key.chat_id))
 
     async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
         """
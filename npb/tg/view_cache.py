@@ -0,0 +1,116 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import AnswerCallbackQuery, EditMessageText, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup
+
+from npb.config import Config
+from npb.metrics import get_metrics_registry
+
+edits_counter = get_metrics_registry().counter(
+    "npb_tg_edits_total", "Message edits by outcome: sent or skipped as not modified.", ["status"]
+)
+
+
+class RenderedViewCache:
+    """
+    Remembers a fingerprint of the last text and keyboard rendered into a message (per chat and message id), so that
+    an edit which would not change anything is not sent at all (Telegram would answer "message is not modified").
+    """
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._fingerprints: OrderedDict[Tuple[int, int], str] = OrderedDict()
+
+    @staticmethod
+    def fingerprint(text: str, reply_markup: Optional[InlineKeyboardMarkup], parse_mode: Optional[str]) -> str:
+        """
+        Hash of a rendered view.
+        :param text: Message text.
+        :param reply_markup: Inline keyboard.
+        :param parse_mode: Parse mode.
+        :return: Fingerprint.
+        """
+        markup = reply_markup.model_dump_json(exclude_none=True, warnings=False) if reply_markup else ""
+        view = f"{parse_mode}\x00{text}\x00{markup}"
+        return hashlib.blake2b(view.encode(), digest_size=16).hexdigest()
+
+    def is_rendered(self, chat_id: int, message_id: int, fingerprint: str) -> bool:
+        return self._fingerprints.get((chat_id, message_id)) == fingerprint
+
+    def remember(self, chat_id: int, message_id: int, fingerprint: str) -> None:
+        key = (chat_id, message_id)
+        self._fingerprints[key] = fingerprint
+        self._fingerprints.move_to_end(key)
+        if len(self._fingerprints) > self._max_size:
+            self._fingerprints.popitem(last=False)
+
+    def forget(self, chat_id: int, message_id: int) -> None:
+        self._fingerprints.pop((chat_id, message_id), None)
+
+
+rendered_view_cache = RenderedViewCache(max_size=Config.TG_VIEW_CACHE_SIZE)
+
+
+def get_rendered_view_cache():
+    """Returns a rendered_view_cache global instance."""
+    return rendered_view_cache
+
+
+class RenderedViewMiddleware(BaseRequestMiddleware):
+    """
+    Remembers a view once Bot API has accepted the edit that renders it. Edits passed back to Telegram in a webhook
+    response do not go through the session, their outcome is unknown, so they are not remembered.
+    """
+    async def __call__(
+        self, make_request: NextRequestMiddlewareType[TelegramType], bot: Bot, method: TelegramMethod[TelegramType]
+    ) -> TelegramType:
+        result = await make_request(bot, method)
+        if isinstance(method, EditMessageText) and method.chat_id is not None and method.message_id is not None:
+            cache = get_rendered_view_cache()
+            fingerprint = cache.fingerprint(
+                text=method.text, reply_markup=method.reply_markup, parse_mode=method.parse_mode
+            )
+            cache.remember(method.chat_id, method.message_id, fingerprint)
+        return result
+
+
+def edit_or_answer(
+    callback: CallbackQuery,
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    parse_mode: Optional[str] = None,
+) -> AnswerCallbackQuery | EditMessageText:
+    """
+    Edit the message the callback came from, or just answer the callback if the message already shows the same view.
+    Returned Bot API method can be awaited or returned from a handler.
+    :param callback: Callback.
+    :param text: Message text.
+    :param reply_markup: Inline keyboard.
+    :param parse_mode: Parse mode.
+    :return: Bot API method.
+    """
+    cache = get_rendered_view_cache()
+    chat_id, message_id = callback.message.chat.id, callback.message.message_id
+    fingerprint = cache.fingerprint(text=text, reply_markup=reply_markup, parse_mode=parse_mode)
+    # the keyboard in the update is what the user actually sees: it also guards against views rendered by another worker
+    shown_keyboard = callback.message.reply_markup
+    if cache.is_rendered(chat_id, message_id, fingerprint) and _same_keyboard(shown_keyboard, reply_markup):
+        edits_counter.inc(status="skipped")
+        return callback.answer()
+    # the view is remembered by RenderedViewMiddleware once the edit is delivered
+    edits_counter.inc(status="sent")
+    return callback.message.edit_text(text=text, reply_markup=reply_markup, parse_mode=parse_mode)
+
+
+def _same_keyboard(shown: Optional[InlineKeyboardMarkup], rendered: Optional[InlineKeyboardMarkup]) -> bool:
+    if shown is None or rendered is None:
+        return shown is rendered
+    # json mode: rows of frozen keyboards are tuples, rows of received ones are lists
+    return (
+        shown.model_dump(mode="json", exclude_none=True, warnings=False) ==
+        rendered.model_dump(mode="json", exclude_none=True, warnings=False)
+    )
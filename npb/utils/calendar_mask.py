@@ -0,0 +1,66 @@
+import calendar
+from functools import lru_cache
+from typing import List
+
+# days picked in a month are stored as a bitmask: bit (day - 1) is set if the day is picked, 31 bits at most
+
+
+def day_bit(day: int) -> int:
+    return 1 << (day - 1)
+
+
+def toggle_day(mask: int, day: int) -> int:
+    """
+    Pick a day or unpick it if it is already picked.
+    :param mask: Picked days.
+    :param day: Day of month.
+    :return: Picked days.
+    """
+    return mask ^ day_bit(day)
+
+
+def mask_days(mask: int) -> List[int]:
+    """
+    Picked days in ascending order.
+    :param mask: Picked days.
+    :return: Days of month.
+    """
+    return [day for day in range(1, mask.bit_length() + 1) if mask & day_bit(day)]
+
+
+@lru_cache(maxsize=512)
+def month_mask(year: int, month: int, first_day: int = 1) -> int:
+    """
+    All days of a month.
+    :param year: Year.
+    :param month: Month.
+    :param first_day: Days before this one are not included (e.g. past days).
+    :return: Days mask.
+    """
+    _, days_in_month = calendar.monthrange(year, month)
+    return sum(day_bit(day) for day in range(max(first_day, 1), days_in_month + 1))
+
+
+@lru_cache(maxsize=512)
+def weekdays_mask(year: int, month: int, first_day: int = 1) -> int:
+    """
+    Days of a month from Monday to Friday.
+    :param year: Year.
+    :param month: Month.
+    :param first_day: Days before this one are not included (e.g. past days).
+    :return: Days mask.
+    """
+    return sum(
+        day_bit(day) for day in mask_days(month_mask(year, month, first_day)) if calendar.weekday(year, month, day) < 5
+    )
+
+
+def weekend_mask(year: int, month: int, first_day: int = 1) -> int:
+    """
+    Saturdays and Sundays of a month.
+    :param year: Year.
+    :param month: Month.
+    :param first_day: Days before this one are not included (e.g. past days).
+    :return: Days mask.
+    """
+    return month_mask(year, month, first_day) & ~weekdays_mask(year, month, first_day)
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta, timezone
 from logging import Logger
-from typing import Any, Dict, Iterable, List, Literal, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, List, Literal, Optional, Sequence, Tuple, Union
 import operator
 from uuid import UUID
 
@@ -11,11 +11,11 @@ from aiogram.types import (
     InlineKeyboardMarkup,
     Message,
 )
-from sqlalchemy import Column, func, Row
+from sqlalchemy import Column, Row
 from sqlalchemy.ext.asyncio import AsyncEngine
 
 from npb.config import CommonConstants, Config, RegistrationConstants
-from npb.db.api import Appointment, User
+from npb.db.api import Appointment, Outbox, User
 from npb.db.sa_models import appointment_table, user_table
 from npb.db.utils import WhereClause
 from npb.exceptions import UserNotFound, UserParamNotFound, NoTelegramUpdateObject
@@ -23,7 +23,10 @@ from npb.logger import get_logger
 from npb.config import MasterConstants
 from npb.exceptions import CalendarError
 from npb.text.registration_form import bp
-from npb.tg.bot import bot
+from npb.tg.models import OutboxMessageModel
+from npb.tg.profile_cards import get_profile_card_cache
+from npb.tg.delivery import get_delivery_pipeline
+from npb.tg.keyboards import get_keyboard_registry
 from npb.exceptions import CouldNotNotify
 
 
@@ -88,6 +91,11 @@ def _prepare_user_info(user: Row, for_master: bool = False) -> str:
     :param for_master: Информация для показа мастеру или клиенту.
     :return: Информация о пользователе.
     """
+    profile_version = getattr(user, "profile_version", None)
+    # only masters' cards are cached (clients see them when picking a master)
+    cacheable = not for_master and profile_version is not None and user.is_master
+    if cacheable and (card := get_profile_card_cache().get(telegram_id=user.telegram_id, version=profile_version)):
+        return card
     text = ""
     #  hint: param = (parameter name, parameter value, escape markdown)
     if for_master:
@@ -117,6 +125,8 @@ def _prepare_user_info(user: Row, for_master: bool = False) -> str:
                 text += param[0] % escape_markdown(param[1])
             else:
                 text += param[0] % param[1]
+    if cacheable:
+        get_profile_card_cache().put(telegram_id=user.telegram_id, version=profile_version, card=text)
     return text
 
 
@@ -135,14 +145,21 @@ async def master_profile_info(
     :param short: Master short info is requested (info in one line).
     :return: Description as string.
     """
-    user = user or await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
-    if user and user.is_master:
+    text = None
+    if user is None:
+        # the card of the current profile version is served without reading the whole profile
+        profile = await User(engine=engine, logger=logger).read_profile_version(tg_user_id=telegram_id)
+        if not profile or not profile.is_master:
+            raise UserNotFound(f"User {telegram_id} not found or user is not master.")
+        text = get_profile_card_cache().get(telegram_id=telegram_id, version=profile.profile_version)
+    if text is None:
+        user = user or await User(engine=engine, logger=logger).read_single_user_info(tg_user_id=telegram_id)
+        if not user or not user.is_master:
+            raise UserNotFound(f"User {telegram_id} not found or user is not master.")
         text = _prepare_user_info(user=user)
-        if not text.strip():
-            text = "Кажется у меня нет информации о Вашем профиле. Пожалуйста, заполните ваш профиль: /commands ."
-        return text
-    else:
-        raise UserNotFound(f"User {telegram_id} not found or user is not master.")
+    if not text.strip():
+        text = "Кажется у меня нет информации о Вашем профиле. Пожалуйста, заполните ваш профиль: /commands ."
+    return text
 
 
 def appointment_info(
@@ -188,18 +205,29 @@ def pick_sub_service_keyboard(
     return keyboard
 
 
+EDIT_PROFILE_KEYBOARD = get_keyboard_registry().register(
+    name="edit_profile",
+    keyboard=InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="Изменить имя", callback_data=CommonConstants.EDIT_NAME)],
+            [InlineKeyboardButton(text="Изменить услуги", callback_data=CommonConstants.EDIT_SERVICE)],
+            [InlineKeyboardButton(text="Изменить номер телефона", callback_data=CommonConstants.EDIT_PHONE_NUMBER)],
+            [InlineKeyboardButton(text="Изменить instagram", callback_data=CommonConstants.EDIT_INSTAGRAM)],
+            [InlineKeyboardButton(text="Изменить описание", callback_data=CommonConstants.EDIT_DESCRIPTION)],
+            [
+                InlineKeyboardButton(
+                    text="Изменить telegram profile", callback_data=CommonConstants.EDIT_TELEGRAM_PROFILE
+                )
+            ],
+            [InlineKeyboardButton(text="Завершить", callback_data=CommonConstants.FINISH_FORM)],
+        ],
+        resize_keyboard=True,
+    ),
+)
+
+
 def edit_profile_keyboard() -> InlineKeyboardMarkup:
-    buttons = [
-        [InlineKeyboardButton(text="Изменить имя", callback_data=CommonConstants.EDIT_NAME)],
-        [InlineKeyboardButton(text="Изменить услуги", callback_data=CommonConstants.EDIT_SERVICE)],
-        [InlineKeyboardButton(text="Изменить номер телефона", callback_data=CommonConstants.EDIT_PHONE_NUMBER)],
-        [InlineKeyboardButton(text="Изменить instagram", callback_data=CommonConstants.EDIT_INSTAGRAM)],
-        [InlineKeyboardButton(text="Изменить описание", callback_data=CommonConstants.EDIT_DESCRIPTION)],
-        [InlineKeyboardButton(text="Изменить telegram profile", callback_data=CommonConstants.EDIT_TELEGRAM_PROFILE)],
-        [InlineKeyboardButton(text="Завершить", callback_data=CommonConstants.FINISH_FORM)],
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons, resize_keyboard=True)
-    return keyboard
+    return EDIT_PROFILE_KEYBOARD
 
 
 async def handle_start_edit_name(callback: CallbackQuery = None, message: Message = None) -> None:
@@ -261,23 +289,75 @@ def get_month(action_type: str, current_month: int, current_year: int) -> Tuple[
 
 
 def get_month_edges(now: datetime = None, month: int = None, year: int = None) -> Tuple[datetime, datetime]:
+    """
+    Get beginning of a given month and beginning of the next one. Edges are taken in the app time zone
+    (Config.TZ_OFFSET) - the one appointment partitions are cut in (see npb.db.partitions), so that a month range
+    is pruned to a single partition.
+    :param now: Moment within the month (takes precedence over month and year).
+    :param month: Month.
+    :param year: Year.
+    :return: Beginning of the month, beginning of the next month.
+    """
+    tz = timezone(timedelta(hours=Config.TZ_OFFSET))
     if now:
-        beginning_of_current_month = datetime(now.year, now.month, 1)
+        now = now.astimezone(tz)
+        beginning_of_current_month = datetime(now.year, now.month, 1, tzinfo=tz)
+    else:
+        beginning_of_current_month = datetime(year, month, 1, tzinfo=tz)
+    if beginning_of_current_month.month == 12:
+        beginning_of_next_month = beginning_of_current_month.replace(year=beginning_of_current_month.year + 1, month=1)
     else:
-        beginning_of_current_month = datetime(year, month, 1)
-    beginning_of_next_month = beginning_of_current_month.replace(month=beginning_of_current_month.month + 1, day=1)
+        beginning_of_next_month = beginning_of_current_month.replace(month=beginning_of_current_month.month + 1)
     return beginning_of_current_month, beginning_of_next_month
 
 
+def get_day_edges(day: int, month: int, year: int) -> Tuple[datetime, datetime]:
+    """
+    Get beginning of a given day and beginning of the next one (in the app time zone, see get_month_edges). Filtering
+    by this range (instead of extracting day/month/year from appointment datetime) lets Postgres use indexes and
+    prune appointment partitions.
+    :param day: Day.
+    :param month: Month.
+    :param year: Year.
+    :return: Beginning of the day, beginning of the next day.
+    """
+    beginning_of_day = datetime(year, month, day, tzinfo=timezone(timedelta(hours=Config.TZ_OFFSET)))
+    return beginning_of_day, beginning_of_day + timedelta(days=1)
+
+
+def master_month_where_clause(
+    master_telegram_id: str, month: int, year: int, is_reserved: bool = None
+) -> WhereClause:
+    """
+    Where clause for master's appointments in a given month.
+    :param master_telegram_id: Master telegram id.
+    :param month: Month.
+    :param year: Year.
+    :param is_reserved: Filter by reservation status (if specified).
+    :return: Where clause.
+    """
+    month_begin, month_end = get_month_edges(month=month, year=year)
+    where_clause = WhereClause(
+        params=[appointment_table.c.master_telegram_id, appointment_table.c.datetime, appointment_table.c.datetime],
+        values=[master_telegram_id, month_begin, month_end],
+        comparison_operators=["==", ">=", "<"],
+    )
+    if is_reserved is not None:
+        where_clause.params.append(appointment_table.c.is_reserved)
+        where_clause.values.append(is_reserved)
+        where_clause.comparison_operators.append("==")
+    return where_clause
+
+
 async def pick_appointment_keyboard(
     engine: AsyncEngine, logger: Logger, telegram_id: str, day: int, month: int, year: int
 ) -> Tuple[bool, InlineKeyboardMarkup]:
+    day_begin, day_end = get_day_edges(day=day, month=month, year=year)
     where_clause = WhereClause(
         filter=[
             appointment_table.c.master_telegram_id == telegram_id,
-            func.extract("day", appointment_table.c.datetime) == day,
-            func.extract("month", appointment_table.c.datetime) == month,
-            func.extract("year", appointment_table.c.datetime) == year,
+            appointment_table.c.datetime >= day_begin,
+            appointment_table.c.datetime < day_end,
         ]
     )
     appointments = await Appointment(engine=engine, logger=logger).read_appointment_info(where_clause=where_clause)
@@ -302,12 +382,12 @@ async def pick_appointment_keyboard(
 async def delete_appointment_keyboard(
     engine: AsyncEngine, logger: Logger, telegram_id: str, day: int, month: int, year: int
 ) -> Tuple[bool, InlineKeyboardMarkup]:
+    day_begin, day_end = get_day_edges(day=day, month=month, year=year)
     where_clause = WhereClause(
         filter=[
             appointment_table.c.master_telegram_id == telegram_id,
-            func.extract("day", appointment_table.c.datetime) == day,
-            func.extract("month", appointment_table.c.datetime) == month,
-            func.extract("year", appointment_table.c.datetime) == year,
+            appointment_table.c.datetime >= day_begin,
+            appointment_table.c.datetime < day_end,
         ]
     )
     appointments = await Appointment(engine=engine, logger=logger).read_appointment_info(where_clause=where_clause)
@@ -353,7 +433,7 @@ async def get_picked_services_and_sub_services(
 
 async def notify_user(text: str, telegram_id: str, logger: Logger):
     try:
-        await bot.send_message(
+        await get_delivery_pipeline().send_message(
             chat_id=telegram_id,
             text=text,
             parse_mode=ParseMode.MARKDOWN,
@@ -380,7 +460,24 @@ async def cancel_appointment_and_notify_user(user: Row, logger: Logger, for_mast
         "is_reserved": False,
         "client_telegram_id": None,
     }
-    canceled_appointment = await Appointment(engine=engine, logger=logger).update_appointment_info(
+    user_info = _prepare_user_info(user=user, for_master=for_master)
+
+    def make_notifications(canceled_appointment: Sequence[Row]) -> List[OutboxMessageModel]:
+        notification_text = appointment_info(
+            date_and_time=canceled_appointment[0].datetime,
+            user_info=user_info,
+            service=canceled_appointment[0].service,
+            for_master=for_master,
+        )
+        return [
+            OutboxMessageModel(
+                chat_id=telegram_id or str(canceled_appointment[0].master_telegram_id),
+                text="Вашу запись отменили\n" + notification_text,
+            )
+        ]
+
+    # the other party is notified by outbox dispatcher once cancellation is committed
+    await Appointment(engine=engine, logger=logger).update_appointment_info(
         data_to_set=data_to_set,
         where_clause=where_clause,
         returning_values=[
@@ -388,16 +485,7 @@ async def cancel_appointment_and_notify_user(user: Row, logger: Logger, for_mast
             appointment_table.c.master_telegram_id,
             appointment_table.c.service,
         ],
+        transaction_hooks=[Outbox.enqueue_hook(make_notifications)],
     )
-    telegram_id = telegram_id or str(canceled_appointment[0].master_telegram_id)
-    user_info = _prepare_user_info(user=user, for_master=for_master)
-    notification_text = appointment_info(
-        date_and_time=canceled_appointment[0].datetime,
-        user_info=user_info,
-        service=canceled_appointment[0].service,
-        for_master=for_master,
-    )
-    notification_text = "Вашу запись отменили\n" + notification_text
-    await notify_user(text=notification_text, telegram_id=telegram_id, logger=logger)
 
 
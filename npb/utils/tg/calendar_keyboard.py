@@ -0,0 +1,71 @@
+import calendar
+from functools import lru_cache
+from typing import Callable, Container, Dict, List, Tuple
+
+from aiogram.types import InlineKeyboardButton
+
+from npb.config import CommonConstants, MasterConstants
+
+# buttons are shared between rendered keyboards, so they must never be modified
+BLANK_DAY_BUTTON = InlineKeyboardButton(text=" ", callback_data=MasterConstants.CALENDAR_IGNORE)
+BACK_BUTTON = InlineKeyboardButton(text="⬅️", callback_data=MasterConstants.CALENDAR_BACK)
+FORWARD_BUTTON = InlineKeyboardButton(text="➡️", callback_data=MasterConstants.CALENDAR_FORWARD)
+
+
+@lru_cache(maxsize=120)
+def month_grid(year: int, month: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Weeks of a month (Monday first), days outside the month are zeros.
+    :param year: Year.
+    :param month: Month.
+    :return: Month grid.
+    """
+    return tuple(tuple(week) for week in calendar.monthcalendar(year=year, month=month))
+
+
+@lru_cache(maxsize=4096)
+def day_button(day: int, marker: str = "", selectable: bool = True, callback_data: str = None) -> InlineKeyboardButton:
+    """
+    Calendar day button.
+    :param day: Day of month.
+    :param marker: Availability marker shown before the day (e.g. 🟢 or 🟡).
+    :param selectable: If False, pressing the button is ignored.
+    :param callback_data: Callback data of a selectable day (day itself by default).
+    :return: Button.
+    """
+    if not selectable:
+        callback_data = MasterConstants.CALENDAR_IGNORE
+    return InlineKeyboardButton(text=f"{marker}{day}", callback_data=callback_data or str(day))
+
+
+def month_day_rows(
+    year: int,
+    month: int,
+    first_day: int = 1,
+    markers: Dict[int, str] = None,
+    selectable: Container[int] = None,
+    day_callback: Callable[[int], str] = None,
+) -> List[List[InlineKeyboardButton]]:
+    """
+    Week days header and day rows of a month calendar keyboard.
+    :param year: Year.
+    :param month: Month.
+    :param first_day: Days before this one are hidden (e.g. past days).
+    :param markers: Availability markers by day.
+    :param selectable: Days that can be pressed, all days if not specified.
+    :param day_callback: Builds callback data of a selectable day (day itself by default).
+    :return: Keyboard rows.
+    """
+    markers = markers or {}
+    rows = list(CommonConstants.WEEK_DAYS_AS_BUTTONS)
+    for week in month_grid(year, month):
+        row = []
+        for day in week:
+            if day == 0 or day < first_day:
+                row.append(BLANK_DAY_BUTTON)
+            elif selectable is None or day in selectable:
+                row.append(day_button(day, markers.get(day, ""), True, day_callback(day) if day_callback else None))
+            else:
+                row.append(day_button(day, markers.get(day, ""), False))
+        rows.append(row)
+    return rows
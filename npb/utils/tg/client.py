@@ -1,19 +1,18 @@
-import calendar
-from copy import copy
 from datetime import datetime, timedelta, timezone
 from logging import Logger
 from typing import Dict, List, Optional, Tuple
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-from sqlalchemy import func
-
 from npb.db.api import Appointment, User
 from npb.db.core import engine
 from npb.db.sa_models import appointment_table, user_table
 from npb.db.utils import WhereClause
 from npb.logger import get_logger
 from npb.config import ClientConstants, CommonConstants, MasterConstants, Config
-from npb.utils.common import get_month_edges
+from npb.tg.callbacks import BookingActions, BookingNavigation, get_booking_codec
+from npb.tg.keyboards import get_keyboard_registry
+from npb.utils.common import get_day_edges, get_month, get_month_edges
+from npb.utils.tg.calendar_keyboard import BACK_BUTTON, FORWARD_BUTTON, month_day_rows
 
 
 def pick_single_service_keyboard(
@@ -32,6 +31,39 @@ def pick_single_service_keyboard(
     return keyboard
 
 
+ALL_SERVICES_KEYBOARD = get_keyboard_registry().register(
+    name="all_services", keyboard=pick_single_service_keyboard(list(Config.MASTER_SERVICES.keys()))
+)
+
+
+def all_services_keyboard() -> InlineKeyboardMarkup:
+    """
+    Inline keyboard to pick one of all services.
+    :return: Inline keyboard.
+    """
+    return ALL_SERVICES_KEYBOARD
+
+
+def master_search_where_clause(service: str, sub_services: Optional[List[str]], page_number: int) -> WhereClause:
+    """
+    Where clause for active masters that provide given service (and sub services), starting from a given page.
+    :param service: Picked service.
+    :param sub_services: Picked sub services.
+    :param page_number: Pagination page number.
+    :return: Where clause.
+    """
+    _filter = [user_table.c.services.has_key(service)]  # noqa
+    if sub_services:
+        for sub_service in sub_services:
+            _filter.append(user_table.c.services.op("->")(service).op("->")(sub_service).is_not(None))
+    _filter.append(user_table.c.name.is_not(None))
+    _filter.append(user_table.c.is_master.is_(True))
+    _filter.append(user_table.c.is_active.is_(True))
+    _filter.append(user_table.c.seq_id >= (page_number - 1) * Config.MAX_NUMBER_OF_MASTERS_TO_SHOW + 1)
+    # _filter.append(user_table.c.seq_id <= page_number * Config.MAX_NUMBER_OF_MASTERS_TO_SHOW + 1)
+    return WhereClause(filter=_filter)
+
+
 async def pick_master_keyboard(
     service: str,
     sub_services: Dict[str, bool] = None,
@@ -49,16 +81,7 @@ async def pick_master_keyboard(
     master_buttons: List[List[InlineKeyboardButton]]
     master_buttons = [[InlineKeyboardButton(text="Фильтр", callback_data=ClientConstants.SUB_SERVICE_FILTER)]]
     logger = get_logger()
-    _filter = [user_table.c.services.has_key(service)]  # noqa
-    if sub_services:
-        for sub_service in sub_services:
-            _filter.append(user_table.c.services.op("->")(service).op("->")(sub_service).is_not(None))
-    _filter.append(user_table.c.name.is_not(None))
-    _filter.append(user_table.c.is_master.is_(True))
-    _filter.append(user_table.c.is_active.is_(True))
-    _filter.append(user_table.c.seq_id >= (page_number - 1) * Config.MAX_NUMBER_OF_MASTERS_TO_SHOW + 1)
-    # _filter.append(user_table.c.seq_id <= page_number * Config.MAX_NUMBER_OF_MASTERS_TO_SHOW + 1)
-    where_clause = WhereClause(filter=_filter)
+    where_clause = master_search_where_clause(service=service, sub_services=sub_services, page_number=page_number)
     # TODO: select only needed fields
     masters = await User(engine=engine, logger=logger).read_user_info(
         order_by=[user_table.c.seq_id],  # TODO: this can be slow if there are many users
@@ -122,34 +145,43 @@ def pick_day_keyboard(
     picked_month: int,
     picked_year: int,
     master_time_slots: Dict[int, bool],
+    master_telegram_id: str,
 ) -> InlineKeyboardMarkup:
-    # TODO: refactooooooooooooooooooooooOOOOOOOOOOOOOOOoooooooooor!
-    buttons = copy(CommonConstants.WEEK_DAYS_AS_BUTTONS)
+    """
+    Form inline keyboard to pick a day with free slots in master's calendar. Buttons carry booking context (see
+    npb.tg.callbacks), so that navigation needs no user data in DB.
+    :param picked_month: Month.
+    :param picked_year: Year.
+    :param master_time_slots: Days with free slots.
+    :param master_telegram_id: Master telegram id.
+    :return: Inline keyboard.
+    """
     now = datetime.now()
-    month = calendar.monthcalendar(year=picked_year, month=picked_month)
-    for week in month:
-        days = []
-        for day in week:
-            text = f"{day}"
-            callback_data = f"{text}"
-            if day == 0 or (day < now.day and picked_month == now.month):
-                text = " "
-                callback_data = MasterConstants.CALENDAR_IGNORE
-            elif master_time_slots.get(day):
-                text = f"🟢{day}"
-            elif not master_time_slots.get(day):  # explicit
-                callback_data = MasterConstants.CALENDAR_IGNORE
-            days.append(InlineKeyboardButton(text=text, callback_data=callback_data))
-        buttons.append(days)
+    codec = get_booking_codec()
+    master = int(master_telegram_id)
+    available_days = {day for day, available in master_time_slots.items() if available}
+    # only days with free slots are marked and can be picked
+    buttons = month_day_rows(
+        year=picked_year,
+        month=picked_month,
+        first_day=now.day if picked_month == now.month else 1,
+        markers=dict.fromkeys(available_days, "🟢"),
+        selectable=available_days,
+        day_callback=lambda day: codec.encode(
+            BookingNavigation(BookingActions.DAY, master, picked_year, picked_month, day)
+        ),
+    )
+
+    def month_button(arrow: InlineKeyboardButton, action_type: str) -> InlineKeyboardButton:
+        month, year = get_month(action_type=action_type, current_month=picked_month, current_year=picked_year)
+        callback_data = codec.encode(BookingNavigation(BookingActions.MONTH, master, year, month))
+        return InlineKeyboardButton(text=arrow.text, callback_data=callback_data)
+
+    forward_button = month_button(FORWARD_BUTTON, MasterConstants.CALENDAR_FORWARD)
     if picked_month == now.month and picked_year == now.year:
-        buttons.append([InlineKeyboardButton(text="➡️", callback_data=MasterConstants.CALENDAR_FORWARD)])
+        buttons.append([forward_button])
     else:
-        buttons.append(
-            [
-                InlineKeyboardButton(text="⬅️", callback_data=MasterConstants.CALENDAR_BACK),
-                InlineKeyboardButton(text="➡️", callback_data=MasterConstants.CALENDAR_FORWARD),
-            ]
-        )
+        buttons.append([month_button(BACK_BUTTON, MasterConstants.CALENDAR_BACK), forward_button])
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons, row_width=1)
     return keyboard
 
@@ -162,7 +194,7 @@ async def my_appointments_keyboard(
     appointment_where_clause = WhereClause(
         params=[appointment_table.c.client_telegram_id, appointment_table.c.datetime, appointment_table.c.datetime],
         values=[telegram_id, month_begin, month_end],
-        comparison_operators=["==", ">=", "<="],
+        comparison_operators=["==", ">=", "<"],
     )
     appointments = await Appointment(engine=engine, logger=logger).read_appointment_info(
         where_clause=appointment_where_clause, limit=100, order_by=[appointment_table.c.datetime.desc()]  # TODO: remove order by and filter in python code
@@ -177,21 +209,25 @@ async def my_appointments_keyboard(
 
 
 async def count_appointments_for_client(
-    client_telegram_id: str, master_telegram_id: str, day: int, logger: Logger
+    client_telegram_id: str, master_telegram_id: str, day: int, month: int, year: int, logger: Logger
 ) -> int:
     """
     Counts how many appointments given master has for given client (in a given day).
     :param client_telegram_id: Client telegram id.
     :param master_telegram_id: Master telegram id.
     :param day: Number of day.
+    :param month: Number of month.
+    :param year: Year.
     :return: Number of appointments
     """
+    day_begin, day_end = get_day_edges(day=day, month=month, year=year)
     appointment_where_clause = WhereClause(
         filter=[
             appointment_table.c.client_telegram_id == client_telegram_id,
             appointment_table.c.master_telegram_id == master_telegram_id,
             appointment_table.c.is_reserved.is_(True),
-            func.extract("day", appointment_table.c.datetime) == day,
+            appointment_table.c.datetime >= day_begin,
+            appointment_table.c.datetime < day_end,
         ]
     )
     appointments = await Appointment(engine=engine, logger=logger).read_appointment_info(
@@ -9,6 +9,44 @@ from npb.config import ClientConstants, MasterConstants, AdminConstants
 from npb.db.core import engine
 from npb.db.exceptions import ReadMaxSequenceError
 from npb.db.sa_models import user_table
+from npb.tg.keyboards import get_keyboard_registry
+
+
+MASTER_PROFILE_OPTIONS_KEYBOARD = get_keyboard_registry().register(
+    name="master_profile_options",
+    keyboard=InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="Мой профиль", callback_data=MasterConstants.MY_PROFILE)],
+            [InlineKeyboardButton(text="Редактировать профиль", callback_data=MasterConstants.EDIT_PROFILE)],
+            [InlineKeyboardButton(text="Мой график работы", callback_data=MasterConstants.MY_TIMETABLE)],
+        ]
+    ),
+)
+CLIENT_PROFILE_OPTIONS_KEYBOARD = get_keyboard_registry().register(
+    name="client_profile_options",
+    keyboard=InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="Выбрать услугу", callback_data=ClientConstants.PICK_SERVICE)],
+            [InlineKeyboardButton(text="Мои записи", callback_data=ClientConstants.MY_APPOINTMENTS)],
+            [InlineKeyboardButton(text="Стать мастером", callback_data=ClientConstants.BECOME_MASTER)],
+        ]
+    ),
+)
+ADMIN_PROFILE_OPTIONS_KEYBOARD = get_keyboard_registry().register(
+    name="admin_profile_options",
+    keyboard=InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="Добавить мастера", callback_data=AdminConstants.ADD_MASTER)],
+            [InlineKeyboardButton(text="Активировать пользователя", callback_data=AdminConstants.ACTIVATE_USER)],
+            [
+                InlineKeyboardButton(
+                    text="Деактивировать пользователя", callback_data=AdminConstants.DEACTIVATE_USER
+                )
+            ],
+            [InlineKeyboardButton(text="Рассылка", callback_data=AdminConstants.BROADCAST)],
+        ]
+    ),
+)
 
 
 def master_profile_options_keyboard() -> InlineKeyboardMarkup:  # TODO: this should be in utils.master
@@ -16,13 +54,7 @@ def master_profile_options_keyboard() -> InlineKeyboardMarkup:  # TODO: this sho
     Form reply keyboard available for master.
     :return: Reply keyboard.
     """
-    option_buttons = [
-        [InlineKeyboardButton(text="Мой профиль", callback_data=MasterConstants.MY_PROFILE)],
-        [InlineKeyboardButton(text="Редактировать профиль", callback_data=MasterConstants.EDIT_PROFILE)],
-        [InlineKeyboardButton(text="Мой график работы", callback_data=MasterConstants.MY_TIMETABLE)],
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=option_buttons)
-    return keyboard
+    return MASTER_PROFILE_OPTIONS_KEYBOARD
 
 
 def client_profile_options_keyboard() -> InlineKeyboardMarkup:  # TODO: this should be in utils.client
@@ -30,13 +62,7 @@ def client_profile_options_keyboard() -> InlineKeyboardMarkup:  # TODO: this sho
     Form reply keyboard available for client.
     :return: Reply keyboard.
     """
-    option_buttons = [
-        [InlineKeyboardButton(text="Выбрать услугу", callback_data=ClientConstants.PICK_SERVICE)],
-        [InlineKeyboardButton(text="Мои записи", callback_data=ClientConstants.MY_APPOINTMENTS)],
-        [InlineKeyboardButton(text="Стать мастером", callback_data=ClientConstants.BECOME_MASTER)],
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=option_buttons)
-    return keyboard
+    return CLIENT_PROFILE_OPTIONS_KEYBOARD
 
 
 def admin_profile_options_keyboard() -> InlineKeyboardMarkup:  # TODO: this should be in utils.client
@@ -44,17 +70,7 @@ def admin_profile_options_keyboard() -> InlineKeyboardMarkup:  # TODO: this shou
     Form reply keyboard available for admin.
     :return: Reply keyboard.
     """
-    option_buttons = [
-        [InlineKeyboardButton(text="Добавить мастера", callback_data=AdminConstants.ADD_MASTER)],
-        [InlineKeyboardButton(text="Активировать пользователя", callback_data=AdminConstants.ACTIVATE_USER)],
-        [
-            InlineKeyboardButton(
-                text="Деактивировать пользователя", callback_data=AdminConstants.DEACTIVATE_USER
-            )
-        ],
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=option_buttons)
-    return keyboard
+    return ADMIN_PROFILE_OPTIONS_KEYBOARD
 
 
 async def get_max_seq_id(logger: Logger) -> Optional[int]:
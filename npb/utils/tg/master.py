@@ -1,9 +1,7 @@
-import calendar
-from copy import copy
 from datetime import datetime
 from logging import Logger
 import time
-from typing import Dict, List, Tuple, Union, Literal
+from typing import Callable, Dict, Iterable, List, Tuple, Union, Literal
 
 from aiogram import F
 from aiogram import Router
@@ -16,11 +14,11 @@ from aiogram.types import (
     InlineKeyboardMarkup,
     InlineKeyboardButton,
 )
-from sqlalchemy import Row, Sequence, func
+from sqlalchemy import Row, Sequence
 from sqlalchemy.ext.asyncio import AsyncEngine
 
 from npb.config import MasterConstants, Config, CommonConstants
-from npb.db.api import User, Appointment
+from npb.db.api import User, Appointment, Outbox
 from npb.db.core import engine
 from npb.db.sa_models import user_table, appointment_table
 from npb.db.utils import WhereClause
@@ -28,13 +26,18 @@ from npb.exceptions import NoTelegramUpdateObject
 from npb.logger import get_logger
 from npb.state_machine.master_states import Master
 from npb.tg.bot import bot
+from npb.tg.models import OutboxMessageModel
 from npb.utils.common import (
     edit_profile_keyboard,
+    get_day_edges,
+    get_month_edges,
     get_user_data,
     master_profile_info,
     pick_sub_service_keyboard,
     handle_start_edit_name,
 )
+from npb.utils.calendar_mask import day_bit, month_mask, toggle_day, weekdays_mask, weekend_mask
+from npb.utils.tg.calendar_keyboard import BACK_BUTTON, BLANK_DAY_BUTTON, FORWARD_BUTTON, day_button, month_grid
 from npb.utils.tg.registration_form import (
     check_phone_is_correct,
     delete_service_keyboard,
@@ -71,66 +74,57 @@ async def edit_month_calendar(
     picked_day: str = None,
     picked_month: int = None,
     picked_year: int = None,
-    current_calendar: dict = None,
+    selected_days: int = 0,
     whole: bool = False,
     drop: bool = False,
     week_part: str = None,
     appointments: Dict[int, bool] = None,
     edit_mode: str = None,
-) -> Tuple[InlineKeyboardMarkup, dict]:
+) -> Tuple[InlineKeyboardMarkup, int]:
     # TODO: refactooooooooooooooooooooooOOOOOOOOOOOOOOOoooooooooor!
-    buttons = copy(CommonConstants.WEEK_DAYS_AS_BUTTONS)
+    buttons = list(CommonConstants.WEEK_DAYS_AS_BUTTONS)
     now = datetime.now()
     picked_day = int(picked_day) if picked_day else None
-    picked_month_str, picked_month_int = str(picked_month or now.month), picked_month or now.month
-    picked_year_str, picked_year_int = str(picked_year or now.year), picked_year or now.year
-    if not current_calendar.get(picked_year_str):
-        current_calendar[picked_year_str] = {picked_month_str: {}}
-    elif not current_calendar[picked_year_str].get(picked_month_str):
-        current_calendar[picked_year_str][picked_month_str] = {}
-    month = calendar.monthcalendar(year=picked_year_int, month=picked_month_int)  # TODO: overload monthcalendar to make it return a inline keyboard
-    for week in month:
+    picked_month_int = picked_month or now.month
+    picked_year_int = picked_year or now.year
+    first_day = now.day if picked_month_int == now.month else 1
+    # picked days are a bitmask (see npb.utils.calendar_mask), month options replace it as a whole
+    if appointments:
+        pass  # do not modify
+    elif week_part == MasterConstants.CALENDAR_MON_FRI:
+        selected_days = weekdays_mask(picked_year_int, picked_month_int, first_day)
+    elif week_part == MasterConstants.CALENDAR_WEEKEND:
+        selected_days = weekend_mask(picked_year_int, picked_month_int, first_day)
+    elif whole:
+        selected_days = month_mask(picked_year_int, picked_month_int, first_day)
+    elif drop:
+        selected_days = 0
+    elif picked_day and picked_day >= first_day:
+        selected_days = toggle_day(selected_days, picked_day)
+    # month layout and day buttons are cached, only availability markers are picked here
+    for week in month_grid(picked_year_int, picked_month_int):
         days = []
-        for day_index, day in enumerate(week):
-            text = callback_data = day_as_str = str(day)
-            if day == 0 or (day < now.day and picked_month_int == now.month):
-                text = " "
-                callback_data = MasterConstants.CALENDAR_IGNORE
+        for day in week:
+            marker = ""
+            if day == 0 or day < first_day:
+                days.append(BLANK_DAY_BUTTON)
+                continue
             elif appointments:
                 if appointments.get(day):
                     if day == picked_day:
-                        text = f"🟢{day}"
+                        marker = "🟢"
                     else:
-                        text = f"🟡{day}"
-            elif (
-                week_part == MasterConstants.CALENDAR_MON_FRI and day_index not in (5, 6) or
-                week_part == MasterConstants.CALENDAR_WEEKEND and day_index in (5, 6)
-            ):
-                current_calendar[picked_year_str][picked_month_str][day_as_str] = True
-                text = f"🟢{day}"
-            elif whole:
-                current_calendar[picked_year_str][picked_month_str][day_as_str] = True
-                text = f"🟢{day}"
-            elif drop:
-                pass  # do not modify
-            elif day == picked_day and day_as_str in current_calendar[picked_year_str][picked_month_str]:
-                del current_calendar[picked_year_str][picked_month_str][day_as_str]
-            elif day == picked_day or day_as_str in current_calendar[picked_year_str][picked_month_str]:  # TODO: just else?
-                current_calendar[picked_year_str][picked_month_str][day_as_str] = True
-                text = f"🟢{day}"
-            days.append(InlineKeyboardButton(text=text, callback_data=callback_data))
+                        marker = "🟡"
+            elif selected_days & day_bit(day):
+                marker = "🟢"
+            days.append(day_button(day, marker))
         buttons.append(days)
     if picked_month == now.month and picked_year == now.year:
-        buttons.append([InlineKeyboardButton(text="➡️", callback_data=MasterConstants.CALENDAR_FORWARD)])
+        buttons.append([FORWARD_BUTTON])
     elif picked_month >= now.month + 2:
-        buttons.append([InlineKeyboardButton(text="⬅️", callback_data=MasterConstants.CALENDAR_BACK)])
+        buttons.append([BACK_BUTTON])
     else:
-        buttons.append(
-            [
-                InlineKeyboardButton(text="⬅️", callback_data=MasterConstants.CALENDAR_BACK),
-                InlineKeyboardButton(text="➡️", callback_data=MasterConstants.CALENDAR_FORWARD),
-            ]
-        )
+        buttons.append([BACK_BUTTON, FORWARD_BUTTON])
     if edit_mode == "1":
         buttons.append([InlineKeyboardButton(text="Сбросить", callback_data=MasterConstants.CALENDAR_DROP)])
         buttons.append([InlineKeyboardButton(text="Выбрать весь месяц", callback_data=MasterConstants.CALENDAR_WHOLE)])
@@ -143,15 +137,24 @@ async def edit_month_calendar(
     else:
         buttons.append([InlineKeyboardButton(text="Режим редактирования", callback_data=MasterConstants.EDIT_TIMETABLE)])
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons, row_width=1)
-    from pprint import pprint
-    print("DEBUG current_calendar: ")
-    pprint(current_calendar)
-    return keyboard, current_calendar
+    return keyboard, selected_days
 
 
 async def update_appointment_with_collision_check(
-    date_and_time: datetime, logger: Logger, user: Row
+    date_and_time: datetime,
+    logger: Logger,
+    user: Row,
+    make_notifications: Callable[[Row, Sequence[Row]], Iterable[OutboxMessageModel]] = None,
 ) -> Tuple[Row, Sequence[Row]]:
+    """
+    Move appointment picked by user to another time, appointments that occupy this time are deleted.
+    :param date_and_time: New appointment date and time.
+    :param logger: Logger.
+    :param user: User.
+    :param make_notifications: Builds outbox messages from old and new appointments, they are written in the same
+        transaction as the update.
+    :return: Old appointment and updated appointments.
+    """
     where_clause = WhereClause(
         params=[appointment_table.c.datetime],
         values=[date_and_time],
@@ -175,8 +178,11 @@ async def update_appointment_with_collision_check(
         comparison_operators=["=="]
     )
     data_to_set = {"datetime": date_and_time}
+    transaction_hooks = []
+    if make_notifications:
+        transaction_hooks.append(Outbox.enqueue_hook(lambda rows: make_notifications(old_appointment, rows)))
     new_appointments = await Appointment(engine=engine, logger=logger).update_appointment_info(
-        where_clause=where_clause, data_to_set=data_to_set, return_all=True
+        where_clause=where_clause, data_to_set=data_to_set, return_all=True, transaction_hooks=transaction_hooks
     )
     print(f"DEBUG new appointments: {new_appointments}, old appointments: {old_appointment}")
     return old_appointment, new_appointments
@@ -186,17 +192,21 @@ async def appointments_per_period(
     telegram_id: str,
     engine: AsyncEngine,
     logger: Logger,
+    month: int,
+    year: int,
     day: int = None,
-    month: int = None,
 ) -> int:
-    _filter = [appointment_table.c.master_telegram_id == telegram_id]
     if day:
-        _filter.append(func.extract("day", appointment_table.c.datetime) == day)
-    elif month:
-        _filter.append(func.extract("month", appointment_table.c.datetime) == month)
+        period_begin, period_end = get_day_edges(day=day, month=month, year=year)
     else:
-        raise ValueError("None of day or month is specified.")
-    where_clause = WhereClause(filter=_filter)
+        period_begin, period_end = get_month_edges(month=month, year=year)
+    where_clause = WhereClause(
+        filter=[
+            appointment_table.c.master_telegram_id == telegram_id,
+            appointment_table.c.datetime >= period_begin,
+            appointment_table.c.datetime < period_end,
+        ]
+    )
     appointments = await Appointment(engine=engine, logger=logger).read_appointment_info(
         where_clause=where_clause
     )
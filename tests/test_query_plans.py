@@ -0,0 +1,211 @@
+"""
+Query plan regression tests.
+
+Load a generated dataset (see npb.bench.dataset) into Postgres, run 'EXPLAIN (FORMAT JSON)' for each repository query
+shape used on hot paths and fail if a plan contains a sequential scan over a large relation, exceeds its cost budget
+or (for calendar month reads) touches more than one appointment partition. Skipped when POSTGRES_DSN is not set:
+
+    POSTGRES_DSN=postgresql+asyncpg://... PLAN_CHECK_PRESET=100k python -m pytest tests/test_query_plans.py
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from os import environ
+from typing import Any, Callable, Dict, Iterator, NamedTuple
+
+import pytest
+
+from npb.config import Config
+
+if not Config.DB_DSN:
+    pytest.skip("POSTGRES_DSN is not configured", allow_module_level=True)
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.engine import Dialect  # noqa: E402
+from sqlalchemy.sql.expression import Executable  # noqa: E402
+
+from npb.bench.dataset import PRESETS, DatasetSummary, drop_dataset, load_dataset  # noqa: E402
+from npb.db.api import Appointment, MasterDigest, Reminder, User  # noqa: E402
+from npb.db.core import engine  # noqa: E402
+from npb.db.partitions import APPOINTMENT_TABLE, partition_month_start, partition_name  # noqa: E402
+from npb.db.sa_models import user_table  # noqa: E402
+from npb.utils.common import master_month_where_clause  # noqa: E402
+from npb.utils.tg.client import master_search_where_clause  # noqa: E402
+
+PLAN_USER_PREFIX = "plan_"
+PLAN_CHECK_PRESET = environ.get("PLAN_CHECK_PRESET", "100k")
+# sequential scans over relations larger than this are violations
+SEQ_SCAN_ROWS = int(environ.get("PLAN_CHECK_SEQ_SCAN_ROWS", 10000))
+SERVICES = list(Config.MASTER_SERVICES)
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    build_query: Callable[[datetime, DatasetSummary], Executable]
+    cost_budget: float
+    single_partition: bool = False
+
+
+# query shapes to check (built with the same helpers the bot uses)
+PLAN_CHECKS = [
+    PlanCheck(
+        name="read_single_user_info",
+        build_query=lambda now, dataset: User.single_user_info_query(tg_user_id=dataset.sample_client_telegram_id),
+        cost_budget=50,
+    ),
+    PlanCheck(
+        name="pick_master_keyboard",
+        build_query=lambda now, dataset: User.read_user_query(
+            where_clause=master_search_where_clause(
+                service=SERVICES[0], sub_services=[Config.MASTER_SERVICES[SERVICES[0]][0]], page_number=1
+            ),
+            order_by=[user_table.c.seq_id],
+            limit=Config.MAX_NUMBER_OF_MASTERS_TO_SHOW + 1,
+        ),
+        cost_budget=500,
+    ),
+    PlanCheck(
+        name="_handle_pick_day",
+        build_query=lambda now, dataset: Appointment.read_appointment_query(
+            where_clause=master_month_where_clause(
+                master_telegram_id=dataset.sample_master_telegram_id, month=now.month, year=now.year, is_reserved=False
+            )
+        ),
+        cost_budget=500,
+        single_partition=True,
+    ),
+    PlanCheck(
+        name="_handle_my_timetable",
+        build_query=lambda now, dataset: Appointment.read_appointment_query(
+            where_clause=master_month_where_clause(
+                master_telegram_id=dataset.sample_master_telegram_id, month=now.month, year=now.year
+            )
+        ),
+        cost_budget=500,
+        single_partition=True,
+    ),
+    PlanCheck(
+        name="master_digest",
+        build_query=lambda now, dataset: MasterDigest.daily_agenda_query(
+            day_start=now + timedelta(days=1), day_end=now + timedelta(days=2)
+        ),
+        # heap pages of all bookings of a day (~7k with the 100k preset), spread over the partition; runs once a day
+        cost_budget=20000,
+    ),
+    PlanCheck(
+        name="claim_due_reminders",
+        build_query=lambda now, dataset: Reminder.claim_due_reminders_query(
+            now=now, limit=Config.REMINDER_BATCH_SIZE, coalesce_window=Config.REMINDER_COALESCE_WINDOW
+        ),
+        # a due_at index range plus a primary key lookup per claimed row
+        cost_budget=15000,
+    ),
+]
+
+
+def walk_plan(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over all nodes of a plan tree.
+    :param node: Plan node.
+    """
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk_plan(child)
+
+
+def explain_sql(statement: Executable, dialect: Dialect) -> str:
+    """
+    Render 'EXPLAIN (FORMAT JSON)' for a statement with parameters inlined, the way a custom plan sees them.
+    :param statement: SQLAlchemy statement.
+    :param dialect: DB dialect.
+    :return: SQL.
+    """
+    compiled = statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    return f"EXPLAIN (FORMAT JSON) {compiled}"
+
+
+@pytest.fixture(scope="module")
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    # the engine's pool is bound to the loop it connects in, so the whole module shares one
+    event_loop = asyncio.new_event_loop()
+    yield event_loop
+    event_loop.run_until_complete(engine.dispose())
+    event_loop.close()
+
+
+@pytest.fixture(scope="module")
+def now() -> datetime:
+    return datetime.now(tz=timezone(timedelta(hours=Config.TZ_OFFSET)))
+
+
+@pytest.fixture(scope="module")
+def dataset(loop: asyncio.AbstractEventLoop, now: datetime) -> Iterator[DatasetSummary]:
+    loop.run_until_complete(drop_dataset(engine=engine, prefix=PLAN_USER_PREFIX))
+    try:
+        yield loop.run_until_complete(
+            load_dataset(engine=engine, preset=PRESETS[PLAN_CHECK_PRESET], prefix=PLAN_USER_PREFIX, now=now)
+        )
+    finally:
+        loop.run_until_complete(drop_dataset(engine=engine, prefix=PLAN_USER_PREFIX))
+
+
+@pytest.fixture(scope="module")
+def relation_sizes(loop: asyncio.AbstractEventLoop, dataset: DatasetSummary) -> Dict[str, float]:
+    """
+    Estimated number of rows of every relation (from planner statistics).
+    """
+    async def read() -> Dict[str, float]:
+        async with engine.connect() as connection:
+            result = await connection.execute(
+                text("SELECT relname, reltuples FROM pg_class WHERE relkind IN ('r', 'p') AND relnamespace = "
+                     "CAST(current_schema() AS regnamespace)")
+            )
+            return {name: rows for name, rows in result.all()}
+
+    return loop.run_until_complete(read())
+
+
+@pytest.fixture(scope="module")
+def plans(loop: asyncio.AbstractEventLoop, now: datetime, dataset: DatasetSummary) -> Dict[str, Dict[str, Any]]:
+    """
+    Plans of all checked queries by check name.
+    """
+    async def explain() -> Dict[str, Dict[str, Any]]:
+        explained_plans = {}
+        async with engine.connect() as connection:
+            for check in PLAN_CHECKS:
+                query = explain_sql(statement=check.build_query(now, dataset), dialect=connection.dialect)
+                explained = (await connection.exec_driver_sql(query)).scalar_one()
+                # json codec may be not registered on a raw driver connection
+                explained_plans[check.name] = (json.loads(explained) if isinstance(explained, str) else explained)[0]
+        return explained_plans
+
+    return loop.run_until_complete(explain())
+
+
+@pytest.mark.parametrize("check", PLAN_CHECKS, ids=lambda check: check.name)
+def test_no_seq_scan_over_large_relations(
+    check: PlanCheck, plans: Dict[str, Dict[str, Any]], relation_sizes: Dict[str, float]
+):
+    seq_scans = [
+        node["Relation Name"] for node in walk_plan(plans[check.name]["Plan"])
+        if node["Node Type"] == "Seq Scan" and relation_sizes.get(node["Relation Name"], 0) > SEQ_SCAN_ROWS
+    ]
+    assert not seq_scans, f"{check.name}: sequential scan over {', '.join(seq_scans)}"
+
+
+@pytest.mark.parametrize("check", PLAN_CHECKS, ids=lambda check: check.name)
+def test_cost_within_budget(check: PlanCheck, plans: Dict[str, Dict[str, Any]]):
+    cost = plans[check.name]["Plan"]["Total Cost"]
+    assert cost <= check.cost_budget, f"{check.name}: cost {cost} is over budget {check.cost_budget}"
+
+
+@pytest.mark.parametrize(
+    "check", [check for check in PLAN_CHECKS if check.single_partition], ids=lambda check: check.name
+)
+def test_month_read_is_pruned_to_single_partition(check: PlanCheck, plans: Dict[str, Dict[str, Any]], now: datetime):
+    scanned = {
+        node["Relation Name"] for node in walk_plan(plans[check.name]["Plan"])
+        if node.get("Relation Name", "").startswith(APPOINTMENT_TABLE)
+    }
+    assert scanned == {partition_name(partition_month_start(now))}, f"{check.name}: scans {sorted(scanned)}"